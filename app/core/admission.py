@@ -0,0 +1,109 @@
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.job_queue import count_queued_jobs, count_running_jobs
+from app.core.mongodb import get_database
+from app.core.scheduler import judge_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionController:
+    """
+    Control de admisión de submisiones y estimación de la espera.
+
+    Una submisión se rechaza si ya hay `JUDGE_MAX_PENDING_SUBMISSIONS`
+    esperando evaluación; el tiempo sugerido para reintentar es el que tarda la
+    cola en bajar del límite. La espera estimada de las aceptadas usa el
+    promedio móvil exponencial (EWMA) de la duración de las evaluaciones
+    recientes de cada problema.
+
+    En modo inline la cola es la del planificador del proceso. En modo queue
+    las duraciones las registran los workers en `judge_throughput` y la API
+    relee la colección y los conteos de la cola como máximo cada
+    `JUDGE_QUEUE_METRICS_INTERVAL` segundos, así que el límite es aproximado.
+    """
+
+    def __init__(self):
+        self._durations: Dict[str, float] = {}
+        self._overall: Optional[float] = None
+        self._queued = 0
+        self._running = 0
+        self._refreshed_at: Optional[float] = None
+
+    def _update(self, problem_id: str, seconds: float):
+        alpha = settings.JUDGE_ADMISSION_EWMA_ALPHA
+        previous = self._durations.get(problem_id)
+        self._durations[problem_id] = seconds if previous is None else alpha * seconds + (1 - alpha) * previous
+        self._overall = seconds if self._overall is None else alpha * seconds + (1 - alpha) * self._overall
+
+    async def record(self, problem_id: str, seconds: float):
+        """Registrar la duración de una evaluación del problema"""
+        self._update(problem_id, seconds)
+        if settings.JUDGE_DISPATCH_MODE == "queue":
+            try:
+                await get_database().judge_throughput.update_one(
+                    {"_id": problem_id},
+                    {"$set": {"duration_seconds": self._durations[problem_id], "updated_at": datetime.now()}},
+                    upsert=True
+                )
+            except Exception as e:
+                logger.warning(f"No se pudo guardar la duración de la evaluación: {e}")
+
+    async def _refresh(self):
+        """Releer las duraciones y los conteos de la cola que mantienen los workers"""
+        now = time.monotonic()
+        if self._refreshed_at is not None and now - self._refreshed_at < settings.JUDGE_QUEUE_METRICS_INTERVAL:
+            return
+        self._refreshed_at = now
+        self._queued = await count_queued_jobs()
+        self._running = await count_running_jobs()
+        durations = {
+            document["_id"]: document["duration_seconds"]
+            async for document in get_database().judge_throughput.find()
+        }
+        if durations:
+            self._durations = durations
+            self._overall = sum(durations.values()) / len(durations)
+
+    def _duration(self, problem_id: Optional[str] = None) -> float:
+        """Duración estimada de una evaluación (del problema, si hay datos)"""
+        if problem_id in self._durations:
+            return self._durations[problem_id]
+        return self._overall if self._overall is not None else settings.JUDGE_ADMISSION_DEFAULT_SECONDS
+
+    async def admit(self, problem_id: str) -> Tuple[bool, int]:
+        """
+        Decidir si se acepta una submisión del problema. Devuelve si se acepta y,
+        en segundos, la espera estimada hasta su veredicto o, si se rechaza, el
+        tiempo sugerido para reintentar (`Retry-After`).
+        """
+        if settings.JUDGE_DISPATCH_MODE == "queue":
+            try:
+                await self._refresh()
+            except Exception as e:
+                logger.warning(f"No se pudo consultar la cola de evaluación: {e}")
+            queued, running, capacity = self._queued, self._running, max(self._running, 1)
+        else:
+            queued, running = judge_scheduler.queued, judge_scheduler.active
+            capacity = settings.JUDGE_INLINE_MAX_CONCURRENT
+
+        limit = settings.JUDGE_MAX_PENDING_SUBMISSIONS
+        if limit and queued >= limit:
+            drain = (queued - limit + 1) * self._duration() / capacity
+            return False, max(math.ceil(drain), 1)
+
+        if settings.JUDGE_DISPATCH_MODE == "queue":
+            self._queued += 1  # cuenta hasta el próximo conteo real
+        # Evaluaciones que deben terminar antes de que esta tenga lugar, más la propia
+        ahead = max(queued + running - capacity + 1, 0)
+        wait = ahead * self._duration() / capacity + self._duration(problem_id)
+        return True, math.ceil(wait)
+
+
+# Instancia global del control de admisión del proceso
+admission_controller = AdmissionController()
@@ -1,3 +1,4 @@
+import logging
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -9,6 +10,8 @@ from app.core.config import settings
 from app.core.database import get_db, get_user_by_username
 from app.models.base import User
 
+logger = logging.getLogger(__name__)
+
 # Configuración de encriptación de contraseñas
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -87,11 +90,11 @@ async def get_current_user_optional(token: str = Depends(oauth2_scheme)) -> User
     
     # Ya no necesitamos extraer el email del JWT, solo validar que hay un token
     if token is None:
-        print("DEBUG: No se proporcionó token JWT")
+        logger.debug("No se proporcionó token JWT")
         return User(id=None, username="anonymous", email="anonymous@example.com", hashed_password="", is_active=False, is_admin=False, created_at=datetime.now())
     
     # Si hay token, consideramos al usuario como autenticado
-    print("DEBUG: Token JWT proporcionado, usuario autenticado")
+    logger.debug("Token JWT proporcionado, usuario autenticado")
     return User(id=None, username="authenticated", email="authenticated@example.com", hashed_password="", is_active=True, is_admin=False, created_at=datetime.now())
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
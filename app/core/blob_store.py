@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Tuple, Union
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from app.core.config import settings
+from app.core.mongodb import get_database
+from app.core.metrics import CACHE_HITS, CACHE_MISSES
+from app.models.base import TestCase
+
+logger = logging.getLogger(__name__)
+
+def content_hash(data: bytes) -> str:
+    """Hash con el que se direcciona el contenido de un blob"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: str) -> Tuple[str, int]:
+    """Hash y tamaño de un archivo, leído por bloques"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class BlobStore:
+    """
+    Almacén de datos de prueba direccionado por contenido (sha256).
+
+    Con `JUDGE_BLOB_STORE=gridfs` los blobs viven en el bucket GridFS `test_data`
+    y cada juez mantiene una copia en `JUDGE_BLOB_CACHE_DIR`, que puede borrarse
+    en cualquier momento. Con `JUDGE_BLOB_STORE=local` el directorio es el
+    almacén (un solo servidor o un volumen compartido). Los jueces siempre
+    leen los blobs desde archivos locales.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _bucket(self) -> AsyncIOMotorGridFSBucket:
+        return AsyncIOMotorGridFSBucket(get_database(), bucket_name="test_data")
+
+    def local_path(self, blob_hash: str) -> str:
+        return os.path.join(self.root, blob_hash[:2], blob_hash)
+
+    def write_local(self, blob_hash: str, data: bytes) -> str:
+        path = self.local_path(blob_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        return path
+
+    async def put(self, data: bytes) -> Tuple[str, int]:
+        """Guardar un blob y devolver su hash y tamaño; guardar dos veces lo mismo no duplica"""
+        blob_hash = content_hash(data)
+        if settings.JUDGE_BLOB_STORE == "gridfs":
+            bucket = self._bucket()
+            if not await get_database().test_data.files.find_one({"filename": blob_hash}, {"_id": 1}):
+                await bucket.upload_from_stream(blob_hash, data)
+        self.write_local(blob_hash, data)
+        return blob_hash, len(data)
+
+    async def put_file(self, source_path: str) -> Tuple[str, int]:
+        """Como `put`, pero leyendo el blob por bloques desde un archivo, sin cargarlo en memoria"""
+        blob_hash, size = await asyncio.to_thread(file_hash, source_path)
+        if settings.JUDGE_BLOB_STORE == "gridfs":
+            if not await get_database().test_data.files.find_one({"filename": blob_hash}, {"_id": 1}):
+                with open(source_path, "rb") as f:
+                    await self._bucket().upload_from_stream(blob_hash, f)
+        path = self.local_path(blob_hash)
+        if not os.path.exists(path):
+            await asyncio.to_thread(self._copy_local, source_path, path)
+        return blob_hash, size
+
+    def _copy_local(self, source_path: str, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        os.close(fd)
+        shutil.copyfile(source_path, tmp_path)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+
+    async def path(self, blob_hash: str) -> str:
+        """Ruta local del blob, descargándolo de GridFS si no está en el disco"""
+        path = self.local_path(blob_hash)
+        if os.path.exists(path):
+            CACHE_HITS.labels(cache="blob").inc()
+            return path
+        CACHE_MISSES.labels(cache="blob").inc()
+        if settings.JUDGE_BLOB_STORE != "gridfs":
+            raise FileNotFoundError(f"Blob no encontrado: {blob_hash}")
+
+        lock = self._locks.setdefault(blob_hash, asyncio.Lock())
+        async with lock:
+            if not os.path.exists(path):
+                await self._download(blob_hash, path)
+        self._locks.pop(blob_hash, None)
+        return path
+
+    async def _download(self, blob_hash: str, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stream = await self._bucket().open_download_stream_by_name(blob_hash)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = await stream.readchunk()
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+            if digest.hexdigest() != blob_hash:
+                raise ValueError(f"El blob {blob_hash} está corrupto")
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    async def read(self, blob_hash: str) -> bytes:
+        with open(await self.path(blob_hash), "rb") as f:
+            return f.read()
+
+
+# Instancia global del almacén de datos de prueba
+blob_store = BlobStore(settings.JUDGE_BLOB_CACHE_DIR)
+
+
+async def test_case_paths(test_case: TestCase) -> Tuple[str, str]:
+    """
+    Rutas locales de la entrada y la salida esperada de un caso de prueba.
+    Los casos antiguos con los datos en el documento se materializan en el
+    directorio del almacén, sin subirlos a GridFS.
+    """
+    if test_case.input_hash:
+        input_path = await blob_store.path(test_case.input_hash)
+    else:
+        data = test_case.input_data.encode("utf-8")
+        input_path = blob_store.write_local(content_hash(data), data)
+
+    if test_case.expected_output_hash:
+        expected_path = await blob_store.path(test_case.expected_output_hash)
+    else:
+        data = test_case.expected_output.encode("utf-8")
+        expected_path = blob_store.write_local(content_hash(data), data)
+    return input_path, expected_path
+
+
+@contextmanager
+def open_mmap(path: str):
+    """Mapear un archivo en memoria de solo lectura (los archivos vacíos no se pueden mapear)"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+def read_preview(path: str, limit: int) -> str:
+    """Primeros `limit` bytes de un archivo, para mostrarlos en los resultados"""
+    with open(path, "rb") as f:
+        data = f.read(limit + 1)
+    text = data[:limit].decode("utf-8", errors="replace")
+    return text + "…" if len(data) > limit else text
+
+
+async def store_test_case_data(input_data: str, expected_output: str) -> Dict[str, Union[str, int]]:
+    """Guardar los datos de un caso en el almacén y devolver los campos para Mongo"""
+    input_hash, input_size = await blob_store.put(input_data.encode("utf-8"))
+    expected_hash, expected_size = await blob_store.put(expected_output.encode("utf-8"))
+    return {
+        "input_hash": input_hash,
+        "input_size": input_size,
+        "expected_output_hash": expected_hash,
+        "expected_output_size": expected_size
+    }
+
+
+async def load_test_case_data(test_case: TestCase) -> TestCase:
+    """Completar `input_data` y `expected_output` desde el almacén (para las respuestas de la API)"""
+    if test_case.input_data is None and test_case.input_hash:
+        test_case.input_data = (await blob_store.read(test_case.input_hash)).decode("utf-8", errors="replace")
+    if test_case.expected_output is None and test_case.expected_output_hash:
+        test_case.expected_output = (
+            await blob_store.read(test_case.expected_output_hash)
+        ).decode("utf-8", errors="replace")
+    return test_case
@@ -0,0 +1,174 @@
+import mmap
+from typing import Dict, Optional, Tuple, Union
+
+# Espacios que ignora la comparación al inicio y al final de la salida (como bytes.strip)
+WHITESPACE = b" \t\n\r\x0b\x0c"
+
+# Tamaño de los bloques comparados a la vez
+CHUNK_SIZE = 64 * 1024
+
+Buffer = Union[bytes, memoryview, mmap.mmap]
+
+
+def strip_bounds(buffer: Buffer) -> Tuple[int, int]:
+    """Inicio y fin del contenido sin los espacios de los extremos, sin copiar el buffer"""
+    start, end = 0, len(buffer)
+    while start < end and buffer[start] in WHITESPACE:
+        start += 1
+    while end > start and buffer[end - 1] in WHITESPACE:
+        end -= 1
+    return start, end
+
+
+def outputs_match(actual: Buffer, expected: Buffer) -> bool:
+    """
+    Comparar la salida del programa con la esperada ignorando los espacios de
+    los extremos. `expected` puede ser un mmap: se compara por bloques sin
+    cargar el archivo completo en memoria.
+    """
+    actual_start, actual_end = strip_bounds(actual)
+    expected_start, expected_end = strip_bounds(expected)
+    length = actual_end - actual_start
+    if length != expected_end - expected_start:
+        return False
+
+    with memoryview(actual) as actual_view, memoryview(expected) as expected_view:
+        for offset in range(0, length, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, length - offset)
+            if (
+                actual_view[actual_start + offset:actual_start + offset + size]
+                != expected_view[expected_start + offset:expected_start + offset + size]
+            ):
+                return False
+    return True
+
+
+class StreamingComparator:
+    """
+    Comparador incremental de la salida de un programa contra la esperada.
+
+    Recibe la salida por bloques con `feed` y usa la misma semántica que
+    `outputs_match` (se ignoran los espacios de los extremos) sin guardar la
+    salida completa: los espacios pendientes al final de un bloque solo se
+    comparan si después llega más contenido. `feed` devuelve False en cuanto
+    la salida difiere o supera `output_limit`, para que el llamador deje de leer
+    y termine el proceso.
+    """
+
+    def __init__(self, expected: Buffer, output_limit: Optional[int] = None, preview_limit: int = 0):
+        self.expected = expected
+        self.output_limit = output_limit
+        self.preview_limit = preview_limit
+        self.preview = bytearray()
+        self.total_bytes = 0
+        self.limit_exceeded = False
+        self.mismatch_offset: Optional[int] = None
+
+        self._start, self._end = strip_bounds(expected)
+        self._position = self._start  # siguiente byte esperado
+        self._started = False
+        self._pending = b""  # espacios del final del último bloque, aún sin comparar
+
+    @property
+    def failed(self) -> bool:
+        return self.limit_exceeded or self.mismatch_offset is not None
+
+    def feed(self, chunk: bytes) -> bool:
+        """Procesar un bloque de salida; devuelve False si ya no hace falta seguir leyendo"""
+        if self.failed:
+            return False
+        self.total_bytes += len(chunk)
+        if len(self.preview) < self.preview_limit:
+            self.preview += chunk[:self.preview_limit - len(self.preview)]
+        if self.output_limit is not None and self.total_bytes > self.output_limit:
+            # Lo que entra en el límite se compara igual: una diferencia anterior tiene prioridad
+            within = chunk[:len(chunk) - (self.total_bytes - self.output_limit)]
+            if self._feed_content(within):
+                self.limit_exceeded = True
+            return False
+        return self._feed_content(chunk)
+
+    def _feed_content(self, chunk: bytes) -> bool:
+        start = 0
+        if not self._started:
+            while start < len(chunk) and chunk[start] in WHITESPACE:
+                start += 1
+            if start == len(chunk):
+                return True
+            self._started = True
+
+        end = len(chunk)
+        while end > start and chunk[end - 1] in WHITESPACE:
+            end -= 1
+        if end == start:
+            self._pending += chunk[start:]
+            return True
+
+        content = self._pending + chunk[start:end] if self._pending else chunk[start:end]
+        self._pending = chunk[end:]
+        return self._match(content)
+
+    def _match(self, content: bytes) -> bool:
+        available = self._end - self._position
+        size = min(len(content), available)
+        with memoryview(self.expected) as expected_view:
+            for offset in range(0, size, CHUNK_SIZE):
+                block = min(CHUNK_SIZE, size - offset)
+                actual_block = content[offset:offset + block]
+                expected_block = expected_view[self._position + offset:self._position + offset + block]
+                if actual_block != expected_block:
+                    index = next(i for i in range(block) if actual_block[i] != expected_block[i])
+                    self.mismatch_offset = self._position + offset + index
+                    return False
+        if len(content) > available:
+            # La salida continúa después del final de la esperada
+            self.mismatch_offset = self._end
+            return False
+        self._position += size
+        return True
+
+    def finish(self) -> bool:
+        """Indicar el final de la salida; devuelve True si coincide con la esperada"""
+        if self.failed:
+            return False
+        if self._position != self._end:
+            # La salida terminó antes que la esperada; la diferencia se reporta
+            # después de los espacios pendientes que sí coinciden
+            position = self._position
+            for byte in self._pending:
+                if position >= self._end or self.expected[position] != byte:
+                    break
+                position += 1
+            self.mismatch_offset = position
+            return False
+        return True
+
+    def first_difference(self) -> Optional[Dict[str, int]]:
+        """Línea y columna (desde 1) de la primera diferencia en la salida esperada"""
+        if self.mismatch_offset is None:
+            return None
+        line, line_start = 1, 0
+        with memoryview(self.expected) as expected_view:
+            for offset in range(0, self.mismatch_offset, CHUNK_SIZE):
+                block = bytes(expected_view[offset:min(offset + CHUNK_SIZE, self.mismatch_offset)])
+                line += block.count(b"\n")
+                last_newline = block.rfind(b"\n")
+                if last_newline != -1:
+                    line_start = offset + last_newline + 1
+        return {"line": line, "column": self.mismatch_offset - line_start + 1}
+
+
+def compare_output(
+    output: bytes,
+    expected: Buffer,
+    output_limit: Optional[int] = None,
+    preview_limit: int = 0
+) -> StreamingComparator:
+    """Comparar una salida ya capturada, por bloques, con `StreamingComparator`"""
+    comparator = StreamingComparator(expected, output_limit, preview_limit)
+    with memoryview(output) as view:
+        for offset in range(0, len(output), CHUNK_SIZE):
+            if not comparator.feed(bytes(view[offset:offset + CHUNK_SIZE])):
+                return comparator
+    comparator.finish()
+    return comparator
@@ -0,0 +1,238 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+from typing import Dict, Any, Optional
+
+from app.core.config import settings
+from app.core.docker_backend import docker_backend
+from app.core.metrics import CACHE_HITS, CACHE_MISSES
+from app.core.process import run_process
+from app.core.sandbox_pool import container_pool, build_archive, SANDBOX_DIR
+
+logger = logging.getLogger(__name__)
+
+# Archivo CDS (class data sharing) generado dentro de los contenedores de Java
+DOCKER_JAVA_CDS_ARCHIVE = "/tmp/judge-cds.jsa"
+
+_toolchain_versions: Dict[str, str] = {}
+_cds_ready: Optional[bool] = None
+
+
+def java_class_name(code: str) -> str:
+    """Nombre de la clase pública del código; javac exige que coincida con el archivo"""
+    match = re.search(r"public\s+(?:final\s+|abstract\s+)*class\s+(\w+)", code)
+    if not match:
+        match = re.search(r"\bclass\s+(\w+)", code)
+    return match.group(1) if match else "Main"
+
+
+def artifact_key(code: str, language: str, toolchain: str) -> str:
+    """Clave del caché de artefactos: hash del código y de la versión del compilador"""
+    digest = hashlib.sha256()
+    for part in (language, toolchain, code):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Caché en disco de artefactos compilados, indexado por `artifact_key`.
+
+    Cada entrada es un directorio con los archivos generados por el compilador.
+    Las entradas se publican con un `rename` atómico y se eliminan las menos
+    usadas recientemente cuando se supera `JUDGE_ARTIFACT_CACHE_MAX_ENTRIES`.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def get(self, key: str) -> Optional[str]:
+        path = os.path.join(self.root, key)
+        if not os.path.isdir(path):
+            CACHE_MISSES.labels(cache="artifact").inc()
+            return None
+        CACHE_HITS.labels(cache="artifact").inc()
+        os.utime(path)  # marcar como usada recientemente
+        return path
+
+    def put(self, key: str, files: Dict[str, bytes]) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, key)
+        staging = tempfile.mkdtemp(prefix=f".{key}.", dir=self.root)
+        for name, content in files.items():
+            target = os.path.join(staging, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(content)
+        try:
+            os.rename(staging, path)
+        except OSError:
+            # Otra evaluación publicó el mismo artefacto primero
+            shutil.rmtree(staging, ignore_errors=True)
+        self._prune()
+        return path
+
+    def read(self, path: str) -> Dict[str, bytes]:
+        """Leer todos los archivos de un artefacto, con rutas relativas"""
+        files = {}
+        for directory, _, names in os.walk(path):
+            for name in names:
+                full_path = os.path.join(directory, name)
+                with open(full_path, "rb") as f:
+                    files[os.path.relpath(full_path, path)] = f.read()
+        return files
+
+    def _prune(self):
+        entries = [
+            os.path.join(self.root, name) for name in os.listdir(self.root)
+            if not name.startswith(".")
+        ]
+        excess = len(entries) - settings.JUDGE_ARTIFACT_CACHE_MAX_ENTRIES
+        if excess <= 0:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:excess]:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+artifact_cache = ArtifactCache(settings.JUDGE_ARTIFACT_CACHE_DIR)
+
+
+async def local_toolchain_version(language: str) -> str:
+    """Versión del compilador local (se consulta una vez por proceso)"""
+    if language not in _toolchain_versions:
+        result = await run_process(["javac", "-version"], timeout=settings.JUDGE_COMPILE_TIMEOUT)
+        _toolchain_versions[language] = (result["stdout"] + result["stderr"]).decode("utf-8", errors="replace").strip()
+    return _toolchain_versions[language]
+
+
+async def ensure_local_cds_archive() -> bool:
+    """Generar una vez el archivo CDS de la JVM local para reducir el arranque"""
+    global _cds_ready
+    if _cds_ready is None:
+        archive = settings.JAVA_CDS_ARCHIVE
+        if not archive:
+            _cds_ready = False
+        elif os.path.exists(archive):
+            _cds_ready = True
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(archive)), exist_ok=True)
+            result = await run_process(
+                ["java", "-Xshare:dump", f"-XX:SharedArchiveFile={archive}"],
+                timeout=settings.JUDGE_COMPILE_TIMEOUT
+            )
+            _cds_ready = result["returncode"] == 0 and os.path.exists(archive)
+            if not _cds_ready:
+                logger.warning("No se pudo generar el archivo CDS de Java; se ejecutará sin él")
+    return _cds_ready
+
+
+async def compile_locally(code: str, language: str) -> Dict[str, Any]:
+    """
+    Compilar el código una vez con el compilador local, reutilizando el caché de artefactos.
+    Devuelve el directorio del artefacto y la clase principal, o un error de compilación.
+    """
+    class_name = java_class_name(code)
+    key = artifact_key(code, language, await local_toolchain_version(language))
+    artifact_dir = artifact_cache.get(key)
+    if artifact_dir:
+        return {"status": "success", "artifact_dir": artifact_dir, "class_name": class_name, "cached": True}
+
+    build_dir = tempfile.mkdtemp(prefix="compile_")
+    try:
+        source_file = os.path.join(build_dir, f"{class_name}.java")
+        with open(source_file, "w", encoding="utf-8") as f:
+            f.write(code)
+        output_dir = os.path.join(build_dir, "out")
+        os.makedirs(output_dir)
+
+        result = await run_process(
+            ["javac", "-encoding", "UTF-8", "-d", output_dir, source_file],
+            timeout=settings.JUDGE_COMPILE_TIMEOUT
+        )
+        if result["timed_out"] or result["returncode"] != 0:
+            return {
+                "status": "compilation_error",
+                "error_message": result["stderr"].decode("utf-8", errors="replace").strip()
+                or "Tiempo de compilación excedido"
+            }
+
+        artifact_dir = artifact_cache.put(key, artifact_cache.read(output_dir))
+        return {"status": "success", "artifact_dir": artifact_dir, "class_name": class_name, "cached": False}
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+async def compile_in_docker(code: str, language: str, lang_config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compilar el código una vez dentro de un contenedor del pool y guardar las
+    clases generadas en el caché de artefactos del host
+    """
+    class_name = java_class_name(code)
+    key = artifact_key(code, language, lang_config["docker_image"])
+    artifact_dir = artifact_cache.get(key)
+    if artifact_dir:
+        return {"status": "success", "artifact_dir": artifact_dir, "class_name": class_name, "cached": True}
+
+    pooled = await container_pool.acquire(language, lang_config, settings.JUDGE_COMPILE_MEMORY_LIMIT)
+    recycle = False
+    try:
+        container = pooled.container
+        await docker_backend.call(
+            "put_archive",
+            container.put_archive,
+            SANDBOX_DIR,
+            build_archive({f"{class_name}.java": code.encode("utf-8")})
+        )
+        exit_code, (_, stderr) = await docker_backend.call(
+            "exec_run",
+            container.exec_run,
+            [
+                "timeout", "-s", "KILL", str(settings.JUDGE_COMPILE_TIMEOUT),
+                "javac", "-encoding", "UTF-8", "-d", "out", f"{class_name}.java"
+            ],
+            workdir=SANDBOX_DIR,
+            demux=True
+        )
+        if exit_code != 0:
+            recycle = exit_code >= 128
+            return {
+                "status": "compilation_error",
+                "error_message": (stderr or b"").decode("utf-8", errors="replace").strip()
+                or "Tiempo de compilación excedido"
+            }
+
+        files = await docker_backend.call("get_archive", _fetch_directory, container, f"{SANDBOX_DIR}/out")
+        artifact_dir = artifact_cache.put(key, files)
+        return {"status": "success", "artifact_dir": artifact_dir, "class_name": class_name, "cached": False}
+    except Exception:
+        recycle = True
+        raise
+    finally:
+        try:
+            await docker_backend.call(
+                "exec_run",
+                pooled.container.exec_run,
+                ["find", SANDBOX_DIR, "-mindepth", "1", "-delete"]
+            )
+        except Exception:
+            recycle = True
+        await container_pool.release(pooled, recycle=recycle)
+
+
+def _fetch_directory(container, path: str) -> Dict[str, bytes]:
+    """Descargar un directorio del contenedor (se ejecuta en un hilo del backend)"""
+    stream, _ = container.get_archive(path)
+    prefix = os.path.basename(path) + "/"
+    files = {}
+    with tarfile.open(fileobj=io.BytesIO(b"".join(stream)), mode="r") as tar:
+        for member in tar.getmembers():
+            if member.isfile() and member.name.startswith(prefix):
+                files[member.name[len(prefix):]] = tar.extractfile(member).read()
+    return files
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Dict
 import os
 import logging
 import platform
@@ -25,9 +25,59 @@ class Settings(BaseSettings):
         "http://127.0.0.1:5173"
     ]
     
+    # Rutas que no se registran en las métricas HTTP
+    METRICS_EXCLUDED_PATHS: List[str] = ["/metrics", "/health"]
+    
+    # Configuración de logging
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: Dict[str, str] = {}  # nivel por logger, p. ej. {"app.core.judge": "DEBUG"}
+    LOG_FORMAT: str = "json"  # "json" o "text"
+    LOG_QUEUE_SIZE: int = 10000  # registros pendientes de escribir antes de descartar
+    # Fracción de submisiones con traza detallada (código y salidas) en nivel DEBUG
+    JUDGE_LOG_SAMPLE_RATE: float = 0.01
+    JUDGE_LOG_PAYLOAD_LIMIT: int = 512  # caracteres de código o salida incluidos en la traza
+
     # Configuración del juez de código
     JUDGE_TIMEOUT: int = 10  # segundos
     MAX_MEMORY: int = 512  # MB
+    JUDGE_COMPILE_TIMEOUT: int = 30  # segundos
+    JUDGE_COMPILE_MEMORY_LIMIT: int = 512  # MB, límite del contenedor durante la compilación
+    
+    # Caché de artefactos compilados (indexado por hash del código y versión del compilador)
+    JUDGE_ARTIFACT_CACHE_DIR: str = "./temp/artifacts"
+    JUDGE_ARTIFACT_CACHE_MAX_ENTRIES: int = 1000
+    # Caché de veredictos por código normalizado, límites y huella de los casos de prueba
+    JUDGE_VERDICT_CACHE_ENABLED: bool = True
+    JUDGE_VERDICT_CACHE_STATUSES: List[str] = ["accepted", "wrong_answer", "compilation_error"]
+    JUDGE_VERDICT_CACHE_TTL_DAYS: int = 30
+    # Archivo CDS de la JVM local para reducir el arranque de Java ("" lo desactiva)
+    JAVA_CDS_ARCHIVE: str = "./temp/java-cds.jsa"
+    
+    # Despacho de evaluaciones: "inline" (en el proceso de la API) o "queue" (workers)
+    JUDGE_DISPATCH_MODE: str = "inline"
+    # Modo inline: evaluaciones simultáneas y cupo por usuario cuando otros esperan (turnos por usuario)
+    JUDGE_INLINE_MAX_CONCURRENT: int = 4
+    JUDGE_INLINE_MAX_PER_USER: int = 1
+    # Control de admisión: submisiones esperando evaluación antes de responder 429 (0 lo desactiva)
+    JUDGE_MAX_PENDING_SUBMISSIONS: int = 500
+    JUDGE_ADMISSION_EWMA_ALPHA: float = 0.2  # peso de la última evaluación en la duración estimada
+    JUDGE_ADMISSION_DEFAULT_SECONDS: float = 2.0  # duración estimada sin evaluaciones recientes
+    JUDGE_JOB_LEASE_SECONDS: int = 60
+    JUDGE_JOB_HEARTBEAT_SECONDS: int = 15
+    JUDGE_JOB_MAX_ATTEMPTS: int = 3
+    JUDGE_JOB_RETRY_DELAY: int = 5  # segundos, multiplicado por el número de intento
+    JUDGE_WORKER_CONCURRENCY: int = 4
+    JUDGE_WORKER_POLL_INTERVAL: float = 1.0  # segundos
+    JUDGE_WORKER_METRICS_PORT: int = 9101  # puerto de /metrics de cada worker (0 lo desactiva)
+    JUDGE_QUEUE_METRICS_INTERVAL: float = 5.0  # segundos entre conteos de la cola para las métricas
+    # Re-evaluaciones en curso a la vez por proceso; solo corren sin submisiones en vivo esperando
+    JUDGE_REJUDGE_CONCURRENCY: int = 1
+    # "session": un sandbox por submisión; "per_test_case": un sandbox por caso de prueba
+    JUDGE_EXECUTION_MODE: str = "session"
+    # Ejecución en paralelo de casos de prueba (False fuerza la ejecución en serie)
+    JUDGE_PARALLEL_TEST_CASES: bool = True
+    JUDGE_MAX_PARALLEL_TEST_CASES: int = 4  # por submisión, si el problema no define otro valor
+    JUDGE_GLOBAL_MAX_PARALLEL_TEST_CASES: int = os.cpu_count() or 4  # por proceso
     
     # Configuración de Docker
     DOCKER_HOST: str = "npipe:////./pipe/docker_engine" if platform.system() == "Windows" else "unix:///var/run/docker.sock"
@@ -36,6 +86,65 @@ class Settings(BaseSettings):
     DOCKER_TLS_VERIFY: bool = False
     DOCKER_CERT_PATH: str = ""
     
+    # Backend asíncrono de Docker (pool de hilos dedicado y límites de concurrencia)
+    DOCKER_THREAD_POOL_SIZE: int = 16
+    DOCKER_MAX_CONCURRENT_CALLS: int = 16
+    DOCKER_CONNECTION_POOL_SIZE: int = 16  # conexiones HTTP al daemon
+    DOCKER_CLIENT_TIMEOUT: int = 60  # segundos
+    DOCKER_RECONNECT_INTERVAL: int = 30  # segundos antes de reintentar si el daemon no responde
+    
+    # Pool de contenedores pre-iniciados por lenguaje
+    DOCKER_POOL_ENABLED: bool = True
+    DOCKER_POOL_SIZES: Dict[str, int] = {
+        "python": 4,
+        "javascript": 2,
+        "java": 2
+    }
+    DOCKER_POOL_MAX_RUNS: int = 100  # ejecuciones antes de reciclar un contenedor
+    DOCKER_POOL_MEMORY_LIMIT: int = 256  # MB, límite inicial de los contenedores pre-iniciados
+    DOCKER_POOL_PIDS_LIMIT: int = 64
+    # Usuario sin privilegios con el que corren los programas en los contenedores (65534: nobody)
+    DOCKER_SANDBOX_UID: int = 65534
+    DOCKER_SANDBOX_TMPFS_SIZE: int = 64  # MB, directorio de trabajo y /tmp (cuentan en el límite de memoria)
+
+    # Executor por lenguaje fuera de DEBUG: "docker" o "native" (sandbox con namespaces de Linux)
+    JUDGE_EXECUTORS: Dict[str, str] = {}
+    # Sandbox nativo: subárbol de cgroup v2 delegado al juez (sin procesos propios)
+    NATIVE_SANDBOX_CGROUP_ROOT: str = "/sys/fs/cgroup/ravencode-judge/sandbox"
+    NATIVE_SANDBOX_PIDS_LIMIT: int = 64  # procesos e hilos por ejecución
+    NATIVE_SANDBOX_NOFILE_LIMIT: int = 64
+    NATIVE_SANDBOX_TMPFS_SIZE: int = 64  # MB, /tmp del sandbox (cuenta en el límite de memoria)
+    # Lenguajes con RLIMIT_AS; la JVM y V8 reservan mucha memoria virtual y se limitan solo con el cgroup
+    NATIVE_SANDBOX_ADDRESS_SPACE_LANGUAGES: List[str] = ["python"]
+    # Rutas del host ocultas al programa, además de los directorios de datos del juez y .env
+    NATIVE_SANDBOX_HIDDEN_PATHS: List[str] = ["/root", "/home", "/run", "/var/run"]
+
+    # Progreso de las submisiones por SSE/WebSocket
+    PROGRESS_QUEUE_SIZE: int = 256  # eventos pendientes por suscriptor
+    PROGRESS_KEEPALIVE_SECONDS: float = 15.0  # también intervalo de revisión del estado guardado
+    # Compartir el progreso entre instancias y workers con un change stream (requiere replica set)
+    PROGRESS_CHANGE_STREAM: bool = False
+    PROGRESS_CHANGE_STREAM_RETRY_SECONDS: float = 5.0
+    PROGRESS_EVENTS_TTL_SECONDS: int = 3600
+
+    # Almacén de datos de prueba: "gridfs" (con caché en disco) o "local" (solo el directorio)
+    JUDGE_BLOB_STORE: str = "gridfs"
+    JUDGE_BLOB_CACHE_DIR: str = "./temp/blobs"
+    JUDGE_OUTPUT_PREVIEW_BYTES: int = 65536  # salida incluida en los resultados
+    JUDGE_OUTPUT_LIMIT: int = 16 * 1024 * 1024  # bytes de salida por caso, si el problema no define otro
+    JUDGE_STORED_OUTPUT_BYTES: int = 1024  # salida y error guardados por caso en `test_case_results`
+    
+    # Paquetes de problemas (.tar.gz) para importar y exportar bancos completos
+    PROBLEM_PACKAGE_MAX_BYTES: int = 512 * 1024 * 1024  # tamaño del archivo subido
+    PROBLEM_PACKAGE_MAX_UNPACKED_BYTES: int = 2 * 1024 * 1024 * 1024  # total descomprimido
+    PROBLEM_PACKAGE_MAX_FILES: int = 20000
+    
+    # Caché en memoria de problemas y casos de prueba
+    PROBLEM_CACHE_ENABLED: bool = True
+    PROBLEM_CACHE_MAX_ENTRIES: int = 512
+    PROBLEM_CACHE_TTL: int = 300  # segundos
+    PROBLEM_CACHE_VERSION_CHECK_INTERVAL: float = 1.0  # segundos entre consultas del contador global
+    
     # Configuración de archivos
     UPLOAD_DIR: str = "./uploads"
     TEMP_DIR: str = "./temp"
@@ -1,9 +1,37 @@
-from typing import Dict, List, Optional
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from app.models.base import User, Problem, TestCase, Submission, TestCaseResult
+from app.core.config import settings
 from app.core.mongodb import get_database
+from app.core.metrics import CACHE_HITS, CACHE_MISSES
+from app.core.verdict_cache import compute_test_set_fingerprint
+from app.core.pagination import encode_cursor, decode_cursor, keyset_filter
+
+# Campos de los problemas que devuelve el listado (sin descripción ni casos de prueba)
+PROBLEM_LIST_PROJECTION = {
+    "title": 1,
+    "difficulty": 1,
+    "time_limit": 1,
+    "memory_limit": 1,
+    "created_at": 1
+}
+
+# Campos de las submisiones que devuelve el listado (sin resultados por caso)
+SUBMISSION_LIST_PROJECTION = {
+    "problem_id": 1,
+    "code": 1,
+    "language": 1,
+    "status": 1,
+    "score": 1,
+    "execution_time": 1,
+    "created_at": 1
+}
 
 def convert_object_ids(data: dict) -> dict:
     """Convierte todos los ObjectId a string en un diccionario"""
@@ -21,6 +49,92 @@ def convert_object_ids(data: dict) -> dict:
             result[key] = value
     return result
 
+class ProblemCache:
+    """
+    Caché LRU con TTL, en memoria del proceso, para problemas y sus casos de prueba.
+
+    Para mantener coherentes varios procesos (workers de uvicorn o de evaluación)
+    cada escritura incrementa un contador global en la colección `cache_versions`;
+    los lectores lo consultan como máximo cada `PROBLEM_CACHE_VERSION_CHECK_INTERVAL`
+    segundos y vacían su caché si cambió. Siempre se devuelven copias.
+    """
+
+    VERSION_ID = "problems"
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        # Cambia con cada invalidación; evita guardar datos leídos antes de ella
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def clear(self):
+        self._entries.clear()
+        self._generation += 1
+
+    async def _sync_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < settings.PROBLEM_CACHE_VERSION_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        doc = await get_database().cache_versions.find_one({"_id": self.VERSION_ID})
+        version = doc["version"] if doc else 0
+        if self._version is not None and version != self._version:
+            self.clear()
+        self._version = version
+
+    async def get(self, key: Tuple[str, str]) -> Any:
+        if not settings.PROBLEM_CACHE_ENABLED:
+            return None
+        await self._sync_version()
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] > settings.PROBLEM_CACHE_TTL:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            CACHE_MISSES.labels(cache=key[0]).inc()
+            return None
+        CACHE_HITS.labels(cache=key[0]).inc()
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Tuple[str, str], value: Any, generation: int):
+        if not settings.PROBLEM_CACHE_ENABLED or generation != self._generation:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > settings.PROBLEM_CACHE_MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    async def invalidate(self, problem_id: str):
+        """Descartar un problema localmente y avisar a los demás procesos"""
+        self._entries.pop(("problem", problem_id), None)
+        self._entries.pop(("test_cases", problem_id), None)
+        for key in [key for key in self._entries if key[0] == "problem_count"]:
+            del self._entries[key]
+        self._generation += 1
+        doc = await get_database().cache_versions.find_one_and_update(
+            {"_id": self.VERSION_ID},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        # Si otro proceso también escribió desde la última consulta, vaciar todo
+        if self._version is None or doc["version"] != self._version + 1:
+            self.clear()
+        self._version = doc["version"]
+
+# Instancia global del caché de problemas del proceso
+problem_cache = ProblemCache()
+
+async def invalidate_problem_cache(problem_id: str):
+    """Invalidar el caché de un problema tras crearlo, modificarlo o cambiar sus casos de prueba"""
+    await problem_cache.invalidate(str(problem_id))
+
 # Funciones de conveniencia para MongoDB
 def get_db():
     """Obtener instancia de la base de datos"""
@@ -45,29 +159,143 @@ async def get_user_by_email(email: str) -> Optional[User]:
     return None
 
 async def get_problem_by_id(problem_id: str) -> Optional[Problem]:
-    """Obtener problema por ID"""
+    """Obtener problema por ID (usa el caché de problemas)"""
+    key = ("problem", str(problem_id))
+    problem = await problem_cache.get(key)
+    if problem is not None:
+        return problem.model_copy(deep=True)
+    
+    generation = problem_cache.generation
     db = get_database()
     problem_data = await db.problems.find_one({"_id": ObjectId(problem_id)})
     if problem_data:
         problem_data = convert_object_ids(problem_data)
-        return Problem(**problem_data)
+        problem = Problem(**problem_data)
+        problem_cache.put(key, problem, generation)
+        return problem.model_copy(deep=True)
     return None
 
+async def get_problem_list(
+    limit: int = 100,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    difficulty: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Obtener una página del listado de problemas ordenado por (difficulty, _id),
+    con solo los campos del listado. Devuelve también el cursor de la página
+    siguiente (None si no hay más).
+    """
+    db = get_database()
+    query: Dict[str, Any] = {}
+    if difficulty:
+        query["difficulty"] = difficulty
+    if cursor:
+        last_difficulty, last_id = decode_cursor(cursor)
+        query.update(keyset_filter("difficulty", last_difficulty, last_id, descending=False))
+
+    # Se pide un documento de más para saber si hay otra página
+    problems_cursor = (
+        db.problems.find(query, PROBLEM_LIST_PROJECTION)
+        .sort([("difficulty", 1), ("_id", 1)])
+        .skip(skip)
+        .limit(limit + 1)
+    )
+    problems_data = await problems_cursor.to_list(length=limit + 1)
+    next_cursor = None
+    if len(problems_data) > limit:
+        problems_data = problems_data[:limit]
+        next_cursor = encode_cursor(problems_data[-1], "difficulty")
+    for problem in problems_data:
+        problem["_id"] = str(problem["_id"])
+    return problems_data, next_cursor
+
+async def count_problems(difficulty: Optional[str] = None) -> int:
+    """Total de problemas (con la dificultad dada), guardado en el caché de problemas"""
+    key = ("problem_count", difficulty or "")
+    total = await problem_cache.get(key)
+    if total is not None:
+        return total
+    
+    generation = problem_cache.generation
+    query = {"difficulty": difficulty} if difficulty else {}
+    total = await get_database().problems.count_documents(query)
+    problem_cache.put(key, total, generation)
+    return total
+
 async def get_test_cases_by_problem_id(problem_id: str) -> List[TestCase]:
-    """Obtener casos de prueba por ID del problema"""
+    """Obtener casos de prueba por ID del problema (usa el caché de problemas)"""
+    key = ("test_cases", str(problem_id))
+    test_cases = await problem_cache.get(key)
+    if test_cases is not None:
+        return [tc.model_copy(deep=True) for tc in test_cases]
+    
+    generation = problem_cache.generation
+    test_cases = await _fetch_test_cases(problem_id)
+    problem_cache.put(key, test_cases, generation)
+    return [tc.model_copy(deep=True) for tc in test_cases]
+
+async def _fetch_test_cases(problem_id: str) -> List[TestCase]:
+    """Leer los casos de prueba de la base de datos sin pasar por el caché"""
     db = get_database()
     test_cases_cursor = db.test_cases.find({"problem_id": ObjectId(problem_id)})
     test_cases_data = await test_cases_cursor.to_list(length=None)
     test_cases_data = [convert_object_ids(tc) for tc in test_cases_data]
     return [TestCase(**tc) for tc in test_cases_data]
 
-async def get_submissions_by_user_email(user_email: str) -> List[Submission]:
-    """Obtener submisiones por email del usuario"""
+async def update_test_set_fingerprint(problem_id: str, test_cases: Optional[List[TestCase]] = None) -> str:
+    """
+    Recalcular y guardar la huella de los casos de prueba de un problema.
+    Invalida el caché del problema.
+    """
+    if test_cases is None:
+        test_cases = await _fetch_test_cases(problem_id)
+    fingerprint = compute_test_set_fingerprint(test_cases)
+    db = get_database()
+    await db.problems.update_one(
+        {"_id": ObjectId(problem_id)},
+        {"$set": {"test_set_fingerprint": fingerprint}}
+    )
+    await invalidate_problem_cache(problem_id)
+    return fingerprint
+
+async def get_submissions_by_user_email(
+    user_email: str,
+    limit: int = 100,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    problem_id: Optional[str] = None,
+    status: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Obtener una página de submisiones del usuario, de la más reciente a la más
+    antigua, con los campos del listado. Filtra, ordena y limita en MongoDB con
+    el índice (user_email, created_at, _id). Devuelve también el cursor de la
+    página siguiente (None si no hay más); con `cursor` no hace falta `skip`.
+    """
     db = get_database()
-    submissions_cursor = db.submissions.find({"user_email": user_email})
-    submissions_data = await submissions_cursor.to_list(length=None)
-    submissions_data = [convert_object_ids(s) for s in submissions_data]
-    return [Submission(**s) for s in submissions_data]
+    query: Dict[str, Any] = {"user_email": user_email}
+    if problem_id:
+        query["problem_id"] = ObjectId(problem_id)
+    if status:
+        query["status"] = status
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query.update(keyset_filter("created_at", created_at, last_id))
+
+    # Se pide un documento de más para saber si hay otra página
+    submissions_cursor = (
+        db.submissions.find(query, SUBMISSION_LIST_PROJECTION)
+        .sort([("created_at", -1), ("_id", -1)])
+        .skip(skip)
+        .limit(limit + 1)
+    )
+    submissions_data = await submissions_cursor.to_list(length=limit + 1)
+    next_cursor = None
+    if len(submissions_data) > limit:
+        submissions_data = submissions_data[:limit]
+        next_cursor = encode_cursor(submissions_data[-1], "created_at")
+    return [convert_object_ids(s) for s in submissions_data], next_cursor
 
 async def get_submission_by_id(submission_id: str) -> Optional[Submission]:
     """Obtener submisión por ID"""
@@ -76,4 +304,61 @@ async def get_submission_by_id(submission_id: str) -> Optional[Submission]:
     if submission_data:
         submission_data = convert_object_ids(submission_data)
         return Submission(**submission_data)
-    return None 
\ No newline at end of file
+    return None 
+
+def _truncate_stored(text: Optional[str]) -> Tuple[Optional[str], bool]:
+    """Recortar un texto a `JUDGE_STORED_OUTPUT_BYTES` bytes en UTF-8; indica si se recortó"""
+    if text is None:
+        return None, False
+    data = text.encode("utf-8")
+    if len(data) <= settings.JUDGE_STORED_OUTPUT_BYTES:
+        return text, False
+    return data[:settings.JUDGE_STORED_OUTPUT_BYTES].decode("utf-8", errors="ignore"), True
+
+async def save_test_case_results(submission_id: str, results: List[Dict[str, Any]]):
+    """
+    Guardar los resultados por caso de una submisión en `test_case_results` con
+    un solo `insert_many`, reemplazando los de una evaluación anterior. La salida
+    se guarda recortada junto con el hash SHA-256 de la salida capturada.
+    """
+    db = get_database()
+    submission_oid = ObjectId(submission_id)
+    now = datetime.now()
+    documents = []
+    for result in results:
+        if "test_case_id" not in result:
+            continue
+        output, output_truncated = _truncate_stored(result.get("output"))
+        error_message, _ = _truncate_stored(result.get("error_message"))
+        output_hash = result.get("output_hash")
+        if output_hash is None and result.get("output") is not None:
+            output_hash = hashlib.sha256(result["output"].encode("utf-8")).hexdigest()
+        document = {
+            "submission_id": submission_oid,
+            "test_case_id": ObjectId(result["test_case_id"]),
+            "test_case_fingerprint": result.get("test_case_fingerprint"),
+            "index": result["index"],
+            "status": result["status"],
+            "execution_time": result.get("execution_time"),
+            "cpu_time": result.get("cpu_time"),
+            "memory_used": result.get("memory_used"),
+            "output": output,
+            # Un resultado reutilizado en una re-evaluación conserva el hash de la salida completa
+            "output_hash": output_hash,
+            "output_truncated": output_truncated or result.get("output_truncated", False),
+            "error_message": error_message,
+            "created_at": now
+        }
+        if result.get("first_difference"):
+            document["first_difference"] = result["first_difference"]
+        documents.append(document)
+
+    await db.test_case_results.delete_many({"submission_id": submission_oid})
+    if documents:
+        await db.test_case_results.insert_many(documents, ordered=False)
+
+async def get_test_case_results(submission_id: str) -> List[Dict[str, Any]]:
+    """Resultados por caso de una submisión, en el orden de los casos"""
+    db = get_database()
+    cursor = db.test_case_results.find({"submission_id": ObjectId(submission_id)}).sort("index", 1)
+    return [convert_object_ids(result) async for result in cursor]
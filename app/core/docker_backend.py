@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import docker
+
+from app.core.config import settings
+from app.core.metrics import DOCKER_CALL_DURATION, DOCKER_CALLS_IN_FLIGHT, DOCKER_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDockerBackend:
+    """
+    Backend asíncrono para el SDK de Docker.
+
+    El SDK hace llamadas HTTP síncronas al daemon; aquí se ejecutan en un pool de
+    hilos dedicado y acotado, con su propio pool de conexiones al daemon, para no
+    bloquear el event loop. Cada llamada se limita por un semáforo y su latencia
+    se registra por operación.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._client = None
+        self._client_lock: Optional[asyncio.Lock] = None
+        self._unavailable_until = 0.0
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.DOCKER_THREAD_POOL_SIZE,
+                thread_name_prefix="docker"
+            )
+            self._semaphore = asyncio.Semaphore(settings.DOCKER_MAX_CONCURRENT_CALLS)
+            self._client_lock = asyncio.Lock()
+
+    async def get_client(self):
+        """Obtener el cliente de Docker, creándolo y verificándolo la primera vez"""
+        self._ensure_started()
+        if self._client is not None:
+            return self._client
+
+        async with self._client_lock:
+            if self._client is not None:
+                return self._client
+            # Evitar reintentar la conexión en cada llamada si el daemon no responde
+            if time.monotonic() < self._unavailable_until:
+                return None
+            try:
+                client = await self._run(
+                    "from_env",
+                    docker.from_env,
+                    max_pool_size=settings.DOCKER_CONNECTION_POOL_SIZE,
+                    timeout=settings.DOCKER_CLIENT_TIMEOUT
+                )
+                await self._run("ping", client.ping)
+                self._client = client
+            except Exception as e:
+                logger.error(f"Error inicializando Docker: {e}")
+                self._unavailable_until = time.monotonic() + settings.DOCKER_RECONNECT_INTERVAL
+        return self._client
+
+    async def call(self, operation: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Ejecutar una llamada del SDK de Docker fuera del event loop"""
+        self._ensure_started()
+        return await self._run(operation, fn, *args, **kwargs)
+
+    async def _run(self, operation: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            DOCKER_CALLS_IN_FLIGHT.inc()
+            start_time = time.perf_counter()
+            try:
+                return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+            except Exception:
+                DOCKER_ERRORS.labels(operation=operation).inc()
+                raise
+            finally:
+                DOCKER_CALL_DURATION.labels(operation=operation).observe(time.perf_counter() - start_time)
+                DOCKER_CALLS_IN_FLIGHT.dec()
+
+    def shutdown(self):
+        """Cerrar el cliente y el pool de hilos"""
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception as e:
+                logger.warning(f"Error cerrando el cliente de Docker: {e}")
+            self._client = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# Instancia global del backend compartida por todo el proceso
+docker_backend = AsyncDockerBackend()
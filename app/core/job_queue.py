@@ -0,0 +1,180 @@
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.core.mongodb import get_database
+
+logger = logging.getLogger(__name__)
+
+# Estados de un trabajo en la colección `judge_jobs`
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Carriles de la cola: las submisiones de los estudiantes y las re-evaluaciones,
+# que los workers solo toman cuando no hay trabajos del primero
+LANE_LIVE = "live"
+LANE_REJUDGE = "rejudge"
+
+
+def _job_document(submission_id: str, lane: str, now: datetime) -> dict:
+    return {
+        "submission_id": ObjectId(submission_id),
+        "lane": lane,
+        "status": JOB_QUEUED,
+        "attempts": 0,
+        "available_at": now,
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+def _lane_filter(lane: str) -> dict:
+    # Los trabajos encolados antes de existir los carriles no tienen `lane`
+    return {"lane": {"$ne": LANE_REJUDGE}} if lane == LANE_LIVE else {"lane": lane}
+
+
+async def enqueue_job(submission_id: str, lane: str = LANE_LIVE) -> str:
+    """Encolar la evaluación de una submisión para los workers"""
+    db = get_database()
+    result = await db.judge_jobs.insert_one(_job_document(submission_id, lane, datetime.now()))
+    return str(result.inserted_id)
+
+
+async def enqueue_jobs(submission_ids: List[str], lane: str) -> int:
+    """Encolar varias evaluaciones con una sola inserción"""
+    if not submission_ids:
+        return 0
+    now = datetime.now()
+    await get_database().judge_jobs.insert_many(
+        [_job_document(submission_id, lane, now) for submission_id in submission_ids]
+    )
+    return len(submission_ids)
+
+
+async def active_job_submission_ids(lane: str) -> List[ObjectId]:
+    """Submisiones con un trabajo del carril en cola o en curso"""
+    return await get_database().judge_jobs.distinct(
+        "submission_id",
+        {**_lane_filter(lane), "status": {"$in": [JOB_QUEUED, JOB_RUNNING]}}
+    )
+
+
+async def claim_job(worker_id: str, lane: str = LANE_LIVE) -> Optional[dict]:
+    """
+    Reclamar atómicamente el trabajo más antiguo disponible del carril.
+
+    Un trabajo está disponible si está en cola o si su lease expiró porque el
+    worker que lo tenía dejó de enviar heartbeats.
+    """
+    db = get_database()
+    now = datetime.now()
+    return await db.judge_jobs.find_one_and_update(
+        {
+            **_lane_filter(lane),
+            "attempts": {"$lt": settings.JUDGE_JOB_MAX_ATTEMPTS},
+            "$or": [
+                {"status": JOB_QUEUED, "available_at": {"$lte": now}},
+                {"status": JOB_RUNNING, "lease_expires_at": {"$lt": now}}
+            ]
+        },
+        {
+            "$set": {
+                "status": JOB_RUNNING,
+                "worker_id": worker_id,
+                "lease_expires_at": now + timedelta(seconds=settings.JUDGE_JOB_LEASE_SECONDS),
+                "started_at": now,
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def heartbeat_job(job_id, worker_id: str) -> bool:
+    """Extender el lease de un trabajo; devuelve False si el worker ya no lo tiene"""
+    db = get_database()
+    now = datetime.now()
+    result = await db.judge_jobs.update_one(
+        {"_id": job_id, "worker_id": worker_id, "status": JOB_RUNNING},
+        {"$set": {
+            "lease_expires_at": now + timedelta(seconds=settings.JUDGE_JOB_LEASE_SECONDS),
+            "updated_at": now
+        }}
+    )
+    return result.modified_count > 0
+
+
+async def complete_job(job_id, worker_id: str):
+    """Marcar un trabajo como terminado"""
+    db = get_database()
+    await db.judge_jobs.update_one(
+        {"_id": job_id, "worker_id": worker_id},
+        {"$set": {"status": JOB_DONE, "finished_at": datetime.now(), "updated_at": datetime.now()}}
+    )
+
+
+async def fail_job(job_id, worker_id: str, error: str):
+    """Devolver un trabajo a la cola con espera, o marcarlo como fallido si agotó los intentos"""
+    db = get_database()
+    job = await db.judge_jobs.find_one({"_id": job_id, "worker_id": worker_id})
+    if not job:
+        return
+
+    now = datetime.now()
+    if job["attempts"] >= settings.JUDGE_JOB_MAX_ATTEMPTS:
+        update = {"status": JOB_FAILED, "error": error, "finished_at": now, "updated_at": now}
+    else:
+        update = {
+            "status": JOB_QUEUED,
+            "error": error,
+            "available_at": now + timedelta(seconds=settings.JUDGE_JOB_RETRY_DELAY * job["attempts"]),
+            "updated_at": now
+        }
+    await db.judge_jobs.update_one({"_id": job_id, "worker_id": worker_id}, {"$set": update})
+
+
+async def reap_expired_jobs() -> int:
+    """
+    Marcar como fallidos los trabajos cuyo lease expiró y ya agotaron sus intentos,
+    y marcar sus submisiones como error. Devuelve la cantidad de trabajos afectados.
+    """
+    db = get_database()
+    now = datetime.now()
+    reaped = 0
+    while True:
+        job = await db.judge_jobs.find_one_and_update(
+            {
+                "status": JOB_RUNNING,
+                "lease_expires_at": {"$lt": now},
+                "attempts": {"$gte": settings.JUDGE_JOB_MAX_ATTEMPTS}
+            },
+            {"$set": {"status": JOB_FAILED, "error": "Lease expirado", "finished_at": now, "updated_at": now}}
+        )
+        if not job:
+            return reaped
+        reaped += 1
+        logger.warning(f"Trabajo {job['_id']} fallido tras {job['attempts']} intentos")
+        if job.get("lane") == LANE_REJUDGE:
+            continue  # la submisión conserva su veredicto anterior
+        await db.submissions.update_one(
+            {"_id": job["submission_id"], "status": {"$in": ["pending", "running"]}},
+            {"$set": {"status": "error"}}
+        )
+
+
+async def count_queued_jobs(lane: str = LANE_LIVE) -> int:
+    """Cantidad de trabajos del carril esperando un worker"""
+    return await get_database().judge_jobs.count_documents({**_lane_filter(lane), "status": JOB_QUEUED})
+
+
+async def count_running_jobs() -> int:
+    """Cantidad de trabajos evaluándose en los workers, de cualquier carril"""
+    return await get_database().judge_jobs.count_documents({"status": JOB_RUNNING})
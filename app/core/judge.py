@@ -1,27 +1,51 @@
 import asyncio
-import subprocess
+import functools
+import logging
 import tempfile
+import shutil
 import os
+import shlex
 import time
 import docker
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
 
 from app.core.config import settings
-from app.core.database import get_problem_by_id, get_test_cases_by_problem_id
-from app.models.base import Problem, TestCase, TestCaseResult
+from app.core.database import get_problem_by_id, get_test_cases_by_problem_id, update_test_set_fingerprint
+from app.core.blob_store import test_case_paths, open_mmap, read_preview
+from app.core.comparator import StreamingComparator, compare_output
+from app.core.compiler import (
+    compile_locally, compile_in_docker, ensure_local_cds_archive, artifact_cache, DOCKER_JAVA_CDS_ARCHIVE
+)
+from app.core.docker_backend import docker_backend
+from app.core.logging_config import trace_enabled, truncate
+from app.core.metrics import SANDBOX_STARTUP_TIME, TEST_CASE_RUN_TIME
+from app.core.native_sandbox import native_sandbox
+from app.core.process import run_process_streaming
+from app.core.sandbox_pool import (
+    container_pool, build_archive, parse_cgroup_usage, SANDBOX_DIR, CGROUP_USAGE_FUNCTION
+)
+from app.core.sandbox_session import DockerSandboxSession
+from app.core.verdict_cache import (
+    verdict_key, get_cached_verdict, store_verdict, test_case_fingerprint, judging_limits_key
+)
+from app.models.base import Problem, TestCase, TestCaseResult, JudgingPolicy
+
+logger = logging.getLogger(__name__)
+
+# Límite global de casos de prueba ejecutándose a la vez en este proceso
+test_case_semaphore = asyncio.Semaphore(settings.JUDGE_GLOBAL_MAX_PARALLEL_TEST_CASES)
+
+# Marca de la línea con los recursos medidos que el script del pool agrega a stderr
+USAGE_MARKER = "__judge_usage__"
 
 class CodeJudge:
     """Clase principal para evaluar código de estudiantes"""
     
     def __init__(self):
-        """Inicializar el juez con la configuración de Docker"""
-        try:
-            self.docker_client = docker.from_env()
-            self.docker_client.ping()  # Verificar conexión
-        except Exception as e:
-            print(f"Error inicializando Docker: {str(e)}")
-            self.docker_client = None
-            
+        """
+        Inicializar el juez. La conexión con Docker se crea de forma perezosa
+        y asíncrona a través de `docker_backend`.
+        """
         self.supported_languages = {
             "python": {
                 "extension": ".py",
@@ -36,26 +60,60 @@ class CodeJudge:
             "java": {
                 "extension": ".java",
                 "command": "java",
-                "docker_image": "openjdk:11-slim"
+                "docker_image": "openjdk:11-slim",
+                # Se compila una vez por submisión antes de ejecutar los casos
+                "compiled": True,
+                # Generar el archivo CDS al iniciar cada contenedor del pool
+                "warm_up_command": ["java", "-Xshare:dump", f"-XX:SharedArchiveFile={DOCKER_JAVA_CDS_ARCHIVE}"]
             }
         }
     
+    async def warm_up_pool(self):
+        """Pre-iniciar los contenedores del pool para cada lenguaje soportado"""
+        if settings.DOCKER_POOL_ENABLED and await docker_backend.get_client():
+            await container_pool.warm_up(self.supported_languages)
+        if "native" in settings.JUDGE_EXECUTORS.values():
+            await native_sandbox.check()
+    
+    async def _executor(self, language: str) -> str:
+        """
+        Executor del lenguaje: "local" en DEBUG y, fuera de DEBUG, el configurado
+        en `JUDGE_EXECUTORS` ("docker" por defecto). Si el sandbox nativo no está
+        disponible en el host se usa Docker.
+        """
+        if settings.DEBUG:
+            return "local"
+        executor = settings.JUDGE_EXECUTORS.get(language, "docker")
+        if executor == "native" and not await native_sandbox.check():
+            return "docker"
+        return executor
+    
     async def evaluate(
         self, 
         code: str, 
         language: str, 
-        problem_id: str
+        problem_id: str,
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        reuse_results: Optional[Dict[str, Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
-        Evaluar código contra todos los casos de prueba de un problema
+        Evaluar código contra todos los casos de prueba de un problema.
+        
+        `on_progress` recibe un evento por cada caso de prueba a medida que
+        termina (en las sesiones de Docker, al terminar cada contenedor).
+        
+        `reuse_results` (id del caso -> resultado guardado) permite re-evaluar
+        de forma incremental: esos casos no se ejecutan y su resultado se
+        combina con los de los demás. Se ignora con `stop_on_first_failure`,
+        donde el resultado de cada caso depende de los anteriores.
         """
         try:
-            print(f"\nIniciando evaluación para problema {problem_id}")
+            logger.info("Iniciando evaluación", extra={"problem_id": problem_id, "language": language})
             
             # Obtener el problema y sus casos de prueba
             problem = await get_problem_by_id(problem_id)
             if not problem:
-                print("❌ Problema no encontrado")
+                logger.warning("Problema no encontrado", extra={"problem_id": problem_id})
                 return {
                     "status": "error",
                     "message": "Problema no encontrado"
@@ -63,53 +121,176 @@ class CodeJudge:
 
             test_cases = await get_test_cases_by_problem_id(problem_id)
             if not test_cases:
-                print("❌ No hay casos de prueba para este problema")
+                logger.warning("No hay casos de prueba para el problema", extra={"problem_id": problem_id})
                 return {
                     "status": "error",
                     "message": "No hay casos de prueba para este problema"
                 }
             
-            print(f"✅ Encontrados {len(test_cases)} casos de prueba")
-            
             # Verificar que el lenguaje es soportado
             if language not in self.supported_languages:
-                print(f"❌ Lenguaje {language} no soportado")
+                logger.warning("Lenguaje no soportado", extra={"language": language})
                 return {
                     "status": "error",
                     "message": f"Lenguaje {language} no soportado"
                 }
             
-            print(f"✅ Lenguaje {language} soportado")
-            
             total_test_cases = len(test_cases)
+            
+            # Con qué casos y límites se evaluó; permite detectar veredictos desactualizados
+            fingerprint = problem.test_set_fingerprint
+            if fingerprint is None:
+                fingerprint = await update_test_set_fingerprint(problem_id, test_cases)
+            judged_with = {"test_set_fingerprint": fingerprint, "limits_key": judging_limits_key(problem)}
+            
+            # Un código idéntico ya evaluado con los mismos casos se resuelve sin sandbox
+            cache_key = None
+            if settings.JUDGE_VERDICT_CACHE_ENABLED:
+                cache_key = verdict_key(code, language, problem, fingerprint)
+                cached = await get_cached_verdict(cache_key, language)
+                if cached is not None:
+                    logger.info("Veredicto reutilizado del caché", extra={"status": cached["status"]})
+                    # La huella no depende de los ids: se asignan los casos de este problema
+                    self._tag_test_cases(cached["test_case_results"], test_cases)
+                    return {**cached, **judged_with}
+            
+            stop_on_failure = problem.judging_policy == JudgingPolicy.STOP_ON_FIRST_FAILURE
+            reused = {}
+            if reuse_results and not stop_on_failure:
+                reused = {
+                    str(test_case.id): reuse_results[str(test_case.id)]
+                    for test_case in test_cases if str(test_case.id) in reuse_results
+                }
+            pending_positions = [i for i, test_case in enumerate(test_cases) if str(test_case.id) not in reused]
+            pending_test_cases = [test_cases[i] for i in pending_positions]
+            if reused:
+                logger.info(
+                    "Re-evaluación incremental",
+                    extra={"reused_test_cases": len(reused), "pending_test_cases": len(pending_test_cases)}
+                )
+            
+            # Compilar una sola vez; un error de compilación termina la evaluación
+            artifact = None
+            if self.supported_languages[language].get("compiled") and pending_test_cases:
+                artifact = await self._compile(code, language)
+                if artifact["status"] != "success":
+                    logger.info("Error de compilación", extra={"status": artifact["status"]})
+                    if trace_enabled(logger):
+                        logger.debug("Mensaje del compilador", extra={"payload": truncate(artifact.get("error_message"))})
+                    if artifact["status"] == "error":
+                        return {
+                            "status": "error",
+                            "message": artifact.get("error_message"),
+                            "score": 0.0
+                        }
+                    result = {
+                        "status": "compilation_error",
+                        "score": 0.0,
+                        "execution_time": 0,
+                        "cpu_time": 0,
+                        "memory_used": 0,
+                        "passed_test_cases": 0,
+                        "total_test_cases": total_test_cases,
+                        "test_case_results": [],
+                        "error_message": artifact.get("error_message"),
+                        **judged_with
+                    }
+                    if cache_key:
+                        await store_verdict(cache_key, language, result)
+                    return result
+                logger.debug("Compilación completada", extra={"cached": artifact["cached"]})
+            
             passed_test_cases = 0
             total_execution_time = 0
+            total_cpu_time = 0
             total_memory_used = 0
             test_case_results = []
             
-            # Evaluar cada caso de prueba
-            print("\nEjecutando casos de prueba...")
-            for i, test_case in enumerate(test_cases, 1):
-                print(f"\nCaso de prueba {i}/{total_test_cases}")
-                result = await self._run_test_case(
+            # Evaluar los casos de prueba, en paralelo hasta el límite configurado
+            parallelism = self._get_parallelism(problem)
+            output_limit = problem.output_limit or settings.JUDGE_OUTPUT_LIMIT
+            
+            async def report_test_case(index: int, result: Dict[str, Any]):
+                if on_progress is not None:
+                    await on_progress({
+                        "type": "test_case",
+                        "index": pending_positions[index] + 1,
+                        "total": total_test_cases,
+                        "status": result["status"],
+                        "execution_time": result.get("execution_time"),
+                        "cpu_time": result.get("cpu_time"),
+                        "memory_used": result.get("memory_used")
+                    })
+            
+            logger.debug(
+                "Ejecutando casos de prueba",
+                extra={
+                    "test_cases": len(pending_test_cases),
+                    "parallelism": parallelism,
+                    "policy": problem.judging_policy.value
+                }
+            )
+            if not pending_test_cases:
+                test_case_results = []
+            elif settings.JUDGE_EXECUTION_MODE == "session":
+                test_case_results = await self._run_session(
                     code=code,
                     language=language,
-                    input_data=test_case.input_data,
-                    expected_output=test_case.expected_output,
+                    test_cases=pending_test_cases,
                     time_limit=problem.time_limit,
-                    memory_limit=problem.memory_limit
+                    memory_limit=problem.memory_limit,
+                    output_limit=output_limit,
+                    parallelism=parallelism,
+                    stop_on_failure=stop_on_failure,
+                    artifact=artifact,
+                    on_result=report_test_case
                 )
-                
-                test_case_results.append(result)
-                
+            else:
+                test_case_results = await self._gather_bounded(
+                    [
+                        functools.partial(
+                            self._run_test_case,
+                            code=code,
+                            language=language,
+                            test_case=test_case,
+                            time_limit=problem.time_limit,
+                            memory_limit=problem.memory_limit,
+                            output_limit=output_limit,
+                            artifact=artifact
+                        )
+                        for test_case in pending_test_cases
+                    ],
+                    parallelism,
+                    stop_on_failure=stop_on_failure,
+                    on_result=report_test_case
+                )
+            
+            if stop_on_failure:
+                test_case_results = self._skip_after_first_failure(test_case_results)
+            if reused:
+                # Combinar en el orden de los casos los resultados reutilizados y los nuevos
+                new_results = iter(test_case_results)
+                test_case_results = [
+                    dict(reused[str(test_case.id)]) if str(test_case.id) in reused else next(new_results)
+                    for test_case in test_cases
+                ]
+            self._tag_test_cases(test_case_results, test_cases)
+            
+            first_failure = None
+            for i, result in enumerate(test_case_results, 1):
+                logger.debug("Caso de prueba evaluado", extra={"case": i, "status": result["status"]})
                 if result["status"] == "accepted":  # Verificar estado "accepted"
                     passed_test_cases += 1
-                    print(f"✅ Caso {i} pasado")
-                else:
-                    print(f"❌ Caso {i} fallido")
+                elif result["status"] != "skipped":
+                    first_failure = first_failure or result["status"]
                 
                 if result.get("execution_time"):
                     total_execution_time += result["execution_time"]
+                    if result.get("test_case_id") not in reused:
+                        TEST_CASE_RUN_TIME.labels(language=language).observe(result["execution_time"] / 1000.0)
+                
+                if result.get("cpu_time"):
+                    total_cpu_time += result["cpu_time"]
                 
                 if result.get("memory_used"):
                     total_memory_used = max(total_memory_used, result["memory_used"])
@@ -119,63 +300,208 @@ class CodeJudge:
             
             if passed_test_cases == total_test_cases:
                 final_status = "accepted"
-                print("\n✅ Todos los casos pasaron!")
             else:
-                final_status = "wrong_answer"
-                if passed_test_cases > 0:
-                    print(f"\n⚠️ Pasaron {passed_test_cases} de {total_test_cases} casos")
-                else:
-                    print("\n❌ Ningún caso pasó")
+                # En modo ICPC el estado final es el veredicto del primer caso fallido
+                final_status = first_failure if stop_on_failure else "wrong_answer"
             
-            print(f"Score final: {score}%")
+            logger.info(
+                "Evaluación terminada",
+                extra={
+                    "status": final_status,
+                    "score": score,
+                    "passed_test_cases": passed_test_cases,
+                    "total_test_cases": total_test_cases,
+                    "execution_time": total_execution_time,
+                    "cpu_time": total_cpu_time,
+                    "memory_used": total_memory_used
+                }
+            )
             
-            return {
+            result = {
                 "status": final_status,
                 "score": score,
                 "execution_time": total_execution_time,
+                "cpu_time": total_cpu_time,
                 "memory_used": total_memory_used,
                 "passed_test_cases": passed_test_cases,
                 "total_test_cases": total_test_cases,
                 "test_case_results": test_case_results
             }
+            if cache_key:
+                await store_verdict(cache_key, language, result)
+            return {**result, **judged_with}
         except Exception as e:
-            print(f"❌ Error en evaluate: {str(e)}")
+            logger.exception("Error en la evaluación")
             return {
                 "status": "error",
                 "message": f"Error al evaluar la submisión: {str(e)}",
                 "score": 0.0
             }
     
+    async def _compile(self, code: str, language: str) -> Dict[str, Any]:
+        """
+        Compilar el código una vez por submisión. Devuelve el artefacto
+        (directorio con las clases y clase principal) o un error de compilación.
+        """
+        try:
+            # El sandbox nativo ejecuta las clases compiladas en el host
+            if await self._executor(language) in ("local", "native"):
+                result = await compile_locally(code, language)
+                if result["status"] == "success":
+                    await ensure_local_cds_archive()
+                return result
+            
+            if not await docker_backend.get_client():
+                raise RuntimeError("Docker no está disponible")
+            return await compile_in_docker(code, language, self.supported_languages[language])
+        except Exception as e:
+            logger.exception("Error compilando")
+            return {"status": "error", "error_message": f"Error al compilar: {str(e)}"}
+    
+    def _local_command(self, code_file: str, language: str, artifact: Optional[Dict[str, Any]]) -> List[str]:
+        """Comando para ejecutar el programa localmente"""
+        if artifact is None:
+            return [self.supported_languages[language]["command"], code_file]
+        cmd = ["java", "-Xshare:auto"]
+        if settings.JAVA_CDS_ARCHIVE and os.path.exists(settings.JAVA_CDS_ARCHIVE):
+            cmd.append(f"-XX:SharedArchiveFile={settings.JAVA_CDS_ARCHIVE}")
+        return cmd + ["-cp", artifact["artifact_dir"], artifact["class_name"]]
+    
+    def _docker_program(
+        self,
+        code: bytes,
+        language: str,
+        artifact: Optional[Dict[str, Any]]
+    ) -> Tuple[Dict[str, bytes], List[str]]:
+        """
+        Archivos a copiar al contenedor y comando para ejecutarlos: el código
+        fuente, o las clases ya compiladas si el lenguaje se compila
+        """
+        lang_config = self.supported_languages[language]
+        if artifact is None:
+            code_name = f"main{lang_config['extension']}"
+            return {code_name: code}, [lang_config["command"], code_name]
+        return artifact_cache.read(artifact["artifact_dir"]), [
+            "java", "-Xshare:auto", f"-XX:SharedArchiveFile={DOCKER_JAVA_CDS_ARCHIVE}",
+            "-cp", ".", artifact["class_name"]
+        ]
+    
+    def _native_program(
+        self,
+        code: bytes,
+        language: str,
+        artifact: Optional[Dict[str, Any]]
+    ) -> Tuple[Dict[str, bytes], List[str], Dict[str, str]]:
+        """
+        Archivos, comando y montajes de solo lectura para el sandbox nativo. El
+        archivo CDS local queda oculto con el resto de TEMP_DIR, así que se monta
+        en el directorio de trabajo.
+        """
+        lang_config = self.supported_languages[language]
+        if artifact is None:
+            code_name = f"main{lang_config['extension']}"
+            return {code_name: code}, [lang_config["command"], code_name], {}
+        command = ["java", "-Xshare:auto"]
+        ro_binds = {}
+        if settings.JAVA_CDS_ARCHIVE and os.path.exists(settings.JAVA_CDS_ARCHIVE):
+            ro_binds["judge-cds.jsa"] = settings.JAVA_CDS_ARCHIVE
+            command.append("-XX:SharedArchiveFile=judge-cds.jsa")
+        return artifact_cache.read(artifact["artifact_dir"]), command + ["-cp", ".", artifact["class_name"]], ro_binds
+    
+    def _get_parallelism(self, problem: Problem) -> int:
+        """
+        Cantidad de casos de prueba que se ejecutan a la vez para un problema.
+        Un valor de 1 equivale a la ejecución en serie.
+        """
+        if not settings.JUDGE_PARALLEL_TEST_CASES:
+            return 1
+        limit = problem.max_parallel_test_cases or settings.JUDGE_MAX_PARALLEL_TEST_CASES
+        return max(1, min(limit, settings.JUDGE_GLOBAL_MAX_PARALLEL_TEST_CASES))
+    
+    async def _gather_bounded(
+        self,
+        factories: List[Callable[[], Awaitable[Any]]],
+        limit: int,
+        stop_on_failure: bool = False,
+        on_result: Optional[Callable[[int, Any], Awaitable[None]]] = None
+    ) -> List[Any]:
+        """
+        Ejecutar las corrutinas con a lo sumo `limit` a la vez por submisión y
+        respetando el límite global del proceso. Los resultados conservan el orden;
+        `on_result` recibe cada uno (con su índice) en cuanto termina.
+        
+        Con `stop_on_failure`, al fallar un caso se cancelan los casos posteriores
+        que no hayan terminado; su resultado es el de un caso omitido.
+        """
+        local_semaphore = asyncio.Semaphore(limit)
+        first_failure = None
+        tasks = []
+        
+        async def run(index, factory):
+            nonlocal first_failure
+            async with local_semaphore:
+                async with test_case_semaphore:
+                    result = await factory()
+            if on_result is not None:
+                await on_result(index, result)
+            if stop_on_failure and result["status"] != "accepted":
+                if first_failure is None or index < first_failure:
+                    first_failure = index
+                    for later in tasks[index + 1:]:
+                        later.cancel()
+            return result
+        
+        tasks = [asyncio.create_task(run(index, factory)) for index, factory in enumerate(factories)]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, asyncio.CancelledError):
+                raise result
+        return [
+            self._skipped_result() if isinstance(result, asyncio.CancelledError) else result
+            for result in results
+        ]
+    
+    def _tag_test_cases(self, results: List[Dict[str, Any]], test_cases: List[TestCase]):
+        """Agregar a cada resultado el id del caso de prueba, su posición y su huella"""
+        for index, (result, test_case) in enumerate(zip(results, test_cases)):
+            result["test_case_id"] = str(test_case.id)
+            result["index"] = index
+            result["test_case_fingerprint"] = test_case_fingerprint(test_case)
+    
+    def _skipped_result(self) -> Dict[str, Any]:
+        """Resultado de un caso que no se ejecutó por la política de evaluación"""
+        return {
+            "status": "skipped",
+            "execution_time": 0,
+            "cpu_time": 0,
+            "memory_used": 0
+        }
+    
+    def _skip_after_first_failure(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Marcar como omitidos todos los casos posteriores al primer caso fallido"""
+        for index, result in enumerate(results):
+            if result["status"] != "accepted":
+                return results[:index + 1] + [self._skipped_result() for _ in results[index + 1:]]
+        return results
+    
     async def _run_test_case(
         self,
         code: str,
         language: str,
-        input_data: str,
-        expected_output: str,
+        test_case: TestCase,
         time_limit: int,
-        memory_limit: int
+        memory_limit: int,
+        output_limit: int,
+        artifact: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
-        Ejecutar un caso de prueba específico
+        Ejecutar un caso de prueba específico. La entrada y la salida esperada se
+        leen del almacén de blobs sin copiarlas.
         """
         code_file = None
-        input_file = None
         
         try:
-            print("\n=== EJECUTANDO CASO DE PRUEBA ===")
-            print("Código a ejecutar:")
-            print("-------------------")
-            print(code)
-            print("-------------------")
-            print("Input data:")
-            print("-------------------")
-            print(input_data)
-            print("-------------------")
-            print("Output esperado:")
-            print("-------------------")
-            print(expected_output)
-            print("-------------------")
-            
             # Crear archivo temporal con el código
             try:
                 with tempfile.NamedTemporaryFile(
@@ -186,97 +512,72 @@ class CodeJudge:
                 ) as f:
                     f.write(code)
                     code_file = f.name
-                    print(f"Código guardado en archivo temporal: {code_file}")
                 
                 # Asegurar permisos de lectura
                 os.chmod(code_file, 0o644)
-                
-                # Crear archivo temporal con la entrada
-                with tempfile.NamedTemporaryFile(
-                    mode='w',
-                    delete=False,
-                    encoding='utf-8'
-                ) as f:
-                    f.write(input_data)
-                    input_file = f.name
-                    print(f"Input guardado en archivo temporal: {input_file}")
-                
-                # Asegurar permisos de lectura
-                os.chmod(input_file, 0o644)
             except Exception as e:
-                print(f"Error al crear archivos temporales: {str(e)}")
+                logger.error(f"Error al crear archivos temporales: {str(e)}")
                 raise
             
+            input_file, expected_file = await test_case_paths(test_case)
+            # Los datos de prueba son ocultos: solo se registra su tamaño
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Ejecutando caso de prueba",
+                    extra={
+                        "input_bytes": os.path.getsize(input_file),
+                        "expected_bytes": os.path.getsize(expected_file)
+                    }
+                )
+            
             # Ejecutar el código
             start_time = time.time()
             
-            if settings.DEBUG:
-                print("\nEjecutando en modo DEBUG (local)")
+            executor = await self._executor(language)
+            if executor == "local":
                 # Modo desarrollo: ejecutar directamente
                 result = await self._execute_locally(
                     code_file=code_file,
                     input_file=input_file,
+                    expected_file=expected_file,
+                    language=language,
+                    time_limit=time_limit,
+                    memory_limit=memory_limit,
+                    output_limit=output_limit,
+                    artifact=artifact
+                )
+            elif executor == "native":
+                result = await self._execute_natively(
+                    code=code,
+                    input_file=input_file,
+                    expected_file=expected_file,
                     language=language,
-                    time_limit=time_limit
+                    time_limit=time_limit,
+                    memory_limit=memory_limit,
+                    output_limit=output_limit,
+                    artifact=artifact
                 )
             else:
-                print("\nEjecutando en Docker")
                 # Modo producción: ejecutar en Docker
                 result = await self._execute_in_docker(
                     code_file=code_file,
                     input_file=input_file,
                     language=language,
                     time_limit=time_limit,
-                    memory_limit=memory_limit
+                    memory_limit=memory_limit,
+                    output_limit=output_limit,
+                    artifact=artifact
                 )
             
-            execution_time = int((time.time() - start_time) * 1000)  # Convertir a milisegundos
+            # Si el ejecutor no midió el tiempo del programa se usa el de toda la ejecución
+            execution_time = result.get("execution_time")
+            if execution_time is None:
+                execution_time = int((time.time() - start_time) * 1000)  # Convertir a milisegundos
             
-            print("\n=== RESULTADO DE EJECUCIÓN ===")
-            print(f"Status: {result['status']}")
-            print("Output obtenido:")
-            print("-------------------")
-            print(result.get('output', ''))
-            print("-------------------")
+            return self._build_test_case_result(result, expected_file, execution_time, output_limit)
             
-            if result["status"] == "success":
-                actual_output = result["output"].strip()
-                expected_output = expected_output.strip()
-                
-                if actual_output == expected_output:
-                    print("✅ Output coincide con el esperado")
-                    return {
-                        "status": "accepted",  # Cambiado de "passed" a "accepted"
-                        "execution_time": execution_time,
-                        "memory_used": result.get("memory_used"),
-                        "output": actual_output
-                    }
-                else:
-                    print("❌ Output NO coincide con el esperado")
-                    return {
-                        "status": "wrong_answer",  # Cambiado de "failed" a "wrong_answer"
-                        "execution_time": execution_time,
-                        "memory_used": result.get("memory_used"),
-                        "output": actual_output,
-                        "expected_output": expected_output
-                    }
-            else:
-                error_status = result["status"]
-                if error_status == "timeout":
-                    error_status = "time_limit_exceeded"
-                elif error_status not in ["runtime_error", "compilation_error"]:
-                    error_status = "error"
-                    
-                print(f"❌ Error en ejecución: {result.get('error_message', 'Unknown error')}")
-                return {
-                    "status": error_status,
-                    "execution_time": execution_time,
-                    "memory_used": result.get("memory_used"),
-                    "error_message": result.get("error_message")
-                }
-                
         except Exception as e:
-            print(f"\n❌ Error ejecutando caso de prueba: {str(e)}")
+            logger.exception("Error ejecutando caso de prueba")
             return {
                 "status": "error",
                 "error_message": str(e)
@@ -287,45 +588,309 @@ class CodeJudge:
                 if code_file and os.path.exists(code_file):
                     os.chmod(code_file, 0o666)  # Dar permisos de lectura/escritura
                     os.unlink(code_file)
-                if input_file and os.path.exists(input_file):
-                    os.chmod(input_file, 0o666)  # Dar permisos de lectura/escritura
-                    os.unlink(input_file)
             except Exception as e:
-                print(f"Error al limpiar archivos temporales en _run_test_case: {str(e)}")
+                logger.warning(f"Error al limpiar archivos temporales en _run_test_case: {str(e)}")
+    
+    def _build_test_case_result(
+        self,
+        result: Dict[str, Any],
+        expected_file: str,
+        execution_time: int,
+        output_limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Convertir el resultado de una ejecución en el veredicto del caso de prueba.
+        La ejecución local ya trae la comparación hecha mientras se leía la salida;
+        para las demás se compara aquí la salida capturada, por bloques, contra el
+        archivo esperado mapeado en memoria.
+        
+        Todos los veredictos llevan los recursos medidos: `execution_time` (tiempo
+        real, ms), `cpu_time` (usuario + sistema, ms) y `memory_used` (pico, KB).
+        """
+        usage = {
+            "execution_time": execution_time,
+            "cpu_time": result.get("cpu_time"),
+            "memory_used": result.get("memory_used")
+        }
+        
+        if result["status"] == "success":
+            comparison = result.get("comparison")
+            if comparison is None:
+                stdout = result.get("stdout")
+                if stdout is None:
+                    stdout = result.get("output", "").encode("utf-8")
+                comparison = self._compare_output(stdout, expected_file, output_limit)
+            if comparison["limit_exceeded"]:
+                result = {"status": "output_limit_exceeded"}
+        
+        if result["status"] == "success":
+            if trace_enabled(logger):
+                logger.debug("Salida del programa", extra={"payload": truncate(comparison["output"])})
+            
+            if comparison["matched"]:
+                return {
+                    "status": "accepted",  # Cambiado de "passed" a "accepted"
+                    **usage,
+                    "output": comparison["output"]
+                }
+            else:
+                difference = comparison["first_difference"]
+                logger.debug("Salida incorrecta", extra={"first_difference": difference})
+                return {
+                    "status": "wrong_answer",  # Cambiado de "failed" a "wrong_answer"
+                    **usage,
+                    "output": comparison["output"],
+                    "expected_output": read_preview(expected_file, settings.JUDGE_OUTPUT_PREVIEW_BYTES).strip(),
+                    "first_difference": difference,
+                    "error_message": f"Primera diferencia en la línea {difference['line']}, columna {difference['column']}"
+                }
+        else:
+            error_status = result["status"]
+            if error_status == "timeout":
+                error_status = "time_limit_exceeded"
+            elif error_status == "output_limit_exceeded":
+                result.setdefault("error_message", f"La salida superó el límite de {output_limit} bytes")
+            elif error_status not in ["runtime_error", "compilation_error", "memory_limit_exceeded"]:
+                error_status = "error"
+                
+            if trace_enabled(logger):
+                logger.debug(
+                    "Error en ejecución",
+                    extra={"status": error_status, "payload": truncate(result.get("error_message"))}
+                )
+            return {
+                "status": error_status,
+                **usage,
+                "error_message": result.get("error_message")
+            }
+    
+    def _compare_output(self, stdout: bytes, expected_file: str, output_limit: Optional[int]) -> Dict[str, Any]:
+        """Comparar una salida ya capturada contra el archivo esperado"""
+        with open_mmap(expected_file) as expected:
+            comparator = compare_output(stdout, expected, output_limit, settings.JUDGE_OUTPUT_PREVIEW_BYTES)
+            return self._comparison_summary(comparator)
+    
+    def _comparison_summary(self, comparator: StreamingComparator) -> Dict[str, Any]:
+        """Resumen serializable de un comparador ya terminado"""
+        return {
+            "matched": not comparator.failed,
+            "limit_exceeded": comparator.limit_exceeded,
+            "first_difference": comparator.first_difference(),
+            "output": bytes(comparator.preview).decode("utf-8", errors="replace").strip()
+        }
+    
+    async def _run_session(
+        self,
+        code: str,
+        language: str,
+        test_cases: List[TestCase],
+        time_limit: int,
+        memory_limit: int,
+        output_limit: int,
+        parallelism: int = 1,
+        stop_on_failure: bool = False,
+        artifact: Optional[Dict[str, Any]] = None,
+        on_result: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Ejecutar todos los casos de prueba en una única sesión de sandbox,
+        preparando el código una sola vez. `on_result` recibe el veredicto de
+        cada caso en cuanto está disponible.
+        """
+        try:
+            # Rutas locales de las entradas y salidas esperadas en el almacén de blobs
+            paths = await asyncio.gather(*(test_case_paths(test_case) for test_case in test_cases))
+            
+            executor = await self._executor(language)
+            if executor == "local":
+                return await self._run_session_locally(
+                    code, language, paths, time_limit, memory_limit, output_limit, parallelism, stop_on_failure, artifact,
+                    on_result=on_result
+                )
+            if executor == "native":
+                return await self._run_session_locally(
+                    code, language, paths, time_limit, memory_limit, output_limit, parallelism, stop_on_failure, artifact,
+                    native=True, on_result=on_result
+                )
+            
+            if not await docker_backend.get_client():
+                raise RuntimeError("Docker no está disponible")
+            results = [None] * len(paths)
+            
+            async def on_raw_result(index: int, result: Dict[str, Any]):
+                if result["status"] == "skipped":
+                    results[index] = self._skipped_result()
+                else:
+                    results[index] = self._build_test_case_result(
+                        result, paths[index][1], result.get("execution_time", 0), output_limit
+                    )
+                if on_result is not None:
+                    await on_result(index, results[index])
+            
+            await self._run_session_in_docker(
+                code, language, paths, time_limit, memory_limit, output_limit, parallelism, stop_on_failure, artifact,
+                on_result=on_raw_result
+            )
+            return results
+        except Exception as e:
+            logger.exception("Error ejecutando la sesión")
+            return [{"status": "error", "error_message": str(e)} for _ in test_cases]
+    
+    async def _run_session_in_docker(
+        self,
+        code: str,
+        language: str,
+        paths: List[Tuple[str, str]],
+        time_limit: int,
+        memory_limit: int,
+        output_limit: int,
+        parallelism: int,
+        stop_on_failure: bool = False,
+        artifact: Optional[Dict[str, Any]] = None,
+        on_result: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Repartir los casos entre `parallelism` contenedores del pool; cada uno
+        ejecuta su parte en serie para que el límite de memoria siga siendo por programa.
+        `on_result` recibe los resultados de cada contenedor cuando termina.
+        
+        Con `stop_on_failure` el harness deja de ejecutar su parte tras el primer
+        error de ejecución (timeout o error en tiempo de ejecución); las respuestas
+        incorrectas se detectan aquí y los casos posteriores se marcan como omitidos.
+        """
+        files, command = self._docker_program(code.encode("utf-8"), language, artifact)
+        shards = [
+            list(range(start, len(paths), parallelism))
+            for start in range(min(parallelism, len(paths)))
+        ]
+        
+        async def run_shard(indexes):
+            async with test_case_semaphore:
+                started = time.perf_counter()
+                async with DockerSandboxSession(language, self.supported_languages[language], memory_limit) as session:
+                    SANDBOX_STARTUP_TIME.labels(language=language).observe(time.perf_counter() - started)
+                    results = await session.run_all(
+                        files=files,
+                        command=command,
+                        input_paths=[paths[index][0] for index in indexes],
+                        time_limit=time_limit,
+                        output_limit=output_limit,
+                        stop_on_failure=stop_on_failure
+                    )
+            if on_result is not None:
+                for index, result in zip(indexes, results):
+                    await on_result(index, result)
+            return results
+        
+        shard_results = await asyncio.gather(*(run_shard(indexes) for indexes in shards))
+        
+        # Reordenar los resultados según el orden original de los casos
+        raw_results = [None] * len(paths)
+        for indexes, results in zip(shards, shard_results):
+            for index, result in zip(indexes, results):
+                raw_results[index] = result
+        return raw_results
+    
+    async def _run_session_locally(
+        self,
+        code: str,
+        language: str,
+        paths: List[Tuple[str, str]],
+        time_limit: int,
+        memory_limit: int,
+        output_limit: int,
+        parallelism: int = 1,
+        stop_on_failure: bool = False,
+        artifact: Optional[Dict[str, Any]] = None,
+        native: bool = False,
+        on_result: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Ejecutar todos los casos localmente escribiendo el código una sola vez.
+        Con `native` cada caso corre en el sandbox nativo.
+        """
+        session_dir = tempfile.mkdtemp(prefix="session_")
+        try:
+            code_file = os.path.join(session_dir, f"main{self.supported_languages[language]['extension']}")
+            with open(code_file, 'w', encoding='utf-8') as f:
+                f.write(code)
+            
+            async def run_case(input_file: str, expected_file: str) -> Dict[str, Any]:
+                start_time = time.time()
+                if native:
+                    result = await self._execute_natively(
+                        code=code,
+                        input_file=input_file,
+                        expected_file=expected_file,
+                        language=language,
+                        time_limit=time_limit,
+                        memory_limit=memory_limit,
+                        output_limit=output_limit,
+                        artifact=artifact
+                    )
+                else:
+                    result = await self._execute_locally(
+                        code_file=code_file,
+                        input_file=input_file,
+                        expected_file=expected_file,
+                        language=language,
+                        time_limit=time_limit,
+                        memory_limit=memory_limit,
+                        output_limit=output_limit,
+                        artifact=artifact
+                    )
+                execution_time = result.get("execution_time")
+                if execution_time is None:
+                    execution_time = int((time.time() - start_time) * 1000)
+                return self._build_test_case_result(result, expected_file, execution_time, output_limit)
+            
+            return await self._gather_bounded(
+                [functools.partial(run_case, input_file, expected_file) for input_file, expected_file in paths],
+                parallelism,
+                stop_on_failure=stop_on_failure,
+                on_result=on_result
+            )
+        finally:
+            shutil.rmtree(session_dir, ignore_errors=True)
     
     async def _execute_locally(
         self,
         code_file: str,
         input_file: str,
+        expected_file: str,
         language: str,
-        time_limit: int
+        time_limit: int,
+        memory_limit: Optional[int] = None,
+        output_limit: Optional[int] = None,
+        artifact: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
-        Ejecutar código localmente (modo desarrollo)
+        Ejecutar código localmente (modo desarrollo) sin bloquear el event loop.
+        Los lenguajes compilados usan el artefacto de `_compile`; si no se
+        recibe, se compila aquí (reutilizando el caché de artefactos).
+        
+        La salida se compara contra `expected_file` mientras se lee: ante la
+        primera diferencia o al superar `output_limit` se termina el proceso.
+        
+        La memoria no se limita en modo local: si el pico medido supera
+        `memory_limit` (MB) el veredicto es memoria excedida.
         """
         try:
-            lang_config = self.supported_languages[language]
-            cmd = None
-            
-            # Preparar comando
-            if language == "python":
-                cmd = [lang_config["command"], code_file]
-            elif language == "javascript":
-                cmd = [lang_config["command"], code_file]
-            elif language == "java":
-                # Compilar primero
-                class_name = os.path.splitext(os.path.basename(code_file))[0]
-                compile_cmd = ["javac", code_file]
-                subprocess.run(compile_cmd, check=True, capture_output=True)
-                cmd = ["java", "-cp", os.path.dirname(code_file), class_name]
-            
-            if cmd is None:
+            lang_config = self.supported_languages.get(language)
+            if lang_config is None:
                 return {
                     "status": "error",
                     "error_message": f"Lenguaje no soportado: {language}"
                 }
             
-            print(f"Ejecutando comando: {' '.join(cmd)}")
+            if lang_config.get("compiled") and artifact is None:
+                with open(code_file, 'r', encoding='utf-8') as f:
+                    artifact = await compile_locally(f.read(), language)
+                if artifact["status"] != "success":
+                    return artifact
+            
+            # Preparar comando
+            cmd = self._local_command(code_file, language, artifact)
             
             try:
                 # Asegurarse de que los archivos existen y tienen los permisos correctos
@@ -334,83 +899,172 @@ class CodeJudge:
                 if not os.path.exists(input_file):
                     raise FileNotFoundError(f"Archivo de entrada no encontrado: {input_file}")
                 
-                # Leer el contenido del archivo de entrada como texto
-                with open(input_file, 'r', encoding='utf-8') as input_f:
-                    input_data = input_f.read()
+                # Ejecutar el proceso con timeout; el archivo de entrada se conecta a stdin
+                # y la salida se compara por bloques contra la esperada
+                with open_mmap(expected_file) as expected:
+                    comparator = StreamingComparator(expected, output_limit, settings.JUDGE_OUTPUT_PREVIEW_BYTES)
+                    process = await run_process_streaming(
+                        cmd,
+                        on_stdout=comparator.feed,
+                        stdin_path=input_file,
+                        timeout=time_limit / 1000.0  # Convertir a segundos
+                    )
+                    if not process["stopped"] and not process["timed_out"] and process["returncode"] == 0:
+                        comparator.finish()
+                    comparison = self._comparison_summary(comparator)
                 
-                # Ejecutar el proceso con timeout
-                process = subprocess.run(
-                    cmd,
-                    input=input_data,
-                    capture_output=True,
-                    timeout=time_limit / 1000.0,  # Convertir a segundos
-                    text=True,  # Automáticamente decodifica la salida como texto
-                    encoding='utf-8'  # Especificar codificación
-                )
-                
-                if process.returncode == 0:
-                    output = process.stdout.strip()
-                    print(f"Salida del programa: '{output}'")
-                    return {
-                        "status": "success",
-                        "output": output,
-                        "memory_used": 0  # No medimos memoria en modo local
-                    }
-                else:
-                    error_msg = process.stderr.strip()
-                    print(f"Error del programa: {error_msg}")
-                    return {
-                        "status": "runtime_error",
-                        "error_message": error_msg
-                    }
+                return self._process_verdict(process, comparator, comparison, memory_limit, output_limit)
                     
-            except subprocess.TimeoutExpired:
-                print("Tiempo de ejecución excedido")
-                return {
-                    "status": "timeout",
-                    "error_message": "Tiempo de ejecución excedido"
-                }
             except Exception as e:
-                print(f"Error al ejecutar el proceso: {str(e)}")
+                logger.exception("Error al ejecutar el proceso")
                 return {
                     "status": "error",
                     "error_message": f"Error al ejecutar el código: {str(e)}"
                 }
-            finally:
-                # Limpiar archivos temporales
-                try:
-                    if os.path.exists(code_file):
-                        os.chmod(code_file, 0o666)  # Dar permisos de lectura/escritura
-                        os.unlink(code_file)
-                    if os.path.exists(input_file):
-                        os.chmod(input_file, 0o666)  # Dar permisos de lectura/escritura
-                        os.unlink(input_file)
-                except Exception as e:
-                    print(f"Error al limpiar archivos temporales: {str(e)}")
                     
         except Exception as e:
-            print(f"Error general: {str(e)}")
+            logger.exception("Error en la ejecución local")
             return {
                 "status": "error",
                 "error_message": str(e)
             }
     
+    async def _execute_natively(
+        self,
+        code: str,
+        input_file: str,
+        expected_file: str,
+        language: str,
+        time_limit: int,
+        memory_limit: int,
+        output_limit: Optional[int] = None,
+        artifact: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Ejecutar el código en el sandbox nativo de Linux. La salida se compara
+        mientras se lee, como en `_execute_locally`; la memoria la limita el
+        cgroup de la ejecución, que también mide la CPU y el pico de memoria.
+        """
+        try:
+            if self.supported_languages[language].get("compiled") and artifact is None:
+                artifact = await compile_locally(code, language)
+                if artifact["status"] != "success":
+                    return artifact
+            
+            files, command, ro_binds = self._native_program(code.encode("utf-8"), language, artifact)
+            with open_mmap(expected_file) as expected:
+                comparator = StreamingComparator(expected, output_limit, settings.JUDGE_OUTPUT_PREVIEW_BYTES)
+                process = await native_sandbox.run(
+                    files=files,
+                    command=command,
+                    on_stdout=comparator.feed,
+                    time_limit=time_limit,
+                    memory_limit=memory_limit,
+                    output_limit=output_limit or settings.JUDGE_OUTPUT_LIMIT,
+                    stdin_path=input_file,
+                    ro_binds=ro_binds,
+                    limit_address_space=language in settings.NATIVE_SANDBOX_ADDRESS_SPACE_LANGUAGES
+                )
+                if process.get("setup_error"):
+                    raise RuntimeError(f"No se pudo preparar el sandbox nativo: {process['setup_error']}")
+                if not process["stopped"] and not process["timed_out"] and process["returncode"] == 0:
+                    comparator.finish()
+                comparison = self._comparison_summary(comparator)
+            
+            return self._process_verdict(process, comparator, comparison, memory_limit, output_limit)
+        except Exception as e:
+            logger.exception("Error al ejecutar en el sandbox nativo")
+            return {
+                "status": "error",
+                "error_message": f"Error al ejecutar el código: {str(e)}"
+            }
+    
+    def _process_verdict(
+        self,
+        process: Dict[str, Any],
+        comparator: StreamingComparator,
+        comparison: Dict[str, Any],
+        memory_limit: Optional[int],
+        output_limit: Optional[int]
+    ) -> Dict[str, Any]:
+        """
+        Veredicto de ejecución de un proceso local o del sandbox nativo. Es
+        memoria excedida si lo terminó el OOM killer o si el pico medido supera
+        `memory_limit` (MB).
+        """
+        usage = {
+            "execution_time": process["wall_time"],
+            "cpu_time": process["cpu_time"],
+            "memory_used": process["memory_used"]
+        }
+        if process.get("oom_killed") or (
+            memory_limit and usage["memory_used"] and usage["memory_used"] > memory_limit * 1024
+        ):
+            return {
+                "status": "memory_limit_exceeded",
+                "error_message": f"Memoria excedida (límite: {memory_limit} MB)",
+                **usage
+            }
+        
+        if comparator.limit_exceeded:
+            return {
+                "status": "output_limit_exceeded",
+                "error_message": f"La salida superó el límite de {output_limit} bytes",
+                **usage
+            }
+        
+        if process["timed_out"]:
+            return {
+                "status": "timeout",
+                "error_message": "Tiempo de ejecución excedido",
+                **usage
+            }
+        
+        # Con `stopped` el proceso se terminó por una diferencia en la salida
+        if process["returncode"] == 0 or process["stopped"]:
+            return {
+                "status": "success",
+                "comparison": comparison,
+                **usage
+            }
+        else:
+            error_msg = process["stderr"].decode('utf-8', errors='replace').strip()
+            return {
+                "status": "runtime_error",
+                "error_message": error_msg,
+                **usage
+            }
+    
     async def _execute_in_docker(
         self,
         code_file: str,
         input_file: str,
         language: str,
         time_limit: int,
-        memory_limit: int
+        memory_limit: int,
+        output_limit: Optional[int] = None,
+        artifact: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Ejecutar código en un contenedor Docker
         """
-        if not self.docker_client:
+        docker_client = await docker_backend.get_client()
+        if not docker_client:
             return {
                 "status": "error",
                 "error_message": "Docker no está disponible"
             }
+        
+        if settings.DOCKER_POOL_ENABLED:
+            return await self._execute_in_pool(
+                code_file=code_file,
+                input_file=input_file,
+                language=language,
+                time_limit=time_limit,
+                memory_limit=memory_limit,
+                output_limit=output_limit,
+                artifact=artifact
+            )
             
         try:
             lang_config = self.supported_languages[language]
@@ -418,7 +1072,10 @@ class CodeJudge:
             
             try:
                 # Crear y ejecutar contenedor
-                container = self.docker_client.containers.run(
+                started = time.perf_counter()
+                container = await docker_backend.call(
+                    "containers.run",
+                    docker_client.containers.run,
                     image=lang_config["docker_image"],
                     command=f"{lang_config['command']} {os.path.basename(code_file)}",
                     volumes={
@@ -432,15 +1089,21 @@ class CodeJudge:
                     stdin_open=True,
                     tty=True
                 )
+                SANDBOX_STARTUP_TIME.labels(language=language).observe(time.perf_counter() - started)
                 
                 # Esperar resultado con timeout
                 try:
-                    container.wait(timeout=time_limit)
-                    output = container.logs().decode('utf-8')
+                    await docker_backend.call("wait", container.wait, timeout=time_limit / 1000.0)
+                    await docker_backend.call("reload", container.reload)
+                    if container.attrs.get("State", {}).get("OOMKilled"):
+                        return {
+                            "status": "memory_limit_exceeded",
+                            "error_message": f"Memoria excedida (límite: {memory_limit} MB)"
+                        }
+                    output = (await docker_backend.call("logs", container.logs)).decode('utf-8')
                     return {
                         "status": "success",
-                        "output": output,
-                        "memory_used": memory_limit  # Por ahora un valor fijo
+                        "output": output
                     }
                 except Exception as e:
                     return {
@@ -452,7 +1115,7 @@ class CodeJudge:
                 # Limpiar contenedor
                 if container:
                     try:
-                        container.remove(force=True)
+                        await docker_backend.call("remove", container.remove, force=True)
                     except:
                         pass
                         
@@ -470,4 +1133,127 @@ class CodeJudge:
             return {
                 "status": "error",
                 "error_message": f"Error ejecutando código: {str(e)}"
-            } 
\ No newline at end of file
+            }
+    
+    async def _execute_in_pool(
+        self,
+        code_file: str,
+        input_file: str,
+        language: str,
+        time_limit: int,
+        memory_limit: int,
+        output_limit: Optional[int] = None,
+        artifact: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Ejecutar código con exec dentro de un contenedor pre-iniciado del pool.
+        La salida se corta dentro del contenedor con `head -c` al superar
+        `output_limit`; el programa termina con SIGPIPE al seguir escribiendo.
+        
+        El script mide el tiempo y lee el cgroup del contenedor antes y después
+        de ejecutar; las lecturas se agregan al final de stderr con la marca
+        `USAGE_MARKER`. Una terminación del OOM killer es memoria excedida.
+        """
+        lang_config = self.supported_languages[language]
+        pooled = None
+        recycle = False
+        
+        try:
+            started = time.perf_counter()
+            pooled = await container_pool.acquire(language, lang_config, memory_limit)
+            SANDBOX_STARTUP_TIME.labels(language=language).observe(time.perf_counter() - started)
+            
+            # Copiar el programa y la entrada al directorio de trabajo del contenedor
+            with open(code_file, 'rb') as f:
+                files, command = self._docker_program(f.read(), language, artifact)
+            await docker_backend.call(
+                "put_archive",
+                pooled.container.put_archive,
+                SANDBOX_DIR,
+                build_archive(files, {"input.txt": input_file})
+            )
+            
+            # Ejecutar con timeout y límite de salida, y limpiar el directorio de trabajo al terminar
+            seconds = max(time_limit / 1000.0, 0.001)
+            output_cap = (output_limit or settings.JUDGE_OUTPUT_LIMIT) + 1
+            script = (
+                f"{CGROUP_USAGE_FUNCTION}\n"
+                f"before=$(cgroup_usage); start=$(date +%s%N); "
+                f"{{ timeout -s KILL {seconds:.3f} {' '.join(shlex.quote(arg) for arg in command)} "
+                f"< input.txt 2> stderr; echo $? > rc; }} | head -c {output_cap}; "
+                f"end=$(date +%s%N); after=$(cgroup_usage); "
+                f"head -c {settings.JUDGE_OUTPUT_PREVIEW_BYTES} stderr >&2; "
+                f"printf '\\n{USAGE_MARKER} %s %s %s\\n' $(( (end - start) / 1000000 )) \"$before\" \"$after\" >&2; "
+                f"rc=$(cat rc); find {SANDBOX_DIR} -mindepth 1 -delete; exit $rc"
+            )
+            start_time = time.time()
+            exit_code, (stdout, stderr) = await docker_backend.call(
+                "exec_run",
+                pooled.container.exec_run,
+                ["sh", "-c", script],
+                workdir=SANDBOX_DIR,
+                demux=True
+            )
+            
+            stdout = stdout or b""
+            stderr, _, usage_line = (stderr or b"").rpartition(f"\n{USAGE_MARKER} ".encode())
+            stderr = stderr.decode('utf-8', errors='replace')
+            if usage_line:
+                elapsed, *readings = usage_line.decode().split()
+                usage = parse_cgroup_usage(readings[:3], readings[3:])
+                usage["execution_time"] = int(elapsed)
+            else:
+                usage = {"execution_time": int((time.time() - start_time) * 1000), "oom_killed": False}
+            oom_killed = usage.pop("oom_killed")
+            
+            # Cualquier terminación por señal se considera una violación del sandbox
+            if exit_code >= 128:
+                recycle = True
+            
+            if oom_killed:
+                return {
+                    "status": "memory_limit_exceeded",
+                    "error_message": f"Memoria excedida (límite: {memory_limit} MB)",
+                    **usage
+                }
+            
+            if len(stdout) >= output_cap:
+                return {"status": "output_limit_exceeded", **usage}
+            
+            if exit_code == 0:
+                return {"status": "success", "stdout": stdout, **usage}
+            
+            if exit_code >= 128 and usage["execution_time"] >= time_limit:
+                return {
+                    "status": "timeout",
+                    "error_message": "Tiempo de ejecución excedido",
+                    **usage
+                }
+            
+            return {
+                "status": "runtime_error",
+                "error_message": stderr.strip() or f"El programa terminó con código {exit_code}",
+                **usage
+            }
+            
+        except docker.errors.ImageNotFound:
+            recycle = True
+            return {
+                "status": "error",
+                "error_message": f"Imagen Docker no encontrada: {lang_config['docker_image']}"
+            }
+        except docker.errors.APIError as e:
+            recycle = True
+            return {
+                "status": "error",
+                "error_message": f"Error de Docker API: {str(e)}"
+            }
+        except Exception as e:
+            recycle = True
+            return {
+                "status": "error",
+                "error_message": f"Error ejecutando código: {str(e)}"
+            }
+        finally:
+            if pooled:
+                await container_pool.release(pooled, recycle=recycle)
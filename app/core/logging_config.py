@@ -0,0 +1,164 @@
+import atexit
+import contextlib
+import contextvars
+import hashlib
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Union
+
+from app.core.config import settings
+
+# Contexto de la submisión que se está evaluando: id y si su traza detallada está muestreada.
+# asyncio copia el contexto a las tareas creadas, así que llega a los casos ejecutados en paralelo.
+submission_context: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "submission_context", default=None
+)
+
+# Atributos propios de LogRecord; el resto son campos estructurados pasados con `extra`
+RESERVED_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def is_sampled(submission_id: str) -> bool:
+    """
+    Decidir si la submisión lleva traza detallada. La decisión depende solo del
+    id, así que es la misma en la API y en los workers.
+    """
+    rate = settings.JUDGE_LOG_SAMPLE_RATE
+    if rate <= 0:
+        return False
+    if rate >= 1:
+        return True
+    digest = hashlib.sha256(submission_id.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64 < rate
+
+
+@contextlib.contextmanager
+def bind_submission(submission_id: str) -> Iterator[bool]:
+    """Asociar los registros emitidos dentro del bloque a la submisión; devuelve si está muestreada"""
+    sampled = is_sampled(submission_id)
+    token = submission_context.set({"submission_id": submission_id, "sampled": sampled})
+    try:
+        yield sampled
+    finally:
+        submission_context.reset(token)
+
+
+def trace_enabled(logger: logging.Logger) -> bool:
+    """
+    Indicar si hay que construir la traza detallada (código, salidas): nivel DEBUG
+    habilitado y submisión muestreada. Se consulta antes de preparar el contenido
+    para no pagar su costo cuando no se registra.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    context = submission_context.get()
+    return context is None or context["sampled"]
+
+
+def truncate(payload: Union[str, bytes, None], limit: Optional[int] = None) -> str:
+    """Recortar un contenido para el log, indicando cuánto se omitió"""
+    if payload is None:
+        return ""
+    if isinstance(payload, bytes):
+        payload = payload.decode("utf-8", errors="replace")
+    limit = settings.JUDGE_LOG_PAYLOAD_LIMIT if limit is None else limit
+    if len(payload) <= limit:
+        return payload
+    return f"{payload[:limit]}... ({len(payload) - limit} caracteres omitidos)"
+
+
+class SubmissionContextFilter(logging.Filter):
+    """Agregar `submission_id` a los registros emitidos durante la evaluación de una submisión"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = submission_context.get()
+        if context is not None and not hasattr(record, "submission_id"):
+            record.submission_id = context["submission_id"]
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los campos pasados en `extra`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legible para desarrollo; los campos de `extra` se agregan como clave=valor"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = [
+            f"{key}={value}" for key, value in vars(record).items()
+            if key not in RESERVED_ATTRIBUTES and not key.startswith("_")
+        ]
+        return f"{text} [{' '.join(fields)}]" if fields else text
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """`QueueHandler` que descarta el registro si la cola está llena"""
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def setup_logging():
+    """
+    Configurar el logging del proceso (API o worker). Los registros se encolan
+    sin bloquear y un hilo (`QueueListener`) los formatea y escribe, así que
+    registrar en el camino del juez no espera a la E/S.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+
+    # Cola acotada: si el hilo escritor no da abasto se descartan registros en lugar de frenar al juez
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SubmissionContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Escribir los registros pendientes y detener el hilo escritor"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Histogram, Gauge
 
 # Contador de peticiones HTTP
 REQUEST_COUNT = Counter(
@@ -20,3 +20,121 @@ ERROR_COUNT = Counter(
     "Total HTTP errors", 
     ["method", "endpoint"]
 )
+
+# Aciertos y fallos del pool de contenedores pre-iniciados
+SANDBOX_POOL_HITS = Counter(
+    "judge_sandbox_pool_hits_total",
+    "Executions served by a pre-started container",
+    ["language"]
+)
+
+SANDBOX_POOL_MISSES = Counter(
+    "judge_sandbox_pool_misses_total",
+    "Executions that had to start a new container",
+    ["language"]
+)
+
+# Contenedores inactivos disponibles en el pool
+SANDBOX_POOL_IDLE = Gauge(
+    "judge_sandbox_pool_idle_containers",
+    "Idle pre-started containers in the pool",
+    ["language"]
+)
+
+# Latencia de las llamadas al daemon de Docker por operación
+DOCKER_CALL_DURATION = Histogram(
+    "judge_docker_call_duration_seconds",
+    "Docker SDK call duration in seconds",
+    ["operation"]
+)
+
+# Llamadas a Docker en curso
+DOCKER_CALLS_IN_FLIGHT = Gauge(
+    "judge_docker_calls_in_flight",
+    "Docker SDK calls currently running"
+)
+
+
+# Aciertos y fallos del caché de veredictos
+VERDICT_CACHE_HITS = Counter(
+    "judge_verdict_cache_hits_total",
+    "Submissions resolved from the verdict cache",
+    ["language"]
+)
+
+VERDICT_CACHE_MISSES = Counter(
+    "judge_verdict_cache_misses_total",
+    "Submissions not found in the verdict cache",
+    ["language"]
+)
+
+# Aciertos y fallos de los demás cachés del juez ("artifact", "problem", "test_cases", "blob")
+CACHE_HITS = Counter(
+    "judge_cache_hits_total",
+    "Lookups served from a judge cache",
+    ["cache"]
+)
+
+CACHE_MISSES = Counter(
+    "judge_cache_misses_total",
+    "Lookups that missed a judge cache",
+    ["cache"]
+)
+
+# Submisiones esperando evaluación: en modo inline, las de este proceso;
+# en modo queue, los trabajos en cola según el último conteo del worker
+SUBMISSIONS_PENDING = Gauge(
+    "judge_submissions_pending",
+    "Submissions waiting to be judged"
+)
+
+# Submisiones rechazadas por el control de admisión (cola llena)
+SUBMISSIONS_REJECTED = Counter(
+    "judge_submissions_rejected_total",
+    "Submissions rejected because the judge queue was full"
+)
+
+# Submisiones evaluándose en este proceso
+SUBMISSIONS_RUNNING = Gauge(
+    "judge_submissions_running",
+    "Submissions currently being judged",
+    ["language"]
+)
+
+# Tiempo desde que se creó la submisión hasta que empieza su evaluación
+QUEUE_WAIT_TIME = Histogram(
+    "judge_queue_wait_seconds",
+    "Time between submission creation and the start of judging",
+    ["language"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+
+# Tiempo real de ejecución del programa por caso de prueba
+TEST_CASE_RUN_TIME = Histogram(
+    "judge_test_case_run_seconds",
+    "Wall time of a program run for one test case",
+    ["language"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+# Tiempo hasta tener un sandbox listo (contenedor del pool o nuevo)
+SANDBOX_STARTUP_TIME = Histogram(
+    "judge_sandbox_startup_seconds",
+    "Time to obtain a ready sandbox",
+    ["language"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+# Veredictos finales de las submisiones
+VERDICTS = Counter(
+    "judge_verdicts_total",
+    "Final submission verdicts",
+    ["language", "status"]
+)
+
+# Llamadas a Docker que terminaron con error, por operación
+DOCKER_ERRORS = Counter(
+    "judge_docker_errors_total",
+    "Docker SDK calls that raised an error",
+    ["operation"]
+)
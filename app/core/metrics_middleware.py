@@ -0,0 +1,50 @@
+import time
+from typing import Iterable, Optional
+
+from app.core.metrics import REQUEST_COUNT, RESPONSE_TIME, ERROR_COUNT
+
+# Etiqueta de las peticiones que no coinciden con ninguna ruta (404); agruparlas
+# evita una serie temporal por cada URL desconocida
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que registra las métricas HTTP de cada petición.
+
+    Las métricas se etiquetan con la plantilla de la ruta que atendió la
+    petición (por ejemplo `/api/v1/submissions/{submission_id}`), que FastAPI
+    deja en `scope["route"]`, para que la cantidad de series temporales no crezca
+    con cada id. Las rutas de `excluded_paths` (como `/metrics`) no se registran.
+    """
+
+    def __init__(self, app, excluded_paths: Optional[Iterable[str]] = None):
+        self.app = app
+        self.excluded_paths = frozenset(excluded_paths or ())
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500  # si la aplicación falla antes de responder
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start_time
+            route = scope.get("route")
+            endpoint = getattr(route, "path_format", None) or getattr(route, "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+
+            RESPONSE_TIME.labels(method=method, endpoint=endpoint).observe(duration)
+            REQUEST_COUNT.labels(method=method, endpoint=endpoint).inc()
+            if status_code >= 400:
+                ERROR_COUNT.labels(method=method, endpoint=endpoint).inc()
@@ -73,10 +73,14 @@ async def create_indexes():
         
         # Índices para problemas
         await MongoDB.database.problems.create_index("title")
-        await MongoDB.database.problems.create_index("difficulty")
+        await MongoDB.database.problems.create_index([("difficulty", 1), ("_id", 1)])  # listado por cursor
         
-        # Índices para submisiones
-        await MongoDB.database.submissions.create_index("user_id")
+        # Índices para submisiones; los compuestos sirven el listado por usuario
+        # (filtro, orden y paginación por cursor) sin ordenar en memoria
+        await MongoDB.database.submissions.create_index([("user_email", 1), ("created_at", -1), ("_id", -1)])
+        await MongoDB.database.submissions.create_index(
+            [("user_email", 1), ("problem_id", 1), ("created_at", -1), ("_id", -1)]
+        )
         await MongoDB.database.submissions.create_index("problem_id")
         await MongoDB.database.submissions.create_index("status")
         await MongoDB.database.submissions.create_index("created_at")
@@ -84,6 +88,27 @@ async def create_indexes():
         # Índices para casos de prueba
         await MongoDB.database.test_cases.create_index("problem_id")
         
+        # Índices para resultados por caso de prueba
+        await MongoDB.database.test_case_results.create_index([("submission_id", 1), ("index", 1)])
+        
+        # Caché de veredictos; las entradas expiran tras JUDGE_VERDICT_CACHE_TTL_DAYS
+        await MongoDB.database.verdict_cache.create_index(
+            "created_at",
+            expireAfterSeconds=settings.JUDGE_VERDICT_CACHE_TTL_DAYS * 24 * 3600
+        )
+        
+        # Índices para la cola de evaluación
+        await MongoDB.database.judge_jobs.create_index([("status", 1), ("created_at", 1)])
+        await MongoDB.database.judge_jobs.create_index([("status", 1), ("lease_expires_at", 1)])
+        await MongoDB.database.judge_jobs.create_index("submission_id")
+        await MongoDB.database.judge_jobs.create_index([("lane", 1), ("status", 1), ("created_at", 1)])
+        
+        # Eventos de progreso compartidos entre procesos; solo hacen falta mientras se evalúa
+        await MongoDB.database.submission_events.create_index(
+            "created_at",
+            expireAfterSeconds=settings.PROGRESS_EVENTS_TTL_SECONDS
+        )
+        
         logger.info("Índices creados exitosamente")
         
     except Exception as e:
@@ -0,0 +1,541 @@
+import asyncio
+import ctypes
+import logging
+import math
+import os
+import platform
+import resource
+import shutil
+import signal
+import struct
+import tempfile
+import uuid
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+from app.core.config import settings
+from app.core.process import run_process_streaming
+
+logger = logging.getLogger(__name__)
+
+# Directorio de trabajo del programa dentro del sandbox
+SANDBOX_WORKDIR = "/tmp/sandbox"
+
+# uid/gid del programa dentro del espacio de nombres de usuario (fuera es el del juez)
+SANDBOX_UID = 1000
+
+# Código de salida y prefijo de stderr cuando falla la preparación del sandbox
+SETUP_FAILED_EXIT_CODE = 121
+SETUP_ERROR_PREFIX = b"native-sandbox: "
+
+# El límite de espacio de direcciones es un respaldo del límite del cgroup
+ADDRESS_SPACE_FACTOR = 2
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUTS = 0x04000000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWPID = 0x20000000
+CLONE_NEWNET = 0x40000000
+CLONE_NEWCGROUP = 0x02000000
+CLONE_NEWTIME = 0x00000080
+
+MS_RDONLY = 1
+MS_NOSUID = 2
+MS_NODEV = 4
+MS_NOEXEC = 8
+MS_REMOUNT = 32
+MS_NOATIME = 1024
+MS_NODIRATIME = 2048
+MS_BIND = 4096
+MS_REC = 16384
+MS_PRIVATE = 1 << 18
+MS_RELATIME = 1 << 21
+MS_STRICTATIME = 1 << 24
+
+# Opciones de montaje que el kernel bloquea al remontar dentro de un espacio de nombres de usuario
+LOCKED_MOUNT_OPTIONS = {
+    "nosuid": MS_NOSUID,
+    "nodev": MS_NODEV,
+    "noexec": MS_NOEXEC,
+    "noatime": MS_NOATIME,
+    "nodiratime": MS_NODIRATIME,
+    "relatime": MS_RELATIME,
+    "strictatime": MS_STRICTATIME,
+}
+
+# Sistemas de archivos virtuales en los que el remontaje de solo lectura es best effort
+PSEUDO_MOUNT_PREFIXES = ("/proc", "/sys", "/dev")
+
+PR_SET_NO_NEW_PRIVS = 38
+PR_SET_SECCOMP = 22
+SECCOMP_MODE_FILTER = 2
+
+# Llamadas al sistema permitidas (x86_64). Cubren los runtimes de Python, Node y
+# la JVM; el resto devuelve EPERM. `clone` se permite sin flags de namespaces y
+# `clone3` devuelve ENOSYS para que la libc use `clone`.
+SECCOMP_ALLOWED_SYSCALLS = {
+    "read": 0, "write": 1, "open": 2, "close": 3, "stat": 4, "fstat": 5, "lstat": 6,
+    "poll": 7, "lseek": 8, "mmap": 9, "mprotect": 10, "munmap": 11, "brk": 12,
+    "rt_sigaction": 13, "rt_sigprocmask": 14, "rt_sigreturn": 15, "ioctl": 16,
+    "pread64": 17, "pwrite64": 18, "readv": 19, "writev": 20, "access": 21, "pipe": 22,
+    "select": 23, "sched_yield": 24, "mremap": 25, "msync": 26, "mincore": 27,
+    "madvise": 28, "dup": 32, "dup2": 33, "pause": 34, "nanosleep": 35, "getitimer": 36,
+    "alarm": 37, "setitimer": 38, "getpid": 39, "sendfile": 40, "fork": 57, "vfork": 58,
+    "execve": 59, "exit": 60, "wait4": 61, "kill": 62, "uname": 63, "fcntl": 72,
+    "flock": 73, "fsync": 74, "fdatasync": 75, "truncate": 76, "ftruncate": 77,
+    "getdents": 78, "getcwd": 79, "chdir": 80, "fchdir": 81, "rename": 82, "mkdir": 83,
+    "rmdir": 84, "creat": 85, "link": 86, "unlink": 87, "symlink": 88, "readlink": 89,
+    "chmod": 90, "fchmod": 91, "umask": 95, "gettimeofday": 96, "getrlimit": 97,
+    "getrusage": 98, "sysinfo": 99, "times": 100, "getuid": 102, "getgid": 104,
+    "geteuid": 107, "getegid": 108, "getppid": 110, "getpgrp": 111, "getgroups": 115,
+    "getresuid": 118, "getresgid": 120, "getpgid": 121, "getsid": 124, "capget": 125,
+    "rt_sigpending": 127, "rt_sigtimedwait": 128, "rt_sigqueueinfo": 129,
+    "rt_sigsuspend": 130, "sigaltstack": 131, "statfs": 137, "fstatfs": 138,
+    "getpriority": 140, "sched_getparam": 143, "sched_getscheduler": 145,
+    "sched_get_priority_max": 146, "sched_get_priority_min": 147, "prctl": 157,
+    "arch_prctl": 158, "setrlimit": 160, "gettid": 186, "readahead": 187,
+    "getxattr": 191, "lgetxattr": 192, "fgetxattr": 193, "listxattr": 194,
+    "llistxattr": 195, "flistxattr": 196, "tkill": 200, "time": 201, "futex": 202,
+    "sched_getaffinity": 204, "epoll_create": 213, "getdents64": 217,
+    "set_tid_address": 218, "restart_syscall": 219, "fadvise64": 221,
+    "timer_create": 222, "timer_settime": 223, "timer_gettime": 224,
+    "timer_getoverrun": 225, "timer_delete": 226, "clock_gettime": 228,
+    "clock_getres": 229, "clock_nanosleep": 230, "exit_group": 231, "epoll_wait": 232,
+    "epoll_ctl": 233, "tgkill": 234, "waitid": 247, "openat": 257, "mkdirat": 258,
+    "newfstatat": 262, "unlinkat": 263, "renameat": 264, "linkat": 265, "symlinkat": 266,
+    "readlinkat": 267, "fchmodat": 268, "faccessat": 269, "pselect6": 270, "ppoll": 271,
+    "set_robust_list": 273, "get_robust_list": 274, "splice": 275, "tee": 276,
+    "utimensat": 280, "epoll_pwait": 281, "signalfd": 282, "timerfd_create": 283,
+    "eventfd": 284, "fallocate": 285, "timerfd_settime": 286, "timerfd_gettime": 287,
+    "signalfd4": 289, "eventfd2": 290, "epoll_create1": 291, "dup3": 292, "pipe2": 293,
+    "preadv": 295, "pwritev": 296, "prlimit64": 302, "getcpu": 309, "renameat2": 316,
+    "getrandom": 318, "memfd_create": 319, "membarrier": 324, "copy_file_range": 326,
+    "preadv2": 327, "pwritev2": 328, "statx": 332, "rseq": 334, "close_range": 436,
+    "openat2": 437, "faccessat2": 439, "epoll_pwait2": 441,
+}
+SYSCALL_CLONE = 56
+SYSCALL_CLONE3 = 435
+CLONE_NAMESPACE_FLAGS = (
+    CLONE_NEWNS | CLONE_NEWUTS | CLONE_NEWIPC | CLONE_NEWUSER | CLONE_NEWPID
+    | CLONE_NEWNET | CLONE_NEWCGROUP | CLONE_NEWTIME
+)
+
+AUDIT_ARCH_X86_64 = 0xC000003E
+X32_SYSCALL_BIT = 0x40000000
+
+BPF_LD_W_ABS = 0x20
+BPF_JEQ_K = 0x15
+BPF_JGE_K = 0x35
+BPF_JSET_K = 0x45
+BPF_RET_K = 0x06
+
+SECCOMP_RET_KILL_PROCESS = 0x80000000
+SECCOMP_RET_ERRNO = 0x00050000
+SECCOMP_RET_ALLOW = 0x7FFF0000
+
+# Desplazamientos en `struct seccomp_data`
+SECCOMP_DATA_NR = 0
+SECCOMP_DATA_ARCH = 4
+SECCOMP_DATA_ARG0 = 16
+
+
+class SockFprog(ctypes.Structure):
+    _fields_ = [("len", ctypes.c_ushort), ("filter", ctypes.c_void_p)]
+
+
+def build_seccomp_filter() -> bytes:
+    """Programa BPF de seccomp con la lista de llamadas permitidas"""
+    def stmt(code, k, jt=0, jf=0):
+        return struct.pack("HBBI", code, jt, jf, k)
+
+    deny = SECCOMP_RET_ERRNO | 1  # EPERM
+    program = [
+        stmt(BPF_LD_W_ABS, SECCOMP_DATA_ARCH),
+        stmt(BPF_JEQ_K, AUDIT_ARCH_X86_64, jt=1),
+        stmt(BPF_RET_K, SECCOMP_RET_KILL_PROCESS),
+        stmt(BPF_LD_W_ABS, SECCOMP_DATA_NR),
+        stmt(BPF_JGE_K, X32_SYSCALL_BIT, jf=1),
+        stmt(BPF_RET_K, SECCOMP_RET_KILL_PROCESS),
+        # clone3 recibe los flags en memoria; ENOSYS hace que la libc use clone
+        stmt(BPF_JEQ_K, SYSCALL_CLONE3, jf=1),
+        stmt(BPF_RET_K, SECCOMP_RET_ERRNO | 38),  # ENOSYS
+        # clone solo sin flags de nuevos namespaces
+        stmt(BPF_JEQ_K, SYSCALL_CLONE, jf=4),
+        stmt(BPF_LD_W_ABS, SECCOMP_DATA_ARG0),
+        stmt(BPF_JSET_K, CLONE_NAMESPACE_FLAGS, jf=1),
+        stmt(BPF_RET_K, deny),
+        stmt(BPF_RET_K, SECCOMP_RET_ALLOW),
+    ]
+    for number in sorted(SECCOMP_ALLOWED_SYSCALLS.values()):
+        program.append(stmt(BPF_JEQ_K, number, jf=1))
+        program.append(stmt(BPF_RET_K, SECCOMP_RET_ALLOW))
+    program.append(stmt(BPF_RET_K, deny))
+    return b"".join(program)
+
+
+def _unescape_mount_path(path: str) -> str:
+    """Decodificar los escapes octales de /proc/self/mountinfo (por ejemplo `\\040`)"""
+    if "\\" not in path:
+        return path
+    return path.encode("latin-1").decode("unicode_escape").encode("latin-1").decode("utf-8", errors="replace")
+
+
+def read_mounts() -> List[Tuple[str, int]]:
+    """Puntos de montaje del proceso con sus opciones bloqueadas, en orden de montaje"""
+    mounts = []
+    with open("/proc/self/mountinfo") as f:
+        for line in f:
+            fields = line.split()
+            flags = 0
+            for option in fields[5].split(","):
+                flags |= LOCKED_MOUNT_OPTIONS.get(option, 0)
+            mounts.append((_unescape_mount_path(fields[4]), flags))
+    return mounts
+
+
+def _mount_flags_for(path: str, mounts: List[Tuple[str, int]]) -> int:
+    """Opciones bloqueadas del montaje que contiene `path`"""
+    best, flags = "", 0
+    for mount_point, mount_flags in mounts:
+        prefix = mount_point.rstrip("/") + "/"
+        if (path == mount_point or path.startswith(prefix) or mount_point == "/") and len(mount_point) >= len(best):
+            best, flags = mount_point, mount_flags
+    return flags
+
+
+class NativeSandbox:
+    """
+    Sandbox nativo de Linux, sin Docker: el programa corre en nuevos espacios de
+    nombres de usuario, PID, montaje, red, IPC y UTS, con límites de `setrlimit`,
+    un filtro seccomp con lista de llamadas permitidas y una hoja de cgroup v2
+    por ejecución para la memoria, los procesos y la medición de recursos.
+
+    El sistema de archivos del host se ve de solo lectura; el programa solo puede
+    escribir en su directorio de trabajo (`SANDBOX_WORKDIR`) y en un /tmp propio.
+    Los datos del juez (casos de prueba, artefactos, configuración) se ocultan.
+    La preparación se hace en `preexec_fn`, entre el fork y el exec, por lo que
+    iniciar el sandbox cuesta unos pocos milisegundos.
+    """
+
+    def __init__(self):
+        self._available: Optional[bool] = None
+        self._check_lock = asyncio.Lock()
+        self._libc = None
+        self._seccomp_program = None
+
+    async def check(self) -> bool:
+        """
+        Verificar una sola vez que el sandbox funciona en este host (kernel,
+        espacios de nombres de usuario y cgroup delegado) ejecutando un programa vacío
+        """
+        if self._available is not None:
+            return self._available
+        async with self._check_lock:
+            if self._available is None:
+                self._available = await self._probe()
+        return self._available
+
+    async def _probe(self) -> bool:
+        if platform.system() != "Linux" or platform.machine() != "x86_64":
+            logger.error("El sandbox nativo requiere Linux x86_64; se usará Docker")
+            return False
+        root = settings.NATIVE_SANDBOX_CGROUP_ROOT
+        if not os.path.isfile(os.path.join(root, "cgroup.procs")):
+            logger.error(f"El cgroup v2 del sandbox nativo no existe: {root}; se usará Docker")
+            return False
+        try:
+            # Habilitar los controladores para las hojas (puede estar hecho por el administrador)
+            with open(os.path.join(root, "cgroup.subtree_control"), "w") as f:
+                f.write("+memory +pids")
+        except OSError as e:
+            logger.warning(f"No se pudieron habilitar los controladores del cgroup del sandbox: {e}")
+        try:
+            result = await self.run(
+                files={},
+                command=["sh", "-c", "exit 0"],
+                on_stdout=lambda chunk: True,
+                time_limit=5000,
+                memory_limit=64,
+                output_limit=1024
+            )
+        except Exception as e:
+            logger.error(f"El sandbox nativo no está disponible: {e}; se usará Docker")
+            return False
+        if result.get("setup_error") or result["returncode"] != 0:
+            message = result.get("setup_error") or f"código de salida {result['returncode']}"
+            logger.error(f"El sandbox nativo no está disponible: {message}; se usará Docker")
+            return False
+        logger.info("Sandbox nativo disponible")
+        return True
+
+    def _prepare(self):
+        """Cargar libc y construir el filtro seccomp (una vez por proceso)"""
+        if self._libc is None:
+            self._libc = ctypes.CDLL(None, use_errno=True)
+            self._libc.mount.argtypes = [
+                ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_ulong, ctypes.c_char_p
+            ]
+            self._libc.unshare.argtypes = [ctypes.c_int]
+            filter_bytes = build_seccomp_filter()
+            self._seccomp_buffer = ctypes.create_string_buffer(filter_bytes, len(filter_bytes))
+            self._seccomp_program = SockFprog(
+                len(filter_bytes) // 8, ctypes.cast(self._seccomp_buffer, ctypes.c_void_p)
+            )
+
+    def _hidden_paths(self) -> List[str]:
+        """Rutas del host que el programa no debe ver: datos del juez y configuración"""
+        paths = [
+            settings.TEMP_DIR, settings.UPLOAD_DIR, settings.JUDGE_BLOB_CACHE_DIR,
+            settings.JUDGE_ARTIFACT_CACHE_DIR, ".env", *settings.NATIVE_SANDBOX_HIDDEN_PATHS
+        ]
+        hidden = []
+        for path in sorted({os.path.realpath(path) for path in paths}, key=len):
+            if not os.path.exists(path) or path.startswith("/tmp/") or path == "/tmp":
+                continue
+            if any(path.startswith(parent.rstrip("/") + "/") for parent in hidden):
+                continue
+            hidden.append(path)
+        return hidden
+
+    def _create_cgroup(self, memory_limit: int) -> str:
+        """Crear la hoja de cgroup de una ejecución con sus límites"""
+        path = os.path.join(settings.NATIVE_SANDBOX_CGROUP_ROOT, f"run-{os.getpid()}-{uuid.uuid4().hex[:12]}")
+        os.mkdir(path)
+        limits = {
+            "memory.max": str(memory_limit * 1024 * 1024),
+            "memory.swap.max": "0",
+            "pids.max": str(settings.NATIVE_SANDBOX_PIDS_LIMIT),
+        }
+        for name, value in limits.items():
+            try:
+                with open(os.path.join(path, name), "w") as f:
+                    f.write(value)
+            except FileNotFoundError:
+                if name != "memory.swap.max":  # no existe sin swap en el kernel
+                    raise
+        return path
+
+    def _read_cgroup_usage(self, path: str) -> Dict[str, Any]:
+        """CPU (ms), pico de memoria (KB) y terminaciones del OOM killer de la hoja (None si no se puede leer)"""
+        def read_keys(name: str) -> Dict[str, int]:
+            try:
+                with open(os.path.join(path, name)) as f:
+                    return {key: int(value) for key, value in (line.split() for line in f)}
+            except (OSError, ValueError):
+                return {}
+
+        peak = None
+        try:
+            with open(os.path.join(path, "memory.peak")) as f:
+                peak = int(f.read()) // 1024
+        except (OSError, ValueError):
+            pass
+        usage_usec = read_keys("cpu.stat").get("usage_usec")
+        return {
+            "cpu_time": usage_usec // 1000 if usage_usec is not None else None,
+            "memory_used": peak,
+            "oom_killed": read_keys("memory.events").get("oom_kill", 0) > 0
+        }
+
+    async def _remove_cgroup(self, path: str):
+        """Terminar lo que quede en la hoja y borrarla"""
+        try:
+            with open(os.path.join(path, "cgroup.kill"), "w") as f:
+                f.write("1")
+        except OSError:
+            pass
+        for _ in range(50):
+            try:
+                os.rmdir(path)
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                await asyncio.sleep(0.01)
+        logger.warning(f"No se pudo borrar el cgroup del sandbox: {path}")
+
+    def _setup_child(
+        self,
+        workdir: str,
+        procs_fd: int,
+        mounts: List[Tuple[str, int]],
+        hidden_paths: List[str],
+        ro_binds: List[Tuple[str, str, int]],
+        workdir_flags: int,
+        rlimits: List[Tuple[int, int]]
+    ) -> Callable[[], None]:
+        """
+        Función que prepara el sandbox en el proceso hijo, antes del exec.
+
+        El hijo crea los espacios de nombres y hace un fork: el nuevo proceso
+        es el PID 1 de su espacio de nombres y es el que ejecuta el programa; el
+        intermedio solo espera y termina con el mismo estado.
+        """
+        libc = self._libc
+        seccomp_program = self._seccomp_program
+        uid, gid = os.getuid(), os.getgid()
+
+        def check(result, what):
+            if result != 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, f"{what}: {os.strerror(errno)}")
+
+        def mount(source, target, fstype, flags, data=None, what="mount"):
+            check(libc.mount(
+                source.encode() if source else None,
+                target.encode(),
+                fstype.encode() if fstype else None,
+                flags,
+                data.encode() if data else None
+            ), f"{what} {target}")
+
+        def setup():
+            try:
+                check(libc.unshare(
+                    CLONE_NEWUSER | CLONE_NEWNS | CLONE_NEWPID | CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS
+                ), "unshare")
+                with open("/proc/self/setgroups", "w") as f:
+                    f.write("deny")
+                with open("/proc/self/uid_map", "w") as f:
+                    f.write(f"{SANDBOX_UID} {uid} 1")
+                with open("/proc/self/gid_map", "w") as f:
+                    f.write(f"{SANDBOX_UID} {gid} 1")
+
+                pid = os.fork()
+                if pid:
+                    # Proceso intermedio: esperar al programa y terminar igual que él
+                    os.closerange(0, os.sysconf("SC_OPEN_MAX"))
+                    _, status = os.waitpid(pid, 0)
+                    if os.WIFSIGNALED(status):
+                        signal.signal(os.WTERMSIG(status), signal.SIG_DFL)
+                        os.kill(os.getpid(), os.WTERMSIG(status))
+                    os._exit(os.waitstatus_to_exitcode(status) & 0xFF)
+
+                # Sistema de archivos: nada se propaga al host y todo queda de solo lectura
+                mount(None, "/", None, MS_REC | MS_PRIVATE, what="make-private")
+                for source, target, flags in ro_binds:
+                    mount(source, target, None, MS_BIND, what="bind")
+                    mount(None, target, None, MS_REMOUNT | MS_BIND | MS_RDONLY | flags, what="remount")
+                for mount_point, flags in mounts:
+                    try:
+                        mount(None, mount_point, None, MS_REMOUNT | MS_BIND | MS_RDONLY | flags, what="remount")
+                    except OSError:
+                        if not mount_point.startswith(PSEUDO_MOUNT_PREFIXES):
+                            raise
+
+                # /tmp propio con el directorio de trabajo del programa
+                mount("tmpfs", "/tmp", "tmpfs", MS_NOSUID | MS_NODEV,
+                      f"size={settings.NATIVE_SANDBOX_TMPFS_SIZE}m,mode=1777")
+                os.mkdir(SANDBOX_WORKDIR)
+                mount(workdir, SANDBOX_WORKDIR, None, MS_BIND | MS_REC, what="bind")
+                mount(None, SANDBOX_WORKDIR, None, MS_REMOUNT | MS_BIND | workdir_flags, what="remount")
+
+                for path in hidden_paths:
+                    if os.path.isdir(path):
+                        mount("tmpfs", path, "tmpfs", MS_RDONLY | MS_NOSUID | MS_NODEV | MS_NOEXEC, "size=4k")
+                    else:
+                        mount("/dev/null", path, None, MS_BIND, what="bind")
+                mount("proc", "/proc", "proc", MS_NOSUID | MS_NODEV | MS_NOEXEC)
+                os.chdir(SANDBOX_WORKDIR)
+
+                for limit, value in rlimits:
+                    resource.setrlimit(limit, (value, value))
+
+                # La memoria se cuenta desde aquí: la copia del juez creada por el fork queda fuera
+                os.write(procs_fd, b"0")
+
+                check(libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), "no_new_privs")
+                check(libc.prctl(PR_SET_SECCOMP, SECCOMP_MODE_FILTER, ctypes.byref(seccomp_program), 0, 0), "seccomp")
+            except BaseException as e:
+                # Si se lanza la excepción, Popen no muestra el motivo; se informa por stderr
+                try:
+                    os.write(2, SETUP_ERROR_PREFIX + str(e).encode("utf-8", errors="replace") + b"\n")
+                finally:
+                    os._exit(SETUP_FAILED_EXIT_CODE)
+
+        return setup
+
+    async def run(
+        self,
+        files: Dict[str, bytes],
+        command: List[str],
+        on_stdout: Callable[[bytes], bool],
+        time_limit: int,
+        memory_limit: int,
+        output_limit: int,
+        stdin_path: Optional[str] = None,
+        ro_binds: Optional[Dict[str, str]] = None,
+        limit_address_space: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Ejecutar `command` en el sandbox con los archivos `files` en su directorio
+        de trabajo. `ro_binds` monta archivos del host, de solo lectura, en el
+        directorio de trabajo (nombre -> ruta). Devuelve lo mismo que
+        `run_process_streaming`, con la CPU y el pico de memoria del cgroup,
+        `oom_killed` y `setup_error` si el sandbox no pudo prepararse.
+        """
+        self._prepare()
+        # El directorio de trabajo no puede estar en /tmp: el sandbox monta su propio /tmp encima
+        work_root = os.path.realpath(settings.TEMP_DIR)
+        if work_root == "/tmp" or work_root.startswith("/tmp/"):
+            raise RuntimeError("TEMP_DIR no puede estar en /tmp cuando se usa el sandbox nativo")
+        workdir = tempfile.mkdtemp(prefix="native_", dir=work_root)
+        cgroup = None
+        procs_fd = None
+        try:
+            for name, content in files.items():
+                path = os.path.join(workdir, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(content)
+
+            mounts = read_mounts()
+            binds = []
+            for name, source in (ro_binds or {}).items():
+                target = os.path.join(workdir, name)
+                open(target, "wb").close()
+                source = os.path.realpath(source)
+                binds.append((source, target, _mount_flags_for(source, mounts)))
+
+            seconds = max(time_limit / 1000.0, 0.001)
+            rlimits = [
+                (resource.RLIMIT_CPU, math.ceil(seconds) + 1),
+                (resource.RLIMIT_NOFILE, settings.NATIVE_SANDBOX_NOFILE_LIMIT),
+                (resource.RLIMIT_NPROC, settings.NATIVE_SANDBOX_PIDS_LIMIT),
+                (resource.RLIMIT_FSIZE, output_limit),
+                (resource.RLIMIT_CORE, 0),
+            ]
+            if limit_address_space:
+                rlimits.append((resource.RLIMIT_AS, memory_limit * 1024 * 1024 * ADDRESS_SPACE_FACTOR))
+
+            cgroup = self._create_cgroup(memory_limit)
+            procs_fd = os.open(os.path.join(cgroup, "cgroup.procs"), os.O_WRONLY)
+
+            result = await run_process_streaming(
+                command,
+                on_stdout=on_stdout,
+                stdin_path=stdin_path,
+                timeout=seconds,
+                preexec_fn=self._setup_child(
+                    workdir, procs_fd, mounts, self._hidden_paths(), binds, _mount_flags_for(workdir, mounts), rlimits
+                )
+            )
+            if result["returncode"] == SETUP_FAILED_EXIT_CODE and result["stderr"].startswith(SETUP_ERROR_PREFIX):
+                result["setup_error"] = result["stderr"][len(SETUP_ERROR_PREFIX):].decode("utf-8", errors="replace").strip()
+            usage = self._read_cgroup_usage(cgroup)
+            # Sin cpu.stat queda la CPU de wait4, que incluye al programa; la memoria
+            # de wait4 sería la del proceso intermedio (una copia del juez), no se usa
+            if usage["cpu_time"] is None:
+                usage["cpu_time"] = result["cpu_time"]
+            result.update(usage)
+            return result
+        finally:
+            if procs_fd is not None:
+                os.close(procs_fd)
+            if cgroup:
+                await self._remove_cgroup(cgroup)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+# Instancia global del sandbox nativo
+native_sandbox = NativeSandbox()
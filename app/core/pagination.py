@@ -0,0 +1,50 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+class InvalidCursor(ValueError):
+    """El cursor de paginación no es válido"""
+
+
+def encode_cursor(document: Dict[str, Any], sort_field: str) -> str:
+    """
+    Cursor opaco que apunta después de `document` en un listado ordenado por
+    `sort_field` y `_id` (el `_id` desempata documentos con el mismo valor).
+    """
+    value = document[sort_field]
+    payload = {
+        "v": value.isoformat() if isinstance(value, datetime) else value,
+        "d": isinstance(value, datetime),
+        "id": str(document["_id"])
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, ObjectId]:
+    """Valor del campo de orden y `_id` guardados en un cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value = datetime.fromisoformat(payload["v"]) if payload["d"] else payload["v"]
+        return value, ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursor("Cursor de paginación inválido") from e
+
+
+def keyset_filter(sort_field: str, value: Any, last_id: ObjectId, descending: bool = True) -> Dict[str, Any]:
+    """
+    Filtro de los documentos que siguen a (`value`, `last_id`) en el orden
+    (`sort_field`, `_id`). A diferencia de `skip`, el costo no crece con la
+    página: MongoDB retoma el recorrido del índice en ese punto.
+    """
+    operator = "$lt" if descending else "$gt"
+    return {"$or": [
+        {sort_field: {operator: value}},
+        {sort_field: value, "_id": {operator: last_id}}
+    ]}
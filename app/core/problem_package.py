@@ -0,0 +1,289 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import posixpath
+import shutil
+import tarfile
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pydantic import ValidationError
+
+from app.core.blob_store import blob_store, test_case_paths
+from app.core.config import settings
+from app.core.database import convert_object_ids, invalidate_problem_cache
+from app.core.mongodb import get_database
+from app.core.verdict_cache import compute_test_set_fingerprint
+from app.models.base import Difficulty, TestCase
+from app.schemas.problem import ProblemBase
+
+logger = logging.getLogger(__name__)
+
+# Archivos de cada problema dentro del paquete
+MANIFEST_FILE = "problem.json"
+STATEMENT_FILE = "statement.md"
+TESTS_DIR = "tests"
+
+# Campos del problema guardados en el manifiesto (la descripción va en statement.md)
+MANIFEST_FIELDS = (
+    "title", "difficulty", "time_limit", "memory_limit",
+    "output_limit", "max_parallel_test_cases", "judging_policy"
+)
+
+
+class ProblemPackageError(ValueError):
+    """El paquete de problemas no es válido"""
+
+
+def extract_package(archive_path: str, dest_dir: str) -> List[str]:
+    """
+    Descomprimir un paquete (.tar, .tar.gz, .tar.bz2 o .tar.xz) en `dest_dir`
+    leyéndolo como flujo, miembro por miembro, sin cargarlo en memoria. Solo se
+    aceptan archivos regulares y directorios dentro de `dest_dir`, con los
+    límites de `PROBLEM_PACKAGE_MAX_FILES` y `PROBLEM_PACKAGE_MAX_UNPACKED_BYTES`.
+
+    Devuelve los directorios de los problemas: la raíz si tiene `problem.json`
+    (un solo problema) o cada subdirectorio que lo tenga (un banco).
+    """
+    files = 0
+    unpacked = 0
+    try:
+        with tarfile.open(archive_path, mode="r|*") as archive:
+            for member in archive:
+                name = posixpath.normpath(member.name)
+                if name == ".":
+                    continue
+                if posixpath.isabs(name) or name.startswith(".."):
+                    raise ProblemPackageError(f"Ruta no permitida en el paquete: {member.name}")
+                target = os.path.join(dest_dir, *name.split("/"))
+                if member.isdir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                if not member.isfile():
+                    raise ProblemPackageError(f"Tipo de archivo no permitido en el paquete: {member.name}")
+
+                files += 1
+                unpacked += member.size
+                if files > settings.PROBLEM_PACKAGE_MAX_FILES:
+                    raise ProblemPackageError("El paquete tiene demasiados archivos")
+                if unpacked > settings.PROBLEM_PACKAGE_MAX_UNPACKED_BYTES:
+                    raise ProblemPackageError("El paquete descomprimido supera el tamaño permitido")
+
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.extractfile(member) as source, open(target, "wb") as f:
+                    shutil.copyfileobj(source, f, 1024 * 1024)
+    except tarfile.TarError as e:
+        raise ProblemPackageError(f"El paquete no es un archivo tar válido: {e}") from e
+
+    if os.path.isfile(os.path.join(dest_dir, MANIFEST_FILE)):
+        return [dest_dir]
+    problem_dirs = [
+        os.path.join(dest_dir, entry) for entry in sorted(os.listdir(dest_dir))
+        if os.path.isfile(os.path.join(dest_dir, entry, MANIFEST_FILE))
+    ]
+    if not problem_dirs:
+        raise ProblemPackageError(f"El paquete no contiene ningún {MANIFEST_FILE}")
+    return problem_dirs
+
+
+def _package_file(problem_dir: str, relative_path: str) -> str:
+    """Ruta de un archivo referenciado por el manifiesto, sin salir del directorio del problema"""
+    name = posixpath.normpath(relative_path)
+    path = os.path.join(problem_dir, *name.split("/"))
+    if posixpath.isabs(name) or name.startswith("..") or not os.path.isfile(path):
+        raise ProblemPackageError(f"Archivo no encontrado en el paquete: {relative_path}")
+    return path
+
+
+def read_problem_dir(problem_dir: str) -> Dict[str, Any]:
+    """
+    Leer y validar un problema descomprimido: los campos del manifiesto, la
+    descripción (`statement.md` o `description`) y las rutas de sus casos de
+    prueba. Si el manifiesto no lista `test_cases`, se toman los pares
+    `tests/<nombre>.in` / `tests/<nombre>.out` en orden de nombre.
+    """
+    try:
+        with open(os.path.join(problem_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (ValueError, OSError) as e:
+        raise ProblemPackageError(f"{MANIFEST_FILE} inválido: {e}") from e
+
+    statement_path = os.path.join(problem_dir, STATEMENT_FILE)
+    if os.path.isfile(statement_path):
+        with open(statement_path, encoding="utf-8") as f:
+            manifest["description"] = f.read()
+
+    try:
+        problem = ProblemBase(**{key: value for key, value in manifest.items() if key != "test_cases"})
+        difficulty = Difficulty(problem.difficulty)
+    except (ValidationError, ValueError) as e:
+        raise ProblemPackageError(f"Problema inválido en {os.path.basename(problem_dir)}: {e}") from e
+
+    if "test_cases" in manifest:
+        test_cases = [
+            {
+                "input": _package_file(problem_dir, entry.get("input", "")),
+                "output": _package_file(problem_dir, entry.get("output", "")),
+                "is_sample": bool(entry.get("is_sample", False))
+            }
+            for entry in manifest["test_cases"]
+        ]
+    else:
+        tests_dir = os.path.join(problem_dir, TESTS_DIR)
+        names = sorted(
+            entry[:-3] for entry in (os.listdir(tests_dir) if os.path.isdir(tests_dir) else [])
+            if entry.endswith(".in")
+        )
+        test_cases = [
+            {
+                "input": _package_file(problem_dir, f"{TESTS_DIR}/{name}.in"),
+                "output": _package_file(problem_dir, f"{TESTS_DIR}/{name}.out"),
+                "is_sample": False
+            }
+            for name in names
+        ]
+
+    return {
+        "title": problem.title,
+        "description": problem.description,
+        "difficulty": difficulty.value,
+        "time_limit": problem.time_limit,
+        "memory_limit": problem.memory_limit,
+        "output_limit": problem.output_limit,
+        "max_parallel_test_cases": problem.max_parallel_test_cases,
+        "judging_policy": problem.judging_policy.value,
+        "test_cases": test_cases
+    }
+
+
+async def import_package(archive_path: str) -> List[Dict[str, Any]]:
+    """
+    Importar los problemas de un paquete. Los datos de prueba se suben al
+    almacén de blobs desde los archivos descomprimidos; después se insertan
+    todos los problemas con un `insert_many` y todos los casos de prueba con
+    otro. Si la segunda inserción falla se borra lo insertado, así que el
+    paquete se importa completo o no se importa.
+
+    Devuelve los problemas creados, con sus campos del listado.
+    """
+    work_dir = tempfile.mkdtemp(dir=settings.TEMP_DIR)
+    try:
+        problem_dirs = await asyncio.to_thread(extract_package, archive_path, work_dir)
+        definitions = [await asyncio.to_thread(read_problem_dir, path) for path in problem_dirs]
+
+        # Los ids se generan aquí para calcular la huella de los casos antes de insertar
+        now = datetime.now()
+        problems = []
+        test_cases = []
+        for definition in definitions:
+            problem_id = ObjectId()
+            problem_test_cases = []
+            for entry in definition.pop("test_cases"):
+                input_hash, input_size = await blob_store.put_file(entry["input"])
+                expected_hash, expected_size = await blob_store.put_file(entry["output"])
+                problem_test_cases.append({
+                    "_id": ObjectId(),
+                    "problem_id": problem_id,
+                    "input_hash": input_hash,
+                    "input_size": input_size,
+                    "expected_output_hash": expected_hash,
+                    "expected_output_size": expected_size,
+                    "is_sample": entry["is_sample"],
+                    "created_at": now
+                })
+            fingerprint = compute_test_set_fingerprint([
+                TestCase(**convert_object_ids(test_case)) for test_case in problem_test_cases
+            ])
+            problems.append({
+                "_id": problem_id,
+                **definition,
+                "test_set_fingerprint": fingerprint,
+                "created_at": now
+            })
+            test_cases.extend(problem_test_cases)
+    finally:
+        await asyncio.to_thread(shutil.rmtree, work_dir, True)
+
+    db = get_database()
+    problem_ids = [problem["_id"] for problem in problems]
+    await db.problems.insert_many(problems)
+    try:
+        if test_cases:
+            await db.test_cases.insert_many(test_cases)
+    except Exception:
+        await db.test_cases.delete_many({"problem_id": {"$in": problem_ids}})
+        await db.problems.delete_many({"_id": {"$in": problem_ids}})
+        raise
+
+    # Los problemas son nuevos; basta con avisar una vez a los demás procesos (y descartar los totales)
+    await invalidate_problem_cache(str(problem_ids[0]))
+    logger.info(
+        "Paquete de problemas importado",
+        extra={"problems": len(problems), "test_cases": len(test_cases)}
+    )
+    return [
+        {
+            "_id": str(problem["_id"]),
+            **{field: problem[field] for field in ("title", "difficulty", "time_limit", "memory_limit", "created_at")}
+        }
+        for problem in problems
+    ]
+
+
+def _write_package(dest_path: str, entries: List[Dict[str, Any]]):
+    """Escribir el .tar.gz del paquete; cada problema va en un directorio con su id"""
+    with tarfile.open(dest_path, mode="w:gz") as archive:
+        for entry in entries:
+            root = entry["name"]
+            for name, data in (
+                (MANIFEST_FILE, json.dumps(entry["manifest"], ensure_ascii=False, indent=2)),
+                (STATEMENT_FILE, entry["description"])
+            ):
+                payload = data.encode("utf-8")
+                info = tarfile.TarInfo(f"{root}/{name}")
+                info.size = len(payload)
+                info.mtime = int(datetime.now().timestamp())
+                archive.addfile(info, io.BytesIO(payload))
+            for name, path in entry["files"]:
+                archive.add(path, arcname=f"{root}/{name}", recursive=False)
+
+
+async def export_package(dest_path: str, problem_ids: Optional[List[str]] = None) -> int:
+    """
+    Exportar problemas (todos si no se indican ids) a un paquete con el mismo
+    formato que acepta `import_package`. Los datos de prueba se copian desde
+    los archivos locales del almacén de blobs. Devuelve la cantidad exportada.
+    """
+    db = get_database()
+    query = {"_id": {"$in": [ObjectId(problem_id) for problem_id in problem_ids]}} if problem_ids else {}
+    entries = []
+    async for problem in db.problems.find(query).sort("_id", 1):
+        manifest = {field: problem.get(field) for field in MANIFEST_FIELDS if problem.get(field) is not None}
+        manifest["test_cases"] = []
+        files = []
+        cursor = db.test_cases.find({"problem_id": problem["_id"]}).sort("_id", 1)
+        index = 0
+        async for test_case in cursor:
+            index += 1
+            input_path, expected_path = await test_case_paths(TestCase(**convert_object_ids(test_case)))
+            input_name = f"{TESTS_DIR}/{index:03d}.in"
+            output_name = f"{TESTS_DIR}/{index:03d}.out"
+            manifest["test_cases"].append({
+                "input": input_name,
+                "output": output_name,
+                "is_sample": test_case.get("is_sample", False)
+            })
+            files.extend([(input_name, input_path), (output_name, expected_path)])
+        entries.append({
+            "name": str(problem["_id"]),
+            "manifest": manifest,
+            "description": problem.get("description", ""),
+            "files": files
+        })
+
+    await asyncio.to_thread(_write_package, dest_path, entries)
+    return len(entries)
@@ -0,0 +1,314 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+# Tamaño de los bloques leídos de stdout/stderr en `run_process_streaming`
+CHUNK_SIZE = 64 * 1024
+
+# Intervalo (segundos) con el que se muestrea el pico de memoria de un proceso en ejecución
+MEMORY_SAMPLE_INTERVAL = 0.01
+
+
+async def run_process(
+    cmd: List[str],
+    input_data: bytes = b"",
+    timeout: Optional[float] = None,
+    cwd: Optional[str] = None,
+    stdin_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Ejecutar un proceso sin bloquear el event loop.
+
+    La entrada se envía por stdin y la salida se lee de los pipes mientras el
+    proceso corre. Con `stdin_path` el archivo se conecta directamente como stdin
+    del proceso, sin cargarlo en memoria. El proceso se inicia en su propio grupo
+    para que, al vencer el tiempo límite, se termine junto con todos los procesos
+    que haya creado.
+    """
+    stdin_file = open(stdin_path, "rb") if stdin_path else None
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=stdin_file or asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=cwd,
+            start_new_session=(os.name != "nt")
+        )
+    finally:
+        # El proceso hijo ya tiene su propia copia del descriptor
+        if stdin_file:
+            stdin_file.close()
+
+    timed_out = False
+    stdout, stderr = b"", b""
+    try:
+        stdout, stderr = await asyncio.wait_for(
+            process.communicate(None if stdin_path else input_data),
+            timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        timed_out = True
+    finally:
+        # Terminar el grupo completo, incluso si el proceso principal ya salió
+        kill_process_group(process)
+        await process.wait()
+
+    return {
+        "returncode": process.returncode,
+        "stdout": stdout,
+        "stderr": stderr,
+        "timed_out": timed_out
+    }
+
+
+async def run_process_streaming(
+    cmd: List[str],
+    on_stdout: Callable[[bytes], bool],
+    stdin_path: Optional[str] = None,
+    timeout: Optional[float] = None,
+    cwd: Optional[str] = None,
+    stderr_limit: int = CHUNK_SIZE,
+    preexec_fn: Optional[Callable[[], None]] = None
+) -> Dict[str, Any]:
+    """
+    Ejecutar un proceso entregando su salida por bloques a `on_stdout`, sin
+    acumularla. Si `on_stdout` devuelve False se deja de leer y se termina el
+    grupo de procesos (`stopped` en el resultado). De stderr solo se guardan
+    los primeros `stderr_limit` bytes.
+
+    El resultado incluye el tiempo real (`wall_time`, ms) y, en POSIX, los
+    recursos que usó el proceso: tiempo de CPU de usuario y sistema según
+    `wait4` (`cpu_time`, ms) y pico de memoria residente (`memory_used`, KB).
+
+    En Linux el `ru_maxrss` de un hijo hereda el pico del proceso que lo creó
+    (el exec lo toma de la memoria del padre), así que solo es del programa si
+    supera el pico de este proceso al momento de crearlo. Si no, se usa el
+    `VmHWM` del programa, muestreado mientras corre.
+
+    `preexec_fn` se ejecuta en el hijo antes del exec (solo en POSIX); lo usa
+    el sandbox nativo para aislar el proceso.
+    """
+    if not hasattr(os, "wait4"):
+        return await _run_process_streaming_asyncio(cmd, on_stdout, stdin_path, timeout, cwd, stderr_limit)
+
+    loop = asyncio.get_running_loop()
+    inherited_rss = peak_rss("self") or 0
+    stdin_file = open(stdin_path, "rb") if stdin_path else None
+    try:
+        # El proceso se crea fuera de asyncio para esperarlo con wait4 y obtener su rusage
+        process = subprocess.Popen(
+            cmd,
+            stdin=stdin_file or subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+            start_new_session=True,
+            preexec_fn=preexec_fn
+        )
+    finally:
+        if stdin_file:
+            stdin_file.close()
+    start_time = time.monotonic()
+    waiter = asyncio.ensure_future(_wait_for_exit(process))
+
+    transports = []
+    stderr = bytearray()
+    stopped = False
+    sampled_rss = None
+
+    async def open_reader(pipe) -> asyncio.StreamReader:
+        reader = asyncio.StreamReader(limit=CHUNK_SIZE)
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        transports.append(transport)
+        return reader
+
+    async def read_stdout():
+        nonlocal stopped
+        reader = await open_reader(process.stdout)
+        while True:
+            chunk = await reader.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            if not on_stdout(chunk):
+                stopped = True
+                kill_process_group(process)
+                return
+
+    async def read_stderr():
+        reader = await open_reader(process.stderr)
+        while True:
+            chunk = await reader.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            stderr.extend(chunk[:max(stderr_limit - len(stderr), 0)])
+
+    async def sample_memory():
+        nonlocal sampled_rss
+        while not waiter.done():
+            value = peak_rss(process.pid)
+            if value is not None:
+                sampled_rss = max(sampled_rss or 0, value)
+            await asyncio.sleep(MEMORY_SAMPLE_INTERVAL)
+
+    async def run():
+        await asyncio.gather(read_stdout(), read_stderr())
+        await asyncio.shield(waiter)
+
+    sampler = asyncio.ensure_future(sample_memory())
+    timed_out = False
+    try:
+        await asyncio.wait_for(run(), timeout=timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+    finally:
+        kill_process_group(process)
+        returncode, rusage = await waiter
+        wall_time = int((time.monotonic() - start_time) * 1000)
+        sampler.cancel()
+        for transport in transports:
+            transport.close()
+
+    max_rss = rusage.ru_maxrss
+    if sys.platform == "darwin":
+        max_rss //= 1024  # macOS reporta bytes en lugar de KB
+    if max_rss <= inherited_rss:
+        max_rss = sampled_rss
+
+    return {
+        "returncode": returncode,
+        "stderr": bytes(stderr),
+        "timed_out": timed_out,
+        "stopped": stopped,
+        "wall_time": wall_time,
+        "cpu_time": int((rusage.ru_utime + rusage.ru_stime) * 1000),
+        "memory_used": max_rss
+    }
+
+
+def peak_rss(pid) -> Optional[int]:
+    """Pico de memoria residente (`VmHWM`, KB) de un proceso según /proc, o None si no está disponible"""
+    try:
+        with open(f"/proc/{pid}/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+async def _wait_for_exit(process: subprocess.Popen) -> Tuple[int, Any]:
+    """
+    Esperar a que termine el proceso y recogerlo con wait4, que devuelve su
+    rusage. En Linux se espera al pidfd desde el event loop; en otros
+    sistemas la espera bloqueante se hace en un hilo.
+    """
+    loop = asyncio.get_running_loop()
+    pidfd = None
+    if hasattr(os, "pidfd_open"):
+        try:
+            pidfd = os.pidfd_open(process.pid)
+        except OSError:
+            pidfd = None
+
+    if pidfd is not None:
+        exited = loop.create_future()
+        loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+        try:
+            await exited
+        finally:
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+        _, status, rusage = os.wait4(process.pid, 0)
+    else:
+        _, status, rusage = await loop.run_in_executor(None, os.wait4, process.pid, 0)
+
+    # Popen no recogió el proceso; se le informa el código para que no lo intente
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, rusage
+
+
+async def _run_process_streaming_asyncio(
+    cmd: List[str],
+    on_stdout: Callable[[bytes], bool],
+    stdin_path: Optional[str],
+    timeout: Optional[float],
+    cwd: Optional[str],
+    stderr_limit: int
+) -> Dict[str, Any]:
+    """Variante de `run_process_streaming` para sistemas sin wait4 (Windows): no mide recursos"""
+    stdin_file = open(stdin_path, "rb") if stdin_path else None
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=stdin_file or asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=cwd,
+            start_new_session=(os.name != "nt")
+        )
+    finally:
+        if stdin_file:
+            stdin_file.close()
+    start_time = time.monotonic()
+
+    stderr = bytearray()
+    stopped = False
+
+    async def read_stdout():
+        nonlocal stopped
+        while True:
+            chunk = await process.stdout.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            if not on_stdout(chunk):
+                stopped = True
+                kill_process_group(process)
+                return
+
+    async def read_stderr():
+        while True:
+            chunk = await process.stderr.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            stderr.extend(chunk[:max(stderr_limit - len(stderr), 0)])
+
+    async def run():
+        await asyncio.gather(read_stdout(), read_stderr())
+        await process.wait()
+
+    timed_out = False
+    try:
+        await asyncio.wait_for(run(), timeout=timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+    finally:
+        kill_process_group(process)
+        await process.wait()
+
+    return {
+        "returncode": process.returncode,
+        "stderr": bytes(stderr),
+        "timed_out": timed_out,
+        "stopped": stopped,
+        "wall_time": int((time.monotonic() - start_time) * 1000),
+        "cpu_time": None,
+        "memory_used": None
+    }
+
+
+def kill_process_group(process):
+    """Enviar SIGKILL al grupo de procesos creado por `run_process` o `run_process_streaming`"""
+    try:
+        if os.name == "nt":
+            if process.returncode is None:
+                process.kill()
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
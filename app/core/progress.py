@@ -0,0 +1,163 @@
+import asyncio
+import contextlib
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Set
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.core.mongodb import get_database
+
+logger = logging.getLogger(__name__)
+
+# Estados en los que la submisión todavía no tiene veredicto
+IN_PROGRESS_STATUSES = ("pending", "running")
+
+# Campos de la submisión incluidos en el evento final
+RESULT_FIELDS = ("status", "score", "execution_time", "cpu_time", "memory_used")
+
+
+def result_event(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Evento con el veredicto final a partir del resultado de la evaluación o del documento guardado"""
+    event = {"type": "result"}
+    for field in RESULT_FIELDS + ("passed_test_cases", "total_test_cases"):
+        if data.get(field) is not None:
+            event[field] = data[field]
+    return event
+
+
+class ProgressBroker:
+    """
+    Pub/sub en memoria del proceso para el progreso de las submisiones.
+
+    `evaluate_submission` publica los cambios de estado, el resultado de cada
+    caso de prueba y el veredicto final; los endpoints de streaming se suscriben
+    por id de submisión. Cada suscriptor tiene una cola acotada: si no la
+    consume, se descartan los eventos intermedios pero nunca el final.
+
+    Con varias instancias de la API o con workers (`PROGRESS_CHANGE_STREAM`),
+    los eventos también se guardan en la colección `submission_events` y cada
+    proceso los recibe con un change stream de MongoDB (requiere replica set).
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        # Identifica a este proceso para no entregar dos veces sus propios eventos
+        self.origin = uuid.uuid4().hex
+        self._watch_task: Optional[asyncio.Task] = None
+
+    @contextlib.contextmanager
+    def subscribe(self, submission_id: str) -> Iterator[asyncio.Queue]:
+        """Cola con los eventos de una submisión mientras dure el bloque"""
+        queue = asyncio.Queue(maxsize=settings.PROGRESS_QUEUE_SIZE)
+        self._subscribers.setdefault(submission_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(submission_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[submission_id]
+
+    async def publish(self, submission_id: str, event: Dict[str, Any]):
+        """Entregar un evento a los suscriptores locales y, si corresponde, a los demás procesos"""
+        self._deliver(submission_id, event)
+        if settings.PROGRESS_CHANGE_STREAM:
+            try:
+                await get_database().submission_events.insert_one({
+                    "submission_id": submission_id,
+                    "event": event,
+                    "origin": self.origin,
+                    "created_at": datetime.now()
+                })
+            except Exception as e:
+                logger.warning(f"No se pudo publicar el progreso de la submisión: {e}")
+
+    def _deliver(self, submission_id: str, event: Dict[str, Any]):
+        for queue in self._subscribers.get(submission_id, ()):
+            if queue.full():
+                if event["type"] != "result":
+                    continue
+                queue.get_nowait()  # el veredicto final reemplaza al evento más antiguo
+            queue.put_nowait(event)
+
+    def start(self):
+        """Empezar a recibir los eventos de otros procesos"""
+        if settings.PROGRESS_CHANGE_STREAM and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._watch_task
+            self._watch_task = None
+
+    async def _watch(self):
+        """Reenviar a los suscriptores locales los eventos insertados por otros procesos"""
+        resume_token = None
+        pipeline = [{"$match": {"operationType": "insert", "fullDocument.origin": {"$ne": self.origin}}}]
+        while True:
+            try:
+                async with get_database().submission_events.watch(pipeline, resume_after=resume_token) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        document = change["fullDocument"]
+                        self._deliver(document["submission_id"], document["event"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error en el change stream de progreso: {e}")
+                resume_token = None
+                await asyncio.sleep(settings.PROGRESS_CHANGE_STREAM_RETRY_SECONDS)
+
+
+# Instancia global del broker de progreso del proceso
+progress_broker = ProgressBroker()
+
+
+async def _current_state(submission_id: str) -> Optional[Dict[str, Any]]:
+    """Estado guardado de la submisión, leyendo solo los campos del evento final"""
+    return await get_database().submissions.find_one(
+        {"_id": ObjectId(submission_id)},
+        {field: 1 for field in RESULT_FIELDS}
+    )
+
+
+async def progress_events(submission_id: str) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Eventos de progreso de una submisión hasta su veredicto final. El primero es
+    el estado actual; si ya terminó, también se entrega el resultado y no hay más.
+
+    Si no llegan eventos en `PROGRESS_KEEPALIVE_SECONDS` se entrega None (para
+    mantener viva la conexión) y se revisa el estado guardado, por si la
+    evaluación terminó en un proceso cuyos eventos no llegan a este.
+    """
+    with progress_broker.subscribe(submission_id) as queue:
+        # Suscribirse antes de leer el estado para no perder eventos intermedios
+        state = await _current_state(submission_id)
+        if state is None:
+            return
+        yield {"type": "status", "status": state["status"]}
+        if state["status"] not in IN_PROGRESS_STATUSES:
+            yield result_event(state)
+            return
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.PROGRESS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                state = await _current_state(submission_id)
+                if state is None:
+                    return
+                if state["status"] not in IN_PROGRESS_STATUSES:
+                    yield result_event(state)
+                    return
+                yield None
+                continue
+            yield event
+            if event["type"] == "result":
+                return
@@ -0,0 +1,175 @@
+import asyncio
+import contextlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.core.database import (
+    get_problem_by_id, get_submission_by_id, get_test_cases_by_problem_id,
+    get_test_case_results, update_test_set_fingerprint
+)
+from app.core.job_queue import LANE_REJUDGE, active_job_submission_ids, enqueue_jobs
+from app.core.mongodb import get_database
+from app.core.verdict_cache import judging_limits_key, test_case_fingerprint
+from app.models.base import JudgingPolicy, Problem
+
+logger = logging.getLogger(__name__)
+
+# Estados en los que la submisión todavía no tiene veredicto
+IN_PROGRESS_STATUSES = ("pending", "running")
+
+# Campos de un resultado por caso guardado que se reutilizan en la re-evaluación
+REUSED_RESULT_FIELDS = (
+    "status", "execution_time", "cpu_time", "memory_used", "output",
+    "output_hash", "output_truncated", "error_message", "first_difference"
+)
+
+
+class RejudgeLane:
+    """
+    Carril de re-evaluaciones del proceso de la API (`JUDGE_DISPATCH_MODE=inline`).
+
+    Ejecuta las re-evaluaciones de a `JUDGE_REJUDGE_CONCURRENCY` y solo cuando
+    no hay submisiones de estudiantes evaluándose en el proceso, así que el
+    tráfico en vivo nunca espera por ellas. Las pendientes viven en memoria; en
+    modo queue las re-evaluaciones van a la cola durable de los workers.
+    """
+
+    def __init__(self):
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._pending: Set[str] = set()
+        self._live = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._runners: List[asyncio.Task] = []
+
+    @property
+    def pending(self) -> Set[str]:
+        return set(self._pending)
+
+    @contextlib.contextmanager
+    def live(self) -> Iterator[None]:
+        """Marcar una evaluación en vivo mientras dure el bloque; pausa el carril"""
+        self._live += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._live -= 1
+            if self._live == 0:
+                self._idle.set()
+
+    def start(self, handler: Callable[[str], Awaitable[None]]):
+        """Empezar a procesar re-evaluaciones con `handler(submission_id)`"""
+        if not self._runners:
+            self._runners = [
+                asyncio.create_task(self._run(handler))
+                for _ in range(max(settings.JUDGE_REJUDGE_CONCURRENCY, 1))
+            ]
+
+    async def stop(self):
+        for runner in self._runners:
+            runner.cancel()
+        for runner in self._runners:
+            with contextlib.suppress(asyncio.CancelledError):
+                await runner
+        self._runners = []
+
+    def submit(self, submission_ids: List[str]) -> int:
+        """Agregar submisiones al carril, omitiendo las que ya están pendientes"""
+        added = 0
+        for submission_id in submission_ids:
+            if submission_id not in self._pending:
+                self._pending.add(submission_id)
+                self._queue.put_nowait(submission_id)
+                added += 1
+        return added
+
+    async def _run(self, handler: Callable[[str], Awaitable[None]]):
+        while True:
+            submission_id = await self._queue.get()
+            try:
+                await self._idle.wait()
+                await handler(submission_id)
+            except Exception:
+                logger.exception("Error re-evaluando la submisión", extra={"submission_id": submission_id})
+            finally:
+                self._pending.discard(submission_id)
+
+
+# Instancia global del carril de re-evaluaciones del proceso
+rejudge_lane = RejudgeLane()
+
+
+async def find_stale_submissions(problem: Problem) -> List[str]:
+    """
+    Submisiones evaluadas del problema cuyo veredicto se obtuvo con otros casos
+    de prueba u otros límites. Se resuelve con una consulta, comparando las
+    huellas guardadas con las actuales del problema.
+    """
+    fingerprint = problem.test_set_fingerprint or await update_test_set_fingerprint(str(problem.id))
+    cursor = get_database().submissions.find(
+        {
+            "problem_id": ObjectId(problem.id),
+            "status": {"$nin": list(IN_PROGRESS_STATUSES)},
+            "$or": [
+                {"judged_test_set_fingerprint": {"$ne": fingerprint}},
+                {"judged_limits_key": {"$ne": judging_limits_key(problem)}}
+            ]
+        },
+        {"_id": 1}
+    )
+    return [str(submission["_id"]) async for submission in cursor]
+
+
+async def schedule_rejudge(problem: Problem) -> int:
+    """
+    Programar la re-evaluación de las submisiones desactualizadas del problema
+    en el carril de baja prioridad. Las que ya tienen una re-evaluación
+    pendiente no se repiten. Devuelve la cantidad programada.
+    """
+    submission_ids = await find_stale_submissions(problem)
+    if settings.JUDGE_DISPATCH_MODE == "queue":
+        active = {str(submission_id) for submission_id in await active_job_submission_ids(LANE_REJUDGE)}
+        scheduled = await enqueue_jobs(
+            [submission_id for submission_id in submission_ids if submission_id not in active],
+            LANE_REJUDGE
+        )
+    else:
+        scheduled = rejudge_lane.submit(submission_ids)
+    logger.info(
+        "Re-evaluación programada",
+        extra={"problem_id": str(problem.id), "stale": len(submission_ids), "scheduled": scheduled}
+    )
+    return scheduled
+
+
+async def reusable_results(submission_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Resultados guardados de la submisión que siguen valiendo, por id del caso:
+    los de casos que no cambiaron, si los límites y la política son los mismos.
+    Con `stop_on_first_failure` no se reutiliza nada.
+    """
+    submission = await get_submission_by_id(submission_id)
+    if not submission:
+        return None
+    problem = await get_problem_by_id(str(submission.problem_id))
+    if (
+        not problem
+        or problem.judging_policy == JudgingPolicy.STOP_ON_FIRST_FAILURE
+        or submission.judged_limits_key != judging_limits_key(problem)
+    ):
+        return {}
+
+    current = {
+        str(test_case.id): test_case_fingerprint(test_case)
+        for test_case in await get_test_cases_by_problem_id(str(problem.id))
+    }
+    return {
+        result["test_case_id"]: {field: result.get(field) for field in REUSED_RESULT_FIELDS}
+        for result in await get_test_case_results(submission_id)
+        if result.get("test_case_fingerprint")
+        and current.get(result["test_case_id"]) == result["test_case_fingerprint"]
+    }
@@ -0,0 +1,316 @@
+import asyncio
+import io
+import logging
+import os
+import tarfile
+import time
+from typing import Dict, List, Any, Optional, Set
+
+from docker.types import Mount
+
+from app.core.config import settings
+from app.core.docker_backend import docker_backend
+from app.core.metrics import SANDBOX_POOL_HITS, SANDBOX_POOL_MISSES, SANDBOX_POOL_IDLE
+
+logger = logging.getLogger(__name__)
+
+# Directorio de trabajo del programa: un tmpfs del usuario sin privilegios del sandbox
+SANDBOX_DIR = "/sandbox"
+
+# Archivos copiados al contenedor y estado del juez: un volumen de root que el
+# programa no puede modificar (Docker no copia archivos a un tmpfs)
+JUDGE_DIR = "/judge"
+
+# Programa a ejecutar, dentro de JUDGE_DIR; el usuario del sandbox solo puede leerlo
+PROGRAM_SUBDIR = "program"
+PROGRAM_DIR = f"{JUDGE_DIR}/{PROGRAM_SUBDIR}"
+
+# Etiqueta para identificar los contenedores creados por el pool
+POOL_LABEL = "ravencode.judge.pool"
+
+# Función de shell que imprime el uso del cgroup del contenedor como
+# "cpu_usec peak_bytes oom_kills" (cgroup v2, o v1 si no está disponible).
+# Los scripts la llaman antes y después de cada ejecución: la CPU y las
+# terminaciones por falta de memoria se miden por diferencia; el pico de
+# memoria es el del contenedor desde que se creó.
+CGROUP_USAGE_FUNCTION = """
+cgroup_usage() {
+  cpu=0; peak=0; oom=0
+  if [ -f /sys/fs/cgroup/cpu.stat ]; then
+    while read -r key value; do [ "$key" = usage_usec ] && cpu=$value; done < /sys/fs/cgroup/cpu.stat
+    [ -f /sys/fs/cgroup/memory.peak ] && read -r peak < /sys/fs/cgroup/memory.peak
+    if [ -f /sys/fs/cgroup/memory.events ]; then
+      while read -r key value; do [ "$key" = oom_kill ] && oom=$value; done < /sys/fs/cgroup/memory.events
+    fi
+  else
+    if [ -f /sys/fs/cgroup/cpuacct/cpuacct.usage ]; then
+      read -r cpu < /sys/fs/cgroup/cpuacct/cpuacct.usage
+      cpu=$((cpu / 1000))
+    fi
+    [ -f /sys/fs/cgroup/memory/memory.max_usage_in_bytes ] && read -r peak < /sys/fs/cgroup/memory/memory.max_usage_in_bytes
+    if [ -f /sys/fs/cgroup/memory/memory.oom_control ]; then
+      while read -r key value; do [ "$key" = oom_kill ] && oom=$value; done < /sys/fs/cgroup/memory/memory.oom_control
+    fi
+  fi
+  echo "$cpu $peak $oom"
+}
+"""
+
+
+# Funciones de shell para los scripts que corren como root en los contenedores.
+# `as_sandbox` ejecuta un comando con el uid sin privilegios del programa; los
+# límites de tiempo (`timeout`) van dentro, porque root no tiene CAP_KILL.
+# `kill_sandbox` termina todos los procesos de ese uid (incluidos los que se
+# desprendieron con setsid o nohup) y falla si alguno sigue vivo después de 1 s.
+SANDBOX_USER_FUNCTIONS = f"""
+as_sandbox() {{
+  setpriv --reuid={settings.DOCKER_SANDBOX_UID} --regid={settings.DOCKER_SANDBOX_UID} --clear-groups "$@"
+}}
+kill_sandbox() {{
+  as_sandbox sh -c 'i=0; while kill -9 -1 2>/dev/null || kill -0 -1 2>/dev/null; do
+    i=$((i + 1)); [ "$i" -ge 20 ] && exit 1; sleep 0.05; done; exit 0'
+}}
+"""
+
+# Script que deja un contenedor listo para otra ejecución. Falla (y el contenedor
+# se recicla) si sobrevive algún proceso del programa o si el programa dejó
+# archivos fuera de su directorio de trabajo; el resto del sistema de archivos
+# es de solo lectura.
+RESET_SCRIPT = SANDBOX_USER_FUNCTIONS + f"""
+kill_sandbox || exit 1
+as_sandbox sh -c 'test -z "$(find /tmp /dev/shm -mindepth 1 -user $(id -u) -print -quit 2>/dev/null)"' || exit 1
+as_sandbox find {SANDBOX_DIR} -mindepth 1 -delete || exit 1
+find {JUDGE_DIR} -mindepth 1 -delete
+"""
+
+
+class PooledContainer:
+    """Contenedor pre-iniciado que pertenece al pool de un lenguaje"""
+
+    def __init__(self, container, language: str, memory_limit: int):
+        self.container = container
+        self.language = language
+        self.memory_limit = memory_limit
+        self.runs = 0
+
+
+def parse_cgroup_usage(before: List[str], after: List[str]) -> Dict[str, Any]:
+    """
+    Recursos de una ejecución a partir de dos lecturas de `cgroup_usage`:
+    CPU en ms, pico de memoria del contenedor en KB (None si el kernel no lo
+    reporta) y si el OOM killer terminó algún proceso entre ambas lecturas
+    """
+    cpu_before, _, oom_before = (int(value) for value in before)
+    cpu_after, peak, oom_after = (int(value) for value in after)
+    return {
+        "cpu_time": max(cpu_after - cpu_before, 0) // 1000,
+        "memory_used": peak // 1024 if peak else None,
+        "oom_killed": oom_after > oom_before
+    }
+
+
+def build_archive(files: Dict[str, bytes], paths: Optional[Dict[str, str]] = None) -> bytes:
+    """
+    Construir un tar en memoria con los archivos a copiar al contenedor.
+    `paths` agrega archivos del host leyéndolos por bloques.
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name=name)
+            info.size = len(content)
+            info.mode = 0o644
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(content))
+        for name, path in (paths or {}).items():
+            info = tarfile.TarInfo(name=name)
+            info.size = os.path.getsize(path)
+            info.mode = 0o644
+            info.mtime = int(time.time())
+            with open(path, "rb") as f:
+                tar.addfile(info, f)
+    return buffer.getvalue()
+
+
+class ContainerPool:
+    """
+    Pool por lenguaje de contenedores pre-iniciados, sin red y con límite de memoria.
+
+    Cada caso de prueba se ejecuta con `exec` dentro de un contenedor ya iniciado,
+    evitando el costo de crear y destruir un contenedor por ejecución. Los
+    contenedores se reciclan después de `DOCKER_POOL_MAX_RUNS` ejecuciones o ante
+    cualquier violación del sandbox (timeout, proceso terminado por señal, error
+    de Docker). Todas las llamadas a Docker pasan por `docker_backend`.
+
+    Como un contenedor atiende submisiones de distintos usuarios, el programa
+    corre con el uid sin privilegios `DOCKER_SANDBOX_UID` sobre un sistema de
+    archivos de solo lectura: solo puede escribir en su directorio de trabajo
+    (tmpfs) y en /tmp. Al devolverlo al pool se terminan todos los procesos de
+    ese uid y se vacían los directorios; si algo sobrevive se recicla.
+    """
+
+    def __init__(self):
+        self._idle: Dict[str, List[PooledContainer]] = {}
+        self._lang_configs: Dict[str, Dict[str, Any]] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    def pool_size(self, language: str) -> int:
+        """Cantidad máxima de contenedores inactivos que se mantienen por lenguaje"""
+        if not settings.DOCKER_POOL_ENABLED:
+            return 0
+        return settings.DOCKER_POOL_SIZES.get(language, 0)
+
+    async def warm_up(self, languages: Dict[str, Dict[str, Any]]):
+        """Pre-iniciar los contenedores configurados para cada lenguaje"""
+        for language, lang_config in languages.items():
+            missing = self.pool_size(language) - len(self._idle.get(language, []))
+            for _ in range(max(missing, 0)):
+                try:
+                    pooled = await self._start_container(language, lang_config, settings.DOCKER_POOL_MEMORY_LIMIT)
+                except Exception as e:
+                    logger.error(f"Error pre-iniciando contenedor de {language}: {e}")
+                    break
+                await self._put_idle(pooled)
+            logger.info(f"Pool de {language}: {len(self._idle.get(language, []))} contenedores listos")
+
+    async def acquire(self, language: str, lang_config: Dict[str, Any], memory_limit: int) -> PooledContainer:
+        """Obtener un contenedor del pool, iniciando uno nuevo si no hay inactivos"""
+        idle = self._idle.get(language, [])
+        if not idle:
+            SANDBOX_POOL_MISSES.labels(language=language).inc()
+            return await self._start_container(language, lang_config, memory_limit)
+
+        pooled = idle.pop()
+        SANDBOX_POOL_IDLE.labels(language=language).set(len(idle))
+        SANDBOX_POOL_HITS.labels(language=language).inc()
+        if pooled.memory_limit != memory_limit:
+            await docker_backend.call(
+                "update",
+                pooled.container.update,
+                mem_limit=f"{memory_limit}m",
+                memswap_limit=f"{memory_limit}m"
+            )
+            pooled.memory_limit = memory_limit
+        return pooled
+
+    async def release(self, pooled: PooledContainer, recycle: bool = False):
+        """Devolver un contenedor limpio al pool o destruirlo si debe reciclarse"""
+        pooled.runs += 1
+        if not recycle and pooled.runs < settings.DOCKER_POOL_MAX_RUNS:
+            recycle = not await self._reset(pooled)
+        if recycle or pooled.runs >= settings.DOCKER_POOL_MAX_RUNS:
+            await self._remove(pooled)
+            self._replenish(pooled.language, pooled.memory_limit)
+            return
+        await self._put_idle(pooled)
+
+    async def shutdown(self):
+        """Destruir todos los contenedores inactivos del pool"""
+        idle = [pooled for containers in self._idle.values() for pooled in containers]
+        self._idle = {}
+        for pooled in idle:
+            await self._remove(pooled)
+
+    async def _reset(self, pooled: PooledContainer) -> bool:
+        """Terminar los procesos del programa y vaciar los directorios; False si el contenedor no quedó limpio"""
+        try:
+            exit_code, output = await docker_backend.call(
+                "exec_run",
+                pooled.container.exec_run,
+                ["sh", "-c", RESET_SCRIPT]
+            )
+        except Exception as e:
+            logger.warning(f"Error limpiando contenedor del pool: {e}")
+            return False
+        if exit_code != 0:
+            logger.warning(
+                "Contenedor del pool reciclado: quedaron procesos o archivos del programa",
+                extra={"language": pooled.language, "output": output.decode("utf-8", errors="replace")[:200]}
+            )
+            return False
+        return True
+
+    async def _put_idle(self, pooled: PooledContainer):
+        idle = self._idle.setdefault(pooled.language, [])
+        if len(idle) < self.pool_size(pooled.language):
+            idle.append(pooled)
+            SANDBOX_POOL_IDLE.labels(language=pooled.language).set(len(idle))
+            return
+        await self._remove(pooled)
+
+    def _replenish(self, language: str, memory_limit: int):
+        """Iniciar un contenedor de reemplazo en segundo plano"""
+        lang_config = self._lang_configs.get(language)
+        if lang_config is None or len(self._idle.get(language, [])) >= self.pool_size(language):
+            return
+
+        async def start():
+            try:
+                await self._put_idle(await self._start_container(language, lang_config, memory_limit))
+            except Exception as e:
+                logger.error(f"Error reponiendo contenedor de {language}: {e}")
+
+        task = asyncio.create_task(start())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _start_container(self, language: str, lang_config: Dict[str, Any], memory_limit: int) -> PooledContainer:
+        """Crear e iniciar un contenedor inactivo listo para recibir ejecuciones"""
+        self._lang_configs[language] = lang_config
+        docker_client = await docker_backend.get_client()
+        if docker_client is None:
+            raise RuntimeError("Docker no está disponible")
+
+        container = await docker_backend.call(
+            "containers.run",
+            docker_client.containers.run,
+            image=lang_config["docker_image"],
+            command=["sleep", "infinity"],
+            user="0",
+            working_dir=SANDBOX_DIR,
+            detach=True,
+            # PID 1 recoge los procesos huérfanos que se terminan al limpiar
+            init=True,
+            read_only=True,
+            tmpfs={
+                SANDBOX_DIR: (
+                    f"size={settings.DOCKER_SANDBOX_TMPFS_SIZE}m,mode=0755,"
+                    f"uid={settings.DOCKER_SANDBOX_UID},gid={settings.DOCKER_SANDBOX_UID}"
+                ),
+                "/tmp": f"size={settings.DOCKER_SANDBOX_TMPFS_SIZE}m,mode=1777"
+            },
+            mounts=[Mount(target=JUDGE_DIR, source=None, type="volume")],
+            mem_limit=f"{memory_limit}m",
+            memswap_limit=f"{memory_limit}m",
+            network_disabled=True,
+            pids_limit=settings.DOCKER_POOL_PIDS_LIMIT,
+            # Root solo puede cambiar al uid del sandbox (setpriv); el programa no tiene capacidades
+            cap_drop=["ALL"],
+            cap_add=["SETUID", "SETGID"],
+            security_opt=["no-new-privileges"],
+            labels={POOL_LABEL: language}
+        )
+
+        # Preparación opcional del lenguaje (p. ej. el archivo CDS de la JVM); un fallo no es fatal
+        if lang_config.get("warm_up_command"):
+            exit_code, output = await docker_backend.call(
+                "exec_run",
+                container.exec_run,
+                lang_config["warm_up_command"]
+            )
+            if exit_code != 0:
+                logger.warning(
+                    f"Falló la preparación del contenedor de {language}: "
+                    f"{output.decode('utf-8', errors='replace')[:200]}"
+                )
+        return PooledContainer(container, language, memory_limit)
+
+    async def _remove(self, pooled: PooledContainer):
+        try:
+            await docker_backend.call("remove", pooled.container.remove, force=True, v=True)
+        except Exception as e:
+            logger.warning(f"Error eliminando contenedor del pool: {e}")
+
+
+# Instancia global del pool compartida por todos los jueces del proceso
+container_pool = ContainerPool()
@@ -0,0 +1,188 @@
+import asyncio
+import io
+import logging
+import tarfile
+from typing import Dict, List, Any
+
+from app.core.docker_backend import docker_backend
+from app.core.sandbox_pool import (
+    container_pool, build_archive, parse_cgroup_usage, PooledContainer, SANDBOX_DIR, CGROUP_USAGE_FUNCTION
+)
+
+logger = logging.getLogger(__name__)
+
+# Harness que corre dentro del contenedor: ejecuta cada caso de /sandbox/cases/<n>/
+# y deja en `result` el veredicto de ejecución, el código de salida, el tiempo en ms
+# y las lecturas de `cgroup_usage` antes y después del caso.
+# La salida se corta con `head -c` en `cap` bytes (límite + 1); al seguir escribiendo
+# el programa termina con SIGPIPE.
+# Si `stop` es 1 se detiene tras el primer caso que no termina correctamente.
+SANDBOX_HARNESS = """#!/bin/sh
+""" + CGROUP_USAGE_FUNCTION + """
+limit="$1"
+limit_ms="$2"
+stop="$3"
+cap="$4"
+shift 4
+for dir in cases/*/; do
+  before=$(cgroup_usage)
+  start=$(date +%s%N)
+  { timeout -s KILL "$limit" "$@" < "${dir}input" 2> "${dir}stderr"; echo $? > "${dir}rc"; } | head -c "$cap" > "${dir}stdout"
+  rc=$(cat "${dir}rc")
+  end=$(date +%s%N)
+  after=$(cgroup_usage)
+  elapsed=$(( (end - start) / 1000000 ))
+  size=$(wc -c < "${dir}stdout")
+  if [ "$size" -ge "$cap" ]; then
+    status=output_limit
+  elif [ "$rc" -eq 0 ]; then
+    status=success
+  elif [ "$rc" -ge 128 ] && [ "$elapsed" -ge "$limit_ms" ]; then
+    status=timeout
+  else
+    status=runtime_error
+  fi
+  echo "$status $rc $elapsed $before $after" > "${dir}result"
+  if [ "$stop" = "1" ] && [ "$status" != "success" ]; then
+    break
+  fi
+done
+"""
+
+
+# Bytes de stderr que se conservan por caso
+STDERR_LIMIT = 64 * 1024
+
+
+def case_dir_name(index: int) -> str:
+    """Nombre del directorio de un caso; con ceros a la izquierda para conservar el orden"""
+    return f"{index:05d}"
+
+
+class DockerSandboxSession:
+    """
+    Sesión de sandbox para una submisión completa.
+
+    El programa y todas las entradas se copian una sola vez a un contenedor del pool
+    y el harness ejecuta todos los casos en una única llamada `exec`. Se usa
+    con `async with`.
+    """
+
+    def __init__(self, language: str, lang_config: Dict[str, Any], memory_limit: int):
+        self.language = language
+        self.lang_config = lang_config
+        self.memory_limit = memory_limit
+        self.pooled: PooledContainer = None
+        self.recycle = False
+
+    async def __aenter__(self):
+        self.pooled = await container_pool.acquire(self.language, self.lang_config, self.memory_limit)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.recycle = True
+        if self.pooled:
+            try:
+                await docker_backend.call(
+                    "exec_run",
+                    self.pooled.container.exec_run,
+                    ["find", SANDBOX_DIR, "-mindepth", "1", "-delete"]
+                )
+            except Exception as e:
+                logger.warning(f"Error limpiando el contenedor de la sesión: {e}")
+                self.recycle = True
+            await container_pool.release(self.pooled, recycle=self.recycle)
+        return False
+
+    async def run_all(
+        self,
+        files: Dict[str, bytes],
+        command: List[str],
+        input_paths: List[str],
+        time_limit: int,
+        output_limit: int,
+        stop_on_failure: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Copiar el programa (`files`) y los archivos de entrada (`input_paths`) y
+        ejecutar `command` con cada entrada; devuelve un resultado por caso, en
+        orden. Los casos que el harness no llegó a ejecutar se devuelven como omitidos.
+        """
+        files = dict(files)
+        files["harness.sh"] = SANDBOX_HARNESS.encode("utf-8")
+        paths = {
+            f"cases/{case_dir_name(index)}/input": input_path
+            for index, input_path in enumerate(input_paths)
+        }
+
+        container = self.pooled.container
+        archive = await asyncio.to_thread(build_archive, files, paths)
+        await docker_backend.call("put_archive", container.put_archive, SANDBOX_DIR, archive)
+
+        seconds = max(time_limit / 1000.0, 0.001)
+        exit_code, output = await docker_backend.call(
+            "exec_run",
+            container.exec_run,
+            [
+                "sh", "harness.sh", f"{seconds:.3f}", str(time_limit), "1" if stop_on_failure else "0",
+                str(output_limit + 1), *command
+            ],
+            workdir=SANDBOX_DIR
+        )
+        if exit_code != 0:
+            self.recycle = True
+            raise RuntimeError(f"El harness del sandbox falló: {output.decode('utf-8', errors='replace')}")
+
+        files = await docker_backend.call("get_archive", self._fetch_cases, container)
+
+        results = []
+        for index in range(len(input_paths)):
+            prefix = f"cases/{case_dir_name(index)}/"
+            if prefix + "result" not in files:
+                results.append({"status": "skipped"})
+                continue
+            status, rc, elapsed, *usage = files[prefix + "result"].decode().split()
+            usage = parse_cgroup_usage(usage[:3], usage[3:])
+            stdout = files.get(prefix + "stdout", b"")
+            stderr = files.get(prefix + "stderr", b"")[:STDERR_LIMIT].decode("utf-8", errors="replace")
+
+            # Terminación por señal: el contenedor no se reutiliza
+            if int(rc) >= 128:
+                self.recycle = True
+
+            if usage["oom_killed"]:
+                result = {
+                    "status": "memory_limit_exceeded",
+                    "error_message": f"Memoria excedida (límite: {self.memory_limit} MB)"
+                }
+            elif status == "success":
+                result = {"status": "success", "stdout": stdout}
+            elif status == "output_limit":
+                result = {"status": "output_limit_exceeded"}
+            elif status == "timeout":
+                result = {
+                    "status": "timeout",
+                    "error_message": "Tiempo de ejecución excedido"
+                }
+            else:
+                result = {
+                    "status": "runtime_error",
+                    "error_message": stderr.strip() or f"El programa terminó con código {rc}"
+                }
+            result["execution_time"] = int(elapsed)
+            result["cpu_time"] = usage["cpu_time"]
+            result["memory_used"] = usage["memory_used"]
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _fetch_cases(container) -> Dict[str, bytes]:
+        """Descargar y leer los resultados de los casos (se ejecuta en un hilo del backend)"""
+        stream, _ = container.get_archive(f"{SANDBOX_DIR}/cases")
+        files = {}
+        with tarfile.open(fileobj=io.BytesIO(b"".join(stream)), mode="r") as tar:
+            for member in tar.getmembers():
+                if member.isfile():
+                    files[member.name] = tar.extractfile(member).read()
+        return files
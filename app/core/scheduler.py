@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[None]]
+
+
+class FairShareScheduler:
+    """
+    Planificador de las evaluaciones en el proceso de la API (`JUDGE_DISPATCH_MODE=inline`).
+
+    Limita las evaluaciones simultáneas a `JUDGE_INLINE_MAX_CONCURRENT` y reparte
+    los lugares libres por turnos (round-robin) entre los usuarios con trabajo
+    pendiente, así que una clase entera enviando a la vez o un usuario que
+    envía muchas veces no retrasa a los demás. De cada usuario se evalúa
+    primero la submisión más reciente.
+
+    Un usuario con `JUDGE_INLINE_MAX_PER_USER` evaluaciones en curso solo toma
+    otro lugar si ningún otro usuario lo está esperando.
+    """
+
+    def __init__(self):
+        self._queues: Dict[str, Deque[Job]] = {}
+        # Usuarios con trabajo pendiente, en orden de turno
+        self._turns: Deque[str] = deque()
+        self._running: Dict[str, int] = {}
+        self._active = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def submit(self, user: str, job: Job):
+        """Encolar una evaluación del usuario; empieza en cuanto le toque un lugar"""
+        queue = self._queues.get(user)
+        if queue is None:
+            queue = self._queues[user] = deque()
+            self._turns.append(user)
+        queue.append(job)
+        self._dispatch()
+
+    def _next_user(self) -> Optional[str]:
+        """Siguiente usuario en turno, saltando a los que ya tienen su cupo en curso"""
+        for _ in range(len(self._turns)):
+            user = self._turns[0]
+            self._turns.rotate(-1)
+            if self._running.get(user, 0) < settings.JUDGE_INLINE_MAX_PER_USER:
+                return user
+        # Nadie más espera: el lugar libre no se desperdicia
+        if self._turns:
+            user = self._turns[0]
+            self._turns.rotate(-1)
+            return user
+        return None
+
+    def _dispatch(self):
+        while self._active < settings.JUDGE_INLINE_MAX_CONCURRENT:
+            user = self._next_user()
+            if user is None:
+                return
+            queue = self._queues[user]
+            job = queue.pop()  # la más reciente primero
+            if not queue:
+                del self._queues[user]
+                self._turns.remove(user)
+
+            self._active += 1
+            self._running[user] = self._running.get(user, 0) + 1
+            task = asyncio.create_task(self._run(user, job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, user: str, job: Job):
+        try:
+            await job()
+        except Exception:
+            logger.exception("Error en una evaluación planificada")
+        finally:
+            self._active -= 1
+            self._running[user] -= 1
+            if not self._running[user]:
+                del self._running[user]
+            self._dispatch()
+
+
+# Instancia global del planificador de evaluaciones del proceso
+judge_scheduler = FairShareScheduler()
@@ -0,0 +1,118 @@
+import copy
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from app.core.blob_store import content_hash
+from app.core.config import settings
+from app.core.metrics import VERDICT_CACHE_HITS, VERDICT_CACHE_MISSES
+from app.core.mongodb import get_database
+from app.models.base import Problem, TestCase
+
+logger = logging.getLogger(__name__)
+
+# Veredictos por caso que no dependen de la carga de la máquina; un resultado
+# con timeouts o errores del sandbox no se guarda en el caché
+DETERMINISTIC_CASE_STATUSES = {"accepted", "wrong_answer", "skipped"}
+
+
+def _hash_parts(parts: List[str]) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8")
+        digest.update(str(len(data)).encode("ascii"))
+        digest.update(b":")
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def normalize_source(code: str) -> str:
+    """
+    Normalizar el código para que cambios irrelevantes no eviten un acierto:
+    fines de línea, espacios al final de cada línea y líneas vacías al final
+    """
+    lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).rstrip("\n")
+
+
+def compute_test_set_fingerprint(test_cases: List[TestCase]) -> str:
+    """
+    Huella del conjunto de casos de prueba, en orden; cambia si se agrega o edita un caso.
+    Usa los hashes del almacén de blobs, o los calcula para los casos con los datos en línea.
+    """
+    parts = []
+    for test_case in test_cases:
+        parts.extend([
+            test_case.input_hash or content_hash(test_case.input_data.encode("utf-8")),
+            test_case.expected_output_hash or content_hash(test_case.expected_output.encode("utf-8"))
+        ])
+    return _hash_parts(parts)
+
+
+def test_case_fingerprint(test_case: TestCase) -> str:
+    """Huella de un solo caso de prueba; permite saber si un resultado guardado sigue valiendo"""
+    return compute_test_set_fingerprint([test_case])
+
+
+def judging_limits_key(problem: Problem) -> str:
+    """Huella de los límites y la política con que se evalúa un problema"""
+    return _hash_parts([
+        str(problem.time_limit),
+        str(problem.memory_limit),
+        str(problem.output_limit or settings.JUDGE_OUTPUT_LIMIT),
+        problem.judging_policy.value
+    ])
+
+
+def verdict_key(code: str, language: str, problem: Problem, fingerprint: str) -> str:
+    """Clave del veredicto: código normalizado, lenguaje, límites, política y casos de prueba"""
+    return _hash_parts([
+        normalize_source(code),
+        language,
+        str(problem.time_limit),
+        str(problem.memory_limit),
+        str(problem.output_limit or settings.JUDGE_OUTPUT_LIMIT),
+        problem.judging_policy.value,
+        fingerprint
+    ])
+
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    """Solo se guardan los veredictos reproducibles"""
+    if result.get("status") not in settings.JUDGE_VERDICT_CACHE_STATUSES:
+        return False
+    return all(
+        case.get("status") in DETERMINISTIC_CASE_STATUSES
+        for case in result.get("test_case_results", [])
+    )
+
+
+async def get_cached_verdict(key: str, language: str) -> Optional[Dict[str, Any]]:
+    """Buscar un veredicto previo; devuelve una copia del resultado o None"""
+    try:
+        db = get_database()
+        entry = await db.verdict_cache.find_one({"_id": key})
+    except Exception as e:
+        logger.warning(f"No se pudo consultar el caché de veredictos: {e}")
+        entry = None
+    if not entry:
+        VERDICT_CACHE_MISSES.labels(language=language).inc()
+        return None
+    VERDICT_CACHE_HITS.labels(language=language).inc()
+    return copy.deepcopy(entry["result"])
+
+
+async def store_verdict(key: str, language: str, result: Dict[str, Any]):
+    """Guardar el veredicto si es reproducible; un fallo no afecta la evaluación"""
+    if not is_cacheable(result):
+        return
+    try:
+        db = get_database()
+        await db.verdict_cache.update_one(
+            {"_id": key},
+            {"$setOnInsert": {"language": language, "result": result, "created_at": datetime.now()}},
+            upsert=True
+        )
+    except Exception as e:
+        logger.warning(f"No se pudo guardar el veredicto en el caché: {e}")
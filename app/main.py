@@ -7,13 +7,18 @@ import uvicorn
 import os
 from dotenv import load_dotenv
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
-from app.core.metrics import REQUEST_COUNT, RESPONSE_TIME, ERROR_COUNT
+from app.core.metrics_middleware import MetricsMiddleware
 from fastapi.responses import Response
-import time
 
 from app.routers import submissions, problems, auth
 from app.core.config import settings
+from app.core.logging_config import setup_logging, shutdown_logging
 from app.core.mongodb import connect_to_mongo, close_mongo_connection
+from app.core.judge import CodeJudge
+from app.core.sandbox_pool import container_pool
+from app.core.docker_backend import docker_backend
+from app.core.progress import progress_broker
+from app.core.rejudge import rejudge_lane
 
 # Cargar variables de entorno
 load_dotenv()
@@ -34,46 +39,62 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],  # paginación de los listados
 )
 
 # Eventos de inicio y cierre
+@app.on_event("startup")
+async def startup_logging():
+    setup_logging()
+
 @app.on_event("startup")
 async def startup_db_client():
     await connect_to_mongo()
 
+@app.on_event("startup")
+async def startup_progress_broker():
+    progress_broker.start()
+
+@app.on_event("startup")
+async def startup_rejudge_lane():
+    # En modo queue las re-evaluaciones las procesan los workers
+    if settings.JUDGE_DISPATCH_MODE == "inline":
+        rejudge_lane.start(submissions.rejudge_submission)
+
+@app.on_event("startup")
+async def startup_sandbox_pool():
+    # Pre-iniciar contenedores solo cuando se ejecuta en Docker y se evalúa en este proceso
+    if not settings.DEBUG and settings.JUDGE_DISPATCH_MODE == "inline":
+        await CodeJudge().warm_up_pool()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     await close_mongo_connection()
 
-# Incluir routers
-app.include_router(auth.router, prefix="/api/v1/auth", tags=["Autenticación"])
-app.include_router(problems.router, prefix="/api/v1/problems", tags=["Problemas"])
-app.include_router(submissions.router, prefix="/api/v1/submissions", tags=["Envíos"])
-
-# Middleware para registrar métricas
-@app.middleware("http")
-async def record_metrics(request, call_next):
-    method = request.method
-    endpoint = request.url.path
-
-    # Registrar la hora de inicio para medir el tiempo de respuesta
-    start_time = time.time()
+@app.on_event("shutdown")
+async def shutdown_progress_broker():
+    await progress_broker.stop()
 
-    # Continuar con la solicitud
-    response = await call_next(request)
+@app.on_event("shutdown")
+async def shutdown_rejudge_lane():
+    await rejudge_lane.stop()
 
-    # Medir tiempo de respuesta
-    duration = time.time() - start_time
-    RESPONSE_TIME.labels(method=method, endpoint=endpoint).observe(duration)
+@app.on_event("shutdown")
+async def shutdown_sandbox_pool():
+    await container_pool.shutdown()
+    docker_backend.shutdown()
 
-    # Incrementar contador de peticiones
-    REQUEST_COUNT.labels(method=method, endpoint=endpoint).inc()
+@app.on_event("shutdown")
+async def shutdown_logging_listener():
+    shutdown_logging()
 
-    # Si hay un error (código de estado >= 400), aumentar el contador de errores
-    if response.status_code >= 400:
-        ERROR_COUNT.labels(method=method, endpoint=endpoint).inc()
+# Incluir routers
+app.include_router(auth.router, prefix="/api/v1/auth", tags=["Autenticación"])
+app.include_router(problems.router, prefix="/api/v1/problems", tags=["Problemas"])
+app.include_router(submissions.router, prefix="/api/v1/submissions", tags=["Envíos"])
 
-    return response
+# Middleware ASGI para registrar métricas, etiquetadas con la plantilla de la ruta
+app.add_middleware(MetricsMiddleware, excluded_paths=settings.METRICS_EXCLUDED_PATHS)
 
 # Ruta para exponer las métricas en formato Prometheus
 @app.get("/metrics")
@@ -28,6 +28,10 @@ class Difficulty(str, Enum):
     MEDIUM = "medium"
     HARD = "hard"
 
+class JudgingPolicy(str, Enum):
+    FULL = "full"  # se ejecutan todos los casos y el puntaje es proporcional
+    STOP_ON_FIRST_FAILURE = "stop_on_first_failure"  # estilo ICPC
+
 class SubmissionStatus(str, Enum):
     PENDING = "pending"
     RUNNING = "running"
@@ -36,6 +40,8 @@ class SubmissionStatus(str, Enum):
     TIME_LIMIT_EXCEEDED = "time_limit_exceeded"
     RUNTIME_ERROR = "runtime_error"
     COMPILATION_ERROR = "compilation_error"
+    OUTPUT_LIMIT_EXCEEDED = "output_limit_exceeded"
+    MEMORY_LIMIT_EXCEEDED = "memory_limit_exceeded"
     ERROR = "error"
 
 class TestCaseResultStatus(str, Enum):
@@ -43,6 +49,7 @@ class TestCaseResultStatus(str, Enum):
     FAILED = "failed"
     ERROR = "error"
     TIMEOUT = "timeout"
+    SKIPPED = "skipped"
 
 class User(BaseModel):
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
@@ -66,6 +73,10 @@ class Problem(BaseModel):
     difficulty: Difficulty
     time_limit: int = 1000  # milisegundos
     memory_limit: int = 256  # MB
+    output_limit: Optional[int] = None  # bytes de salida por caso; None usa JUDGE_OUTPUT_LIMIT
+    max_parallel_test_cases: Optional[int] = None  # 1 = ejecución en serie
+    judging_policy: JudgingPolicy = JudgingPolicy.FULL
+    test_set_fingerprint: Optional[str] = None  # cambia al agregar o editar casos de prueba
     created_at: datetime = Field(default_factory=datetime.now)
     test_cases: Optional[List['TestCase']] = []
 
@@ -78,8 +89,13 @@ class Problem(BaseModel):
 class TestCase(BaseModel):
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
     problem_id: PyObjectId
-    input_data: str
-    expected_output: str
+    # Los datos viven en el almacén de blobs; los casos antiguos los tienen en el documento
+    input_data: Optional[str] = None
+    expected_output: Optional[str] = None
+    input_hash: Optional[str] = None
+    input_size: Optional[int] = None
+    expected_output_hash: Optional[str] = None
+    expected_output_size: Optional[int] = None
     is_sample: bool = False
     created_at: datetime = Field(default_factory=datetime.now)
 
@@ -96,9 +112,13 @@ class Submission(BaseModel):
     code: str
     language: str
     status: SubmissionStatus = SubmissionStatus.PENDING
-    execution_time: Optional[float] = None
-    memory_used: Optional[int] = None
+    execution_time: Optional[float] = None  # ms de tiempo real
+    cpu_time: Optional[float] = None  # ms de CPU (usuario + sistema)
+    memory_used: Optional[int] = None  # pico de memoria en KB
     score: Optional[float] = None
+    # Huellas de los casos y de los límites con que se obtuvo el veredicto (re-evaluación)
+    judged_test_set_fingerprint: Optional[str] = None
+    judged_limits_key: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
 
     model_config = {
@@ -111,11 +131,17 @@ class TestCaseResult(BaseModel):
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
     submission_id: PyObjectId
     test_case_id: PyObjectId
-    status: TestCaseResultStatus
+    test_case_fingerprint: Optional[str] = None  # huella del caso con que se obtuvo el resultado
+    index: int
+    status: str
     execution_time: Optional[float] = None
+    cpu_time: Optional[float] = None
     memory_used: Optional[int] = None
-    output: Optional[str] = None
-    error: Optional[str] = None
+    output: Optional[str] = None  # recortada a JUDGE_STORED_OUTPUT_BYTES
+    output_hash: Optional[str] = None  # SHA-256 de la salida capturada
+    output_truncated: bool = False
+    error_message: Optional[str] = None
+    first_difference: Optional[dict] = None
     created_at: datetime = Field(default_factory=datetime.now)
 
     model_config = {
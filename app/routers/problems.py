@@ -1,11 +1,29 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from typing import List, Optional
 from datetime import datetime
+import os
+import tempfile
 from bson import ObjectId
 
-from app.models.base import User
+from app.models.base import User, Difficulty
 from app.core.auth import get_current_user_optional
-from app.core.database import get_db, get_problem_by_id, get_test_cases_by_problem_id, convert_object_ids
+from app.core.blob_store import store_test_case_data, load_test_case_data
+from app.core.config import settings
+from app.core.pagination import InvalidCursor
+from app.core.problem_package import ProblemPackageError, import_package, export_package
+from app.core.rejudge import schedule_rejudge
+from app.core.database import (
+    get_db,
+    get_problem_by_id,
+    get_problem_list,
+    count_problems,
+    get_test_cases_by_problem_id,
+    update_test_set_fingerprint,
+    invalidate_problem_cache,
+    convert_object_ids
+)
 from app.schemas.problem import (
     ProblemCreate,
     ProblemUpdate,
@@ -19,27 +37,35 @@ router = APIRouter()
 
 @router.get("/", response_model=List[ProblemList])
 async def get_problems(
-    skip: int = 0,
-    limit: int = 100,
-    difficulty: str = None,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    difficulty: Optional[Difficulty] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user: User = Depends(get_current_user_optional)
 ):
     """
-    Obtener lista de problemas disponibles
+    Obtener lista de problemas disponibles, ordenada por dificultad. Si hay más
+    resultados, el encabezado `X-Next-Cursor` trae el valor de `cursor` para la
+    página siguiente; con `include_total=true`, `X-Total-Count` trae el total.
     """
-    db = get_db()
-    
-    # Construir filtro
-    filter_query = {}
-    if difficulty:
-        filter_query["difficulty"] = difficulty
-    
-    # Obtener problemas
-    problems_cursor = db.problems.find(filter_query).skip(skip).limit(limit)
-    problems_data = await problems_cursor.to_list(length=limit)
-    problems_data = [convert_object_ids(p) for p in problems_data]
+    difficulty_value = difficulty.value if difficulty else None
+    try:
+        problems, next_cursor = await get_problem_list(
+            limit=limit,
+            skip=skip,
+            cursor=cursor,
+            difficulty=difficulty_value
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    return [ProblemList(**problem) for problem in problems_data]
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if include_total:
+        response.headers["X-Total-Count"] = str(await count_problems(difficulty_value))
+    return problems
 
 @router.get("/{problem_id}", response_model=ProblemResponse)
 async def get_problem(
@@ -57,9 +83,9 @@ async def get_problem(
             detail="Problema no encontrado"
         )
     
-    # Agregar casos de prueba al problema
+    # Agregar casos de prueba al problema, con sus datos desde el almacén de blobs
     test_cases = await get_test_cases_by_problem_id(problem_id)
-    problem.test_cases = test_cases
+    problem.test_cases = [await load_test_case_data(tc) for tc in test_cases]
     
     return problem
 
@@ -86,6 +112,9 @@ async def create_problem(
         "difficulty": problem.difficulty,
         "time_limit": problem.time_limit,
         "memory_limit": problem.memory_limit,
+        "output_limit": problem.output_limit,
+        "max_parallel_test_cases": problem.max_parallel_test_cases,
+        "judging_policy": problem.judging_policy.value,
         "created_at": datetime.now()
     }
     
@@ -93,19 +122,23 @@ async def create_problem(
     problem_id = str(result.inserted_id)
     problem_data["_id"] = result.inserted_id
     
-    # Crear los casos de prueba
+    # Crear los casos de prueba en una sola inserción; los datos se guardan en el almacén de blobs
     test_cases = []
     for test_case in problem.test_cases:
-        test_case_data = {
+        test_cases.append({
             "problem_id": ObjectId(problem_id),
-            "input_data": test_case.input_data,
-            "expected_output": test_case.expected_output,
+            **await store_test_case_data(test_case.input_data, test_case.expected_output),
             "is_sample": test_case.is_sample,
             "created_at": datetime.now()
-        }
-        test_case_result = await db.test_cases.insert_one(test_case_data)
-        test_case_data["_id"] = test_case_result.inserted_id
-        test_cases.append(test_case_data)
+        })
+    if test_cases:
+        await db.test_cases.insert_many(test_cases)  # asigna el `_id` de cada documento
+    for test_case_data, test_case in zip(test_cases, problem.test_cases):
+        test_case_data["input_data"] = test_case.input_data
+        test_case_data["expected_output"] = test_case.expected_output
+    
+    # Huella de los casos de prueba para el caché de veredictos (también invalida el caché del problema)
+    problem_data["test_set_fingerprint"] = await update_test_set_fingerprint(problem_id)
     
     # Convertir todos los ObjectId a string
     problem_data = convert_object_ids(problem_data)
@@ -115,6 +148,102 @@ async def create_problem(
     response_data = {**problem_data, "test_cases": test_cases}
     return ProblemResponse(**response_data)
 
+@router.post("/import", response_model=List[ProblemList], status_code=status.HTTP_201_CREATED)
+async def import_problems(
+    request: Request,
+    current_user: User = Depends(get_current_user_optional)
+):
+    """
+    Importar un paquete de problemas (solo administradores). El cuerpo es el
+    archivo .tar.gz (un problema o un banco completo); se recibe por bloques y
+    se escribe en disco, sin cargarlo en memoria.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo los administradores pueden importar problemas"
+        )
+    
+    fd, archive_path = tempfile.mkstemp(dir=settings.TEMP_DIR, suffix=".tar.gz")
+    try:
+        received = 0
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > settings.PROBLEM_PACKAGE_MAX_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="El paquete supera el tamaño permitido"
+                    )
+                f.write(chunk)
+        
+        return await import_package(archive_path)
+    except ProblemPackageError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    finally:
+        os.unlink(archive_path)
+
+@router.get("/{problem_id}/package")
+async def export_problem(
+    problem_id: str,
+    current_user: User = Depends(get_current_user_optional)
+):
+    """
+    Exportar un problema con sus casos de prueba como paquete .tar.gz, en el
+    formato que acepta `/import` (solo administradores)
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo los administradores pueden exportar problemas"
+        )
+    
+    if not ObjectId.is_valid(problem_id) or not await get_problem_by_id(problem_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Problema no encontrado"
+        )
+    
+    fd, archive_path = tempfile.mkstemp(dir=settings.TEMP_DIR, suffix=".tar.gz")
+    os.close(fd)
+    try:
+        await export_package(archive_path, [problem_id])
+    except BaseException:
+        os.unlink(archive_path)
+        raise
+    return FileResponse(
+        archive_path,
+        media_type="application/gzip",
+        filename=f"problem-{problem_id}.tar.gz",
+        background=BackgroundTask(os.unlink, archive_path)
+    )
+
+@router.post("/{problem_id}/rejudge", status_code=status.HTTP_202_ACCEPTED)
+async def rejudge_problem(
+    problem_id: str,
+    current_user: User = Depends(get_current_user_optional)
+):
+    """
+    Re-evaluar las submisiones del problema evaluadas con otros casos de prueba
+    u otros límites (solo administradores). Solo se ejecutan los casos nuevos o
+    modificados, salvo que cambien los límites o la política; las
+    re-evaluaciones corren en un carril de baja prioridad.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo los administradores pueden re-evaluar problemas"
+        )
+    
+    problem = await get_problem_by_id(problem_id) if ObjectId.is_valid(problem_id) else None
+    if not problem:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Problema no encontrado"
+        )
+    
+    return {"problem_id": problem_id, "scheduled": await schedule_rejudge(problem)}
+
 @router.put("/{problem_id}", response_model=ProblemResponse)
 async def update_problem(
     problem_id: str,
@@ -150,6 +279,12 @@ async def update_problem(
         update_data["time_limit"] = problem_update.time_limit
     if problem_update.memory_limit is not None:
         update_data["memory_limit"] = problem_update.memory_limit
+    if problem_update.output_limit is not None:
+        update_data["output_limit"] = problem_update.output_limit
+    if problem_update.max_parallel_test_cases is not None:
+        update_data["max_parallel_test_cases"] = problem_update.max_parallel_test_cases
+    if problem_update.judging_policy is not None:
+        update_data["judging_policy"] = problem_update.judging_policy.value
     
     # Actualizar en la base de datos
     db = get_db()
@@ -157,10 +292,13 @@ async def update_problem(
         {"_id": ObjectId(problem_id)},
         {"$set": update_data}
     )
+    await invalidate_problem_cache(problem_id)
     
     # Obtener el problema actualizado
     updated_problem = await get_problem_by_id(problem_id)
-    updated_problem.test_cases = await get_test_cases_by_problem_id(problem_id)
+    updated_problem.test_cases = [
+        await load_test_case_data(tc) for tc in await get_test_cases_by_problem_id(problem_id)
+    ]
     
     return updated_problem
 
@@ -193,6 +331,7 @@ async def delete_problem(
     
     # Eliminar casos de prueba asociados
     await db.test_cases.delete_many({"problem_id": ObjectId(problem_id)})
+    await invalidate_problem_cache(problem_id)
     
     return None
 
@@ -221,16 +360,20 @@ async def add_test_case(
     
     db = get_db()
     
-    # Crear el caso de prueba
+    # Crear el caso de prueba; los datos se guardan en el almacén de blobs
     test_case_data = {
         "problem_id": ObjectId(problem_id),
-        "input_data": test_case.input_data,
-        "expected_output": test_case.expected_output,
+        **await store_test_case_data(test_case.input_data, test_case.expected_output),
         "is_sample": test_case.is_sample,
         "created_at": datetime.now()
     }
     
     result = await db.test_cases.insert_one(test_case_data)
     test_case_data["_id"] = result.inserted_id
+    test_case_data["input_data"] = test_case.input_data
+    test_case_data["expected_output"] = test_case.expected_output
+    
+    # El conjunto de casos cambió: invalida los veredictos y el caché del problema
+    await update_test_set_fingerprint(problem_id)
     
-    return TestCaseResponse(**test_case_data) 
\ No newline at end of file
+    return TestCaseResponse(**convert_object_ids(test_case_data))
\ No newline at end of file
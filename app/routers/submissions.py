@@ -1,12 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import contextlib
+import functools
+import json
+import logging
+import time
 from datetime import datetime
 from bson import ObjectId
 
-from app.core.database import get_db, get_problem_by_id, get_submissions_by_user_email, get_submission_by_id
+from app.core.database import (
+    get_db,
+    get_problem_by_id,
+    get_submissions_by_user_email,
+    get_submission_by_id,
+    save_test_case_results,
+    get_test_case_results
+)
+from app.core.config import settings
 from app.core.judge import CodeJudge
-from app.models.base import User, Submission
+from app.core.job_queue import enqueue_job
+from app.models.base import User, Submission, SubmissionStatus
 from app.schemas.submission import (
     SubmissionCreate, 
     SubmissionResponse, 
@@ -14,6 +28,15 @@ from app.schemas.submission import (
     SubmissionUpdate
 )
 from app.core.auth import get_current_user_optional
+from app.core.pagination import InvalidCursor
+from app.core.logging_config import bind_submission, trace_enabled, truncate
+from app.core.metrics import SUBMISSIONS_PENDING, SUBMISSIONS_REJECTED, SUBMISSIONS_RUNNING, QUEUE_WAIT_TIME, VERDICTS
+from app.core.admission import admission_controller
+from app.core.progress import progress_broker, progress_events, result_event
+from app.core.rejudge import rejudge_lane, reusable_results
+from app.core.scheduler import judge_scheduler
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -25,24 +48,30 @@ async def create_submission(
     """
     Crear una nueva submisión de código y evaluarla automáticamente
     """
-    print("Recibida nueva petición de submission")
-    
     # Verificar que el problema existe
     problem = await get_problem_by_id(submission.problem_id)
     if not problem:
-        print(f"Problema no encontrado: {submission.problem_id}")
+        logger.info("Problema no encontrado", extra={"problem_id": submission.problem_id})
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Problema no encontrado"
         )
     
-    print(f"Problema encontrado: {problem.title}")
+    # Con la cola llena se rechaza la submisión en lugar de acumular trabajo que no se alcanza a evaluar
+    admitted, wait_seconds = await admission_controller.admit(submission.problem_id)
+    if not admitted:
+        SUBMISSIONS_REJECTED.inc()
+        logger.warning("Submisión rechazada: cola de evaluación llena", extra={"retry_after": wait_seconds})
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="El juez está saturado; intenta de nuevo más tarde",
+            headers={"Retry-After": str(wait_seconds)}
+        )
     
     db = get_db()
     
     # Crear la submisión usando el email del request body o fallback
     user_email = submission.email if submission.email else "anonymous@example.com"
-    print(f"Email del usuario: {user_email}")
     
     submission_data = {
         "user_email": user_email,  # Usar el email del request body o fallback
@@ -56,18 +85,24 @@ async def create_submission(
     try:
         result = await db.submissions.insert_one(submission_data)
         submission_id = str(result.inserted_id)
-        print(f"Submission creada con ID: {submission_id}")
+        logger.info(
+            "Submisión creada",
+            extra={"submission_id": submission_id, "problem_id": submission.problem_id, "language": submission.language}
+        )
         
-        # Ejecutar la evaluación en segundo plano
-        print("Iniciando evaluación en segundo plano...")
-        asyncio.create_task(evaluate_submission(submission_id))
+        if settings.JUDGE_DISPATCH_MODE == "queue":
+            # Encolar la evaluación para los workers
+            await enqueue_job(submission_id)
+        else:
+            # Evaluar en segundo plano cuando el planificador le dé turno al usuario
+            SUBMISSIONS_PENDING.inc()
+            judge_scheduler.submit(user_email, functools.partial(evaluate_submission, submission_id))
         
-        # Obtener la submisión creada
+        # Obtener la submisión creada, con la espera estimada hasta su veredicto
         created_submission = await get_submission_by_id(submission_id)
-        print("Retornando submission al frontend")
-        return created_submission
+        return {**created_submission.model_dump(by_alias=True), "estimated_wait_seconds": wait_seconds}
     except Exception as e:
-        print(f"Error al crear submission: {str(e)}")
+        logger.exception("Error al crear la submisión")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al crear submission: {str(e)}"
@@ -75,25 +110,51 @@ async def create_submission(
 
 @router.get("/", response_model=List[SubmissionList])
 async def get_submissions(
+    response: Response,
     email: str,  # Recibir email como parámetro de query
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    problem_id: Optional[str] = None,
+    status_filter: Optional[SubmissionStatus] = Query(None, alias="status"),
     current_user: User = Depends(get_current_user_optional)
 ):
     """
-    Obtener lista de submisiones del usuario especificado por email
+    Obtener lista de submisiones del usuario especificado por email, de la más
+    reciente a la más antigua. Si hay más resultados, el encabezado
+    `X-Next-Cursor` trae el valor de `cursor` para pedir la página siguiente.
     """
-    submissions = await get_submissions_by_user_email(email)
-    return submissions[skip:skip + limit]
+    if problem_id is not None and not ObjectId.is_valid(problem_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ID de problema inválido"
+        )
+    try:
+        submissions, next_cursor = await get_submissions_by_user_email(
+            email,
+            limit=limit,
+            skip=skip,
+            cursor=cursor,
+            problem_id=problem_id,
+            status=status_filter.value if status_filter else None
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return submissions
 
 @router.get("/{submission_id}", response_model=SubmissionResponse)
 async def get_submission(
     submission_id: str,
     email: str = None,  # Hacer opcional
+    include: Optional[str] = None,  # "test_cases" agrega los resultados por caso
     current_user: User = Depends(get_current_user_optional)
 ):
     """
-    Obtener detalles de una submisión específica
+    Obtener detalles de una submisión específica. Los resultados por caso de
+    prueba se leen de su colección solo si se piden con `include=test_cases`.
     """
     submission = await get_submission_by_id(submission_id)
     
@@ -110,8 +171,56 @@ async def get_submission(
             detail="Submisión no encontrada"
         )
     
+    if include and "test_cases" in include.split(","):
+        response = submission.model_dump(by_alias=True)
+        response["test_case_results"] = await get_test_case_results(submission_id)
+        return response
+    
     return submission
 
+@router.get("/{submission_id}/events")
+async def stream_submission_events(submission_id: str):
+    """
+    Progreso de una submisión como Server-Sent Events: el estado actual, el
+    resultado de cada caso de prueba a medida que termina y el veredicto final
+    (evento `result`), tras el cual se cierra el stream
+    """
+    if not ObjectId.is_valid(submission_id) or not await get_db().submissions.find_one(
+        {"_id": ObjectId(submission_id)}, {"_id": 1}
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Submisión no encontrada"
+        )
+    
+    async def stream():
+        async for event in progress_events(submission_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/{submission_id}/ws")
+async def submission_progress_websocket(websocket: WebSocket, submission_id: str):
+    """Progreso de una submisión por WebSocket, con los mismos eventos que `/events` en JSON"""
+    if not ObjectId.is_valid(submission_id):
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    try:
+        async for event in progress_events(submission_id):
+            if event is not None:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
 @router.put("/{submission_id}", response_model=SubmissionResponse)
 async def update_submission(
     submission_id: str,
@@ -172,8 +281,9 @@ async def delete_submission(
             detail="Submisión no encontrada"
         )
     
-    # Eliminar la submisión
+    # Eliminar la submisión y sus resultados por caso
     result = await db.submissions.delete_one({"_id": ObjectId(submission_id)})
+    await db.test_case_results.delete_many({"submission_id": ObjectId(submission_id)})
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -181,7 +291,7 @@ async def delete_submission(
             detail="Submisión no encontrada"
         )
     
-    print(f"Submisión {submission_id} eliminada para el usuario {email}")
+    logger.info("Submisión eliminada", extra={"submission_id": submission_id})
     return None
 
 @router.delete("/by-user", status_code=status.HTTP_204_NO_CONTENT)
@@ -190,82 +300,119 @@ async def delete_submissions_by_user(email: str, current_user: User = Depends(ge
     Eliminar todas las submissions de un usuario por email
     """
     db = get_db()
+    submission_ids = await db.submissions.distinct("_id", {"user_email": email})
     result = await db.submissions.delete_many({"user_email": email})
-    print(f"Eliminadas {result.deleted_count} submissions para el usuario {email}")
+    await db.test_case_results.delete_many({"submission_id": {"$in": submission_ids}})
+    logger.info("Submisiones del usuario eliminadas", extra={"deleted": result.deleted_count})
     return None
 
-async def evaluate_submission(submission_id: str):
+async def evaluate_submission(submission_id: str, rejudge: bool = False):
     """
-    Función asíncrona para evaluar una submisión
+    Función asíncrona para evaluar una submisión. Los registros emitidos durante
+    la evaluación llevan el id de la submisión.
+    
+    Con `rejudge` se re-evalúa una submisión ya evaluada reutilizando los
+    resultados de los casos que no cambiaron; si falla, conserva su veredicto.
+    Las evaluaciones en vivo pausan el carril de re-evaluaciones del proceso.
     """
+    # En modo queue los trabajos pendientes los cuenta el worker desde la cola
+    if not rejudge and settings.JUDGE_DISPATCH_MODE != "queue":
+        SUBMISSIONS_PENDING.dec()
+    with bind_submission(submission_id), (contextlib.nullcontext() if rejudge else rejudge_lane.live()):
+        await _evaluate_submission(submission_id, rejudge)
+
+
+async def rejudge_submission(submission_id: str):
+    """Re-evaluar una submisión desde el carril de re-evaluaciones"""
+    await evaluate_submission(submission_id, rejudge=True)
+
+
+async def _evaluate_submission(submission_id: str, rejudge: bool = False):
+    language = None
     try:
         submission = await get_submission_by_id(submission_id)
         if not submission:
             return
         
+        language = submission.language
+        SUBMISSIONS_RUNNING.labels(language=language).inc()
+        if not rejudge:
+            QUEUE_WAIT_TIME.labels(language=language).observe(
+                max((datetime.now() - submission.created_at).total_seconds(), 0.0)
+            )
         db = get_db()
         
-        # Log para depuración
-        print("\n=== EVALUANDO SUBMISSION ===")
-        print(f"ID: {submission_id}")
-        print("Código a evaluar:")
-        print("-------------------")
-        print(submission.code)
-        print("-------------------")
+        # Traza detallada solo para las submisiones muestreadas y con el contenido recortado
+        if trace_enabled(logger):
+            logger.debug("Código a evaluar", extra={"payload": truncate(submission.code)})
         
-        # Actualizar estado a "running"
-        await db.submissions.update_one(
-            {"_id": ObjectId(submission_id)},
-            {"$set": {"status": "running"}}
-        )
+        # Actualizar estado a "running"; una re-evaluación muestra el veredicto anterior hasta terminar
+        reuse = None
+        if rejudge:
+            reuse = await reusable_results(submission_id)
+        else:
+            await db.submissions.update_one(
+                {"_id": ObjectId(submission_id)},
+                {"$set": {"status": "running"}}
+            )
+            await progress_broker.publish(submission_id, {"type": "status", "status": "running"})
         
         # Crear instancia del juez
         judge = CodeJudge()
         
-        # Evaluar el código
+        # Evaluar el código, publicando el resultado de cada caso a medida que termina
+        start_time = time.perf_counter()
         result = await judge.evaluate(
             code=submission.code,
             language=submission.language,
-            problem_id=str(submission.problem_id)
+            problem_id=str(submission.problem_id),
+            on_progress=lambda event: progress_broker.publish(submission_id, event),
+            reuse_results=reuse
         )
-        
-        # Log del resultado
-        print("\n=== RESULTADO DE EVALUACIÓN ===")
-        print(f"Status: {result['status']}")
-        print(f"Score: {result.get('score', 0.0)}")
-        if result.get('test_case_results'):
-            print("\nResultados por caso de prueba:")
-            for i, test_result in enumerate(result['test_case_results'], 1):
-                print(f"\nCaso {i}:")
-                print(f"Status: {test_result['status']}")
-                if test_result.get('output'):
-                    print(f"Output:\n{test_result['output']}")
-                if test_result.get('expected_output'):
-                    print(f"Expected:\n{test_result['expected_output']}")
-        print("-------------------")
+        if rejudge and result["status"] == "error":
+            logger.warning("La re-evaluación falló; se conserva el veredicto anterior")
+            return
+        if not rejudge and result["status"] != "error":
+            # Las re-evaluaciones incrementales no representan la duración de una evaluación completa
+            await admission_controller.record(str(submission.problem_id), time.perf_counter() - start_time)
         
         # Actualizar la submisión con los resultados
         update_data = {
             "status": result["status"],
             "execution_time": result.get("execution_time"),
+            "cpu_time": result.get("cpu_time"),
             "memory_used": result.get("memory_used"),
-            "score": result.get("score", 0.0)
+            "score": result.get("score", 0.0),
+            "judged_test_set_fingerprint": result.get("test_set_fingerprint"),
+            "judged_limits_key": result.get("limits_key")
         }
         
         await db.submissions.update_one(
             {"_id": ObjectId(submission_id)},
             {"$set": update_data}
         )
+        try:
+            await save_test_case_results(submission_id, result.get("test_case_results", []))
+        except Exception:
+            # El veredicto ya quedó guardado; sin el detalle por caso no se marca como error
+            logger.exception("Error guardando los resultados por caso de prueba")
+        VERDICTS.labels(language=language, status=result["status"]).inc()
+        await progress_broker.publish(submission_id, result_event(result))
         
-    except Exception as e:
-        # En caso de error, marcar como error y mostrar detalles
-        print(f"\n=== ERROR EN EVALUACIÓN ===")
-        print(f"Error evaluando submisión {submission_id}:")
-        print(str(e))
-        print("-------------------")
+    except Exception:
+        # En caso de error, marcar como error y registrar los detalles
+        logger.exception("Error evaluando la submisión")
+        if rejudge:
+            return
+        if language:
+            VERDICTS.labels(language=language, status="error").inc()
         
         db = get_db()
         await db.submissions.update_one(
             {"_id": ObjectId(submission_id)},
             {"$set": {"status": "error"}}
-        ) 
\ No newline at end of file
+        )
+        await progress_broker.publish(submission_id, {"type": "result", "status": "error"})
+    finally:
+        if language:
+            SUBMISSIONS_RUNNING.labels(language=language).dec() 
\ No newline at end of file
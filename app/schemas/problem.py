@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Any
 from datetime import datetime
 from bson import ObjectId
+from app.models.base import JudgingPolicy
 
 def serialize_object_id(obj_id: ObjectId) -> str:
     return str(obj_id)
@@ -48,6 +49,20 @@ class ProblemBase(BaseModel):
     difficulty: str = Field(..., description="Dificultad: easy, medium, hard")
     time_limit: int = Field(default=1000, description="Límite de tiempo en milisegundos")
     memory_limit: int = Field(default=256, description="Límite de memoria en MB")
+    output_limit: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Límite de salida por caso de prueba en bytes; por defecto JUDGE_OUTPUT_LIMIT"
+    )
+    max_parallel_test_cases: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Casos de prueba ejecutados a la vez; 1 fuerza la ejecución en serie"
+    )
+    judging_policy: JudgingPolicy = Field(
+        default=JudgingPolicy.FULL,
+        description="full: se ejecutan todos los casos; stop_on_first_failure: se detiene en el primer fallo (ICPC)"
+    )
 
 class ProblemCreate(ProblemBase):
     test_cases: List[TestCaseCreate] = []
@@ -58,6 +73,9 @@ class ProblemUpdate(BaseModel):
     difficulty: Optional[str] = None
     time_limit: Optional[int] = None
     memory_limit: Optional[int] = None
+    output_limit: Optional[int] = Field(default=None, ge=1)
+    max_parallel_test_cases: Optional[int] = Field(default=None, ge=1)
+    judging_policy: Optional[JudgingPolicy] = None
 
 class ProblemResponse(ProblemBase):
     id: str = Field(alias="_id")
@@ -36,10 +36,14 @@ class SubmissionUpdate(BaseModel):
 class TestCaseResultSchema(BaseModel):
     id: PyObjectId = Field(alias="_id")
     test_case_id: PyObjectId
+    index: int
     status: str
     execution_time: Optional[float] = None
+    cpu_time: Optional[float] = None
     memory_used: Optional[float] = None
     output: Optional[str] = None
+    output_hash: Optional[str] = None
+    output_truncated: bool = False
     error_message: Optional[str] = None
     created_at: datetime
 
@@ -54,10 +58,12 @@ class SubmissionResponse(SubmissionBase):
     user_email: str  # Cambiado de user_id
     status: SubmissionStatus
     execution_time: Optional[float] = None
+    cpu_time: Optional[float] = None
     memory_used: Optional[float] = None
     score: Optional[float] = None
     created_at: datetime
     test_case_results: List[TestCaseResultSchema] = []
+    estimated_wait_seconds: Optional[int] = None  # solo al crearla: espera estimada hasta el veredicto
 
     model_config = {
         "populate_by_name": True,
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Worker de evaluación: reclama trabajos de la cola `judge_jobs` y evalúa las submisiones.
+
+Uso:
+    python -m app.worker [--concurrency N]
+
+Se pueden ejecutar varios procesos en una o varias máquinas; cada trabajo se
+reclama de forma atómica y se mantiene con heartbeats mientras se evalúa.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+
+from prometheus_client import start_http_server
+
+from app.core.config import settings
+from app.core.judge import CodeJudge
+from app.core.logging_config import setup_logging
+from app.core.job_queue import (
+    claim_job, heartbeat_job, complete_job, fail_job, reap_expired_jobs, count_queued_jobs, LANE_REJUDGE
+)
+from app.core.metrics import SUBMISSIONS_PENDING
+from app.core.mongodb import connect_to_mongo, close_mongo_connection
+from app.core.sandbox_pool import container_pool
+from app.core.docker_backend import docker_backend
+from app.routers.submissions import evaluate_submission
+
+logger = logging.getLogger(__name__)
+
+
+async def keep_alive(job_id, worker_id: str):
+    """Enviar heartbeats periódicos mientras se evalúa un trabajo"""
+    while True:
+        await asyncio.sleep(settings.JUDGE_JOB_HEARTBEAT_SECONDS)
+        if not await heartbeat_job(job_id, worker_id):
+            logger.warning(f"Se perdió el lease del trabajo {job_id}")
+            return
+
+
+async def process_job(job: dict, worker_id: str):
+    """Evaluar la submisión de un trabajo manteniendo su lease"""
+    heartbeat = asyncio.create_task(keep_alive(job["_id"], worker_id))
+    try:
+        await evaluate_submission(str(job["submission_id"]), rejudge=job.get("lane") == LANE_REJUDGE)
+        await complete_job(job["_id"], worker_id)
+    except Exception as e:
+        logger.error(f"Error procesando el trabajo {job['_id']}: {e}")
+        await fail_job(job["_id"], worker_id, str(e))
+    finally:
+        heartbeat.cancel()
+
+
+async def run_worker(concurrency: int):
+    """Bucle principal del worker"""
+    await connect_to_mongo()
+    if not settings.DEBUG:
+        await CodeJudge().warm_up_pool()
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows
+
+    slots = asyncio.Semaphore(concurrency)
+    # Las re-evaluaciones ocupan como máximo estos lugares y solo si no hay trabajos en vivo
+    rejudge_slots = asyncio.Semaphore(max(min(settings.JUDGE_REJUDGE_CONCURRENCY, concurrency), 1))
+    running = set()
+    last_reap = 0.0
+    last_queue_count = 0.0
+    logger.info(f"Worker {worker_id} iniciado con concurrencia {concurrency}")
+
+    try:
+        while not stop.is_set():
+            # Revisar periódicamente los trabajos abandonados que agotaron sus intentos
+            if loop.time() - last_reap >= settings.JUDGE_JOB_LEASE_SECONDS:
+                await reap_expired_jobs()
+                last_reap = loop.time()
+
+            if loop.time() - last_queue_count >= settings.JUDGE_QUEUE_METRICS_INTERVAL:
+                SUBMISSIONS_PENDING.set(await count_queued_jobs())
+                last_queue_count = loop.time()
+
+            await slots.acquire()
+            job = await claim_job(worker_id)
+            if not job and not rejudge_slots.locked():
+                job = await claim_job(worker_id, LANE_REJUDGE)
+            if not job:
+                slots.release()
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=settings.JUDGE_WORKER_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            rejudge = job.get("lane") == LANE_REJUDGE
+            if rejudge:
+                await rejudge_slots.acquire()  # no espera: solo este bucle lo toma y no estaba ocupado
+            
+            task = asyncio.create_task(process_job(job, worker_id))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+            if rejudge:
+                task.add_done_callback(lambda _: rejudge_slots.release())
+
+        # Terminar los trabajos en curso antes de salir
+        logger.info(f"Deteniendo worker {worker_id}; esperando {len(running)} trabajos")
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    finally:
+        await container_pool.shutdown()
+        docker_backend.shutdown()
+        await close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de evaluación de RavenCode Judge")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.JUDGE_WORKER_CONCURRENCY,
+        help="Submisiones evaluadas a la vez por este proceso"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=settings.JUDGE_WORKER_METRICS_PORT,
+        help="Puerto donde se exponen las métricas de Prometheus (0 las desactiva)"
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    asyncio.run(run_worker(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
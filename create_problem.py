@@ -78,11 +78,11 @@ Ana tiene un promedio de 4.13""",
             }
         ]
         
-        # Insertar casos de prueba
-        for i, test_case in enumerate(test_cases):
-            result = await db.test_cases.insert_one(test_case)
+        # Insertar casos de prueba en una sola operación
+        result = await db.test_cases.insert_many(test_cases)
+        for i, (test_case, test_case_id) in enumerate(zip(test_cases, result.inserted_ids)):
             sample_text = " (muestra)" if test_case["is_sample"] else " (oculto)"
-            print(f"   Caso de prueba {i+1}{sample_text}: {result.inserted_id}")
+            print(f"   Caso de prueba {i+1}{sample_text}: {test_case_id}")
         
         print(f"\nProblema listo para evaluaciones!")
         print(f"   Total de casos de prueba: {len(test_cases)}")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Script para mover los datos de los casos de prueba antiguos al almacén de blobs.
+
+Los casos con `input_data`/`expected_output` en el documento pasan a guardar solo
+los hashes y tamaños. La huella de los casos de prueba no cambia, porque se
+calcula con los mismos hashes.
+"""
+import asyncio
+from app.core.blob_store import store_test_case_data
+from app.core.mongodb import connect_to_mongo, close_mongo_connection, get_database
+
+async def migrate_test_data():
+    """Migrar los casos de prueba con datos en línea"""
+    try:
+        await connect_to_mongo()
+        db = get_database()
+
+        migrated = 0
+        cursor = db.test_cases.find({"input_hash": {"$exists": False}})
+        async for test_case in cursor:
+            blob_fields = await store_test_case_data(test_case["input_data"], test_case["expected_output"])
+            await db.test_cases.update_one(
+                {"_id": test_case["_id"]},
+                {
+                    "$set": blob_fields,
+                    "$unset": {"input_data": "", "expected_output": ""}
+                }
+            )
+            migrated += 1
+
+        # Los jueces descartan su caché de problemas al ver el nuevo contador
+        if migrated:
+            await db.cache_versions.update_one({"_id": "problems"}, {"$inc": {"version": 1}}, upsert=True)
+
+        print(f"Casos de prueba migrados: {migrated}")
+
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    print("Migrando datos de casos de prueba al almacén de blobs...")
+    asyncio.run(migrate_test_data())
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Script para importar y exportar paquetes de problemas (.tar.gz).
+
+    python problem_packages.py import banco.tar.gz
+    python problem_packages.py export banco.tar.gz [ID_PROBLEMA ...]
+
+Un paquete contiene un problema (`problem.json` en la raíz) o un banco (un
+directorio por problema). Cada problema tiene `problem.json` con sus límites,
+`statement.md` con el enunciado y los datos de prueba en `tests/`. Sin ids,
+`export` exporta todos los problemas.
+"""
+import argparse
+import asyncio
+from app.core.mongodb import connect_to_mongo, close_mongo_connection
+from app.core.problem_package import import_package, export_package
+
+async def run(args):
+    """Ejecutar la importación o exportación pedida"""
+    try:
+        await connect_to_mongo()
+
+        if args.command == "import":
+            problems = await import_package(args.package)
+            for problem in problems:
+                print(f"   {problem['_id']}: {problem['title']}")
+            print(f"Problemas importados: {len(problems)}")
+        else:
+            exported = await export_package(args.package, args.problem_ids or None)
+            print(f"Problemas exportados: {exported} en {args.package}")
+
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importar y exportar paquetes de problemas")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Importar un paquete de problemas")
+    import_parser.add_argument("package", help="Archivo .tar.gz del paquete")
+    export_parser = subparsers.add_parser("export", help="Exportar problemas a un paquete")
+    export_parser.add_argument("package", help="Archivo .tar.gz a crear")
+    export_parser.add_argument("problem_ids", nargs="*", help="Ids de los problemas (todos si se omiten)")
+    asyncio.run(run(parser.parse_args()))